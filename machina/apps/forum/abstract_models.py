@@ -11,8 +11,8 @@ import uuid
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import Sum
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Sum, Value, When
 from django.utils.encoding import force_text
 from django.utils.text import slugify
 from django.utils.translation import ugettext_lazy as _
@@ -20,10 +20,16 @@ from mptt.models import MPTTModel, TreeForeignKey
 
 from machina.apps.forum import signals
 from machina.conf import settings as machina_settings
+from machina.core.loading import get_class
 from machina.models import DatedModel
 from machina.models.fields import ExtendedImageField, MarkupTextField
 
 
+defer_trackers_update = get_class('forum_conversation.trackers', 'defer_trackers_update')
+is_trackers_update_deferred = get_class(
+    'forum_conversation.trackers', 'is_trackers_update_deferred')
+
+
 def get_forum_image_upload_to(instance, filename):
     """ Returns a valid upload path for an image file associated with a forum instance. """
     return instance.get_image_upload_to(filename)
@@ -71,6 +77,13 @@ class AbstractForum(MPTTModel, DatedModel):
         choices=TYPE_CHOICES, verbose_name=_('Forum type'), db_index=True,
     )
 
+    # The names of the fields that are used to store the tracking data of a forum ; these fields are
+    # not part of the structure of the tree of forums and are always updated separately.
+    TRACKER_FIELDS = (
+        'direct_posts_count', 'direct_topics_count', 'link_redirects_count', 'last_post',
+        'last_post_on',
+    )
+
     # Tracking data (only approved topics and posts are recorded)
     direct_posts_count = models.PositiveIntegerField(
         editable=False, blank=True, default=0, verbose_name=_('Direct number of posts'),
@@ -187,26 +200,79 @@ class AbstractForum(MPTTModel, DatedModel):
             signals.forum_moved.send(sender=self, previous_parent=old_instance.parent)
 
     def update_trackers(self):
-        """ Updates the denormalized trackers associated with the forum instance. """
-        direct_approved_topics = self.topics.filter(approved=True).order_by('-last_post_on')
-
-        # Compute the direct topics count and the direct posts count.
-        self.direct_topics_count = direct_approved_topics.count()
-        self.direct_posts_count = direct_approved_topics.aggregate(
-            total_posts_count=Sum('posts_count'))['total_posts_count'] or 0
-
-        # Forces the forum's 'last_post' ID and 'last_post_on' date to the corresponding values
-        # associated with the topic with the latest post.
-        if direct_approved_topics.exists():
-            self.last_post_id = direct_approved_topics[0].last_post_id
-            self.last_post_on = direct_approved_topics[0].last_post_on
-        else:
-            self.last_post_id = None
-            self.last_post_on = None
-
-        # Any save of a forum triggered from the update_tracker process will not result in checking
-        # for a change of the forum's parent.
-        self._simple_save()
+        """ Updates the denormalized trackers associated with the forum instance.
+
+        The row of the forum is locked while the trackers are computed (if supported by the
+        database) so that concurrent updates of the trackers of the same forum are serialized.
+
+        If trackers updates are deferred, the forum is only recorded and its trackers are recomputed
+        when the current transaction is committed.
+        """
+        if is_trackers_update_deferred():
+            defer_trackers_update(forum_ids=[self.pk, ])
+            return
+
+        with transaction.atomic():
+            self._lock_for_update()
+            direct_approved_topics = self.topics.filter(approved=True).order_by('-last_post_on')
+
+            # Compute the direct topics count and the direct posts count.
+            self.direct_topics_count = direct_approved_topics.count()
+            self.direct_posts_count = direct_approved_topics.aggregate(
+                total_posts_count=Sum('posts_count'))['total_posts_count'] or 0
+
+            # Forces the forum's 'last_post' ID and 'last_post_on' date to the corresponding values
+            # associated with the topic with the latest post.
+            if direct_approved_topics.exists():
+                self.last_post_id = direct_approved_topics[0].last_post_id
+                self.last_post_on = direct_approved_topics[0].last_post_on
+            else:
+                self.last_post_id = None
+                self.last_post_on = None
+
+            # Any save of a forum triggered from the update_tracker process will not result in
+            # checking for a change of the forum's parent. Only the columns holding the tracking
+            # data are written.
+            self._simple_save(update_fields=[
+                'direct_topics_count', 'direct_posts_count', 'last_post', 'last_post_on',
+            ])
+
+    def update_trackers_for_new_post(self, post):
+        """ Updates the denormalized trackers associated with the forum instance for a new post.
+
+        Unlike ``update_trackers``, this method does not recompute the trackers: it should only be
+        used for new approved posts added to approved topics that already exist. The posts count is
+        incremented using a single ``UPDATE`` query and the last post is only replaced if the new
+        post is more recent.
+        """
+        is_newer = Q(last_post_on__isnull=True) | Q(last_post_on__lte=post.created)
+        self.__class__._default_manager.filter(pk=self.pk).update(
+            direct_posts_count=F('direct_posts_count') + 1,
+            last_post=Case(
+                When(is_newer, then=Value(post.pk)), default=F('last_post'),
+                output_field=models.IntegerField(),
+            ),
+            last_post_on=Case(
+                When(is_newer, then=Value(post.created)), default=F('last_post_on'),
+                output_field=models.DateTimeField(),
+            ),
+        )
+
+        # Keeps the current instance in sync with the values that were written.
+        self.direct_posts_count += 1
+        if self.last_post_on is None or self.last_post_on <= post.created:
+            last_post_field = self._meta.get_field('last_post')
+            if last_post_field.is_cached(self):
+                last_post_field.delete_cached_value(self)
+            self.last_post_id = post.pk
+            self.last_post_on = post.created
+
+    def _lock_for_update(self):
+        """ Locks the row of the forum until the end of the current transaction. """
+        list(
+            self.__class__._default_manager.select_for_update()
+            .filter(pk=self.pk).values_list('pk', flat=True)
+        )
 
     def _simple_save(self, *args, **kwargs):
         """ Simple wrapper around the standard save method.
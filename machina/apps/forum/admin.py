@@ -37,6 +37,8 @@ PickUserForm = get_class('forum.forms', 'PickUserForm')
 
 PermissionConfig = get_class('forum_permission.defaults', 'PermissionConfig')
 
+bitmasks = get_class('forum_permission.bitmasks', 'bitmasks')
+
 
 class ForumAdmin(admin.ModelAdmin):
     """ The Forum model admin. """
@@ -306,24 +308,24 @@ class ForumAdmin(admin.ModelAdmin):
         editable_permissions = sorted(
             ForumPermission.objects.filter(**perm_type_filter), key=lambda p: p.name,
         )
-        granted_permissions = (
-            permission_model.objects.filter(
-                permission__in=editable_permissions, has_perm=True, **filter_kwargs
-            )
-            .values_list('permission__codename', flat=True)
-        )
-        non_granted_permissions = (
-            permission_model.objects.filter(
-                permission__in=editable_permissions, has_perm=False, **filter_kwargs
-            )
-            .values_list('permission__codename', flat=True)
-        )
+        # Computes the bitmasks of the granted and non granted permissions using a single query.
+        granted_mask, nongranted_mask = 0, 0
+        for codename, has_perm in (
+            permission_model.objects
+            .filter(permission__in=editable_permissions, **filter_kwargs)
+            .values_list('permission__codename', 'has_perm')
+        ):
+            if has_perm:
+                granted_mask |= bitmasks.get_bit(codename)
+            else:
+                nongranted_mask |= bitmasks.get_bit(codename)
 
         permissions_dict = OrderedDict()
         for p in editable_permissions:
-            if p.codename in granted_permissions:
+            perm_bit = bitmasks.get_bit(p.codename)
+            if granted_mask & perm_bit:
                 perm_state = PermissionsForm.PERM_GRANTED
-            elif p.codename in non_granted_permissions:
+            elif nongranted_mask & perm_bit:
                 perm_state = PermissionsForm.PERM_NOT_GRANTED
             else:
                 perm_state = PermissionsForm.PERM_NOT_SET
@@ -0,0 +1,184 @@
+"""
+    Forum cache
+    ===========
+
+    This module defines an abstraction allowing to put the pages rendered for anonymous users into
+    cache and to invalidate them precisely using tags.
+
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.translation import get_language
+
+from machina.conf import settings as machina_settings
+
+
+class AnonymousPageCache:
+    """ The anonymous page cache.
+
+    Anonymous users all see the same pages (index, forums and topics) as long as they do not post
+    content or vote in polls (which results in the creation of a forum key stored in their session).
+    This cache stores the pages rendered for anonymous users that have no session so that these
+    pages can be served without hitting the database.
+
+    Each cached page is associated with a set of tags identifying the objects it displays (eg.
+    ``forum:1`` or ``topic:42``). Each tag has a version number stored in the cache backend: a page
+    is only served if the versions of its tags did not change since it started being rendered.
+    Invalidating a tag (eg. when a post is saved in a topic) thus invalidates all the pages
+    associated with it. The ``forums`` tag is associated with all the pages: it is invalidated when
+    the structure of the tree of forums or the forum permissions change.
+
+    The cache is disabled unless the ``MACHINA_ANONYMOUS_PAGE_CACHE_NAME`` setting points to a
+    cache configured in the ``CACHES`` setting.
+
+    """
+
+    key_prefix = 'machina_anonymous_page'
+    tag_key_prefix = 'machina_anonymous_page_tag'
+    forum_tree_tag = 'forums'
+
+    @property
+    def enabled(self):
+        """ Returns ``True`` if the anonymous page cache is enabled. """
+        return machina_settings.ANONYMOUS_PAGE_CACHE_NAME is not None
+
+    def get_backend(self):
+        """ Returns the associated cache backend. """
+        try:
+            cache = caches[machina_settings.ANONYMOUS_PAGE_CACHE_NAME]
+        except InvalidCacheBackendError:
+            raise ImproperlyConfigured(
+                'The anonymous page cache backend ({}) is not configured'.format(
+                    machina_settings.ANONYMOUS_PAGE_CACHE_NAME,
+                ),
+            )
+        return cache
+
+    def get_tags(self, forum_ids=(), topic_ids=(), user_ids=()):
+        """ Returns the tags associated with the given forums, topics and users. """
+        return (
+            ['forum:{}'.format(i) for i in forum_ids] +
+            ['topic:{}'.format(i) for i in topic_ids] +
+            ['user:{}'.format(i) for i in user_ids]
+        )
+
+    def is_cacheable(self, request):
+        """ Returns ``True`` if the page requested by the given request can be cached.
+
+        Only ``GET`` and ``HEAD`` requests performed by users who do not have a session (and thus
+        no forum key) nor pending messages are considered.
+        """
+        return (
+            self.enabled and
+            request.method in ('GET', 'HEAD') and
+            settings.SESSION_COOKIE_NAME not in request.COOKIES and
+            'messages' not in request.COOKIES and
+            not request.user.is_authenticated
+        )
+
+    def get_key(self, request):
+        """ Returns the key of the page requested by the given request. """
+        values = [request.build_absolute_uri(), get_language()]
+        return '{}_{}'.format(self.key_prefix, hashlib.md5(repr(values).encode()).hexdigest())
+
+    def get(self, request):
+        """ Returns a response for the given request if the requested page is cached or ``None``.
+        """
+        backend = self.get_backend()
+        page = backend.get(self.get_key(request))
+        if page is None:
+            return None
+
+        versions = backend.get_many(self._get_tag_key(tag) for tag in page['tags'])
+        for tag, version in page['tags'].items():
+            if versions.get(self._get_tag_key(tag)) != version:
+                return None
+
+        response = HttpResponse(page['content'], content_type=page['content_type'])
+        return response
+
+    def get_tag_versions(self, tags):
+        """ Returns a dictionary containing the current versions of the given tags.
+
+        The ``forums`` tag is always included and the versions of the tags that do not have one yet
+        are created. The versions must be retrieved before the page is rendered: a page stored with
+        these versions is thus not served anymore if any of its tags is invalidated while it is
+        being rendered.
+        """
+        tags = set(tags) | {self.forum_tree_tag, }
+        backend = self.get_backend()
+        tag_keys = {tag: self._get_tag_key(tag) for tag in tags}
+        versions = backend.get_many(tag_keys.values())
+        for tag, tag_key in tag_keys.items():
+            if tag_key not in versions:
+                backend.add(tag_key, self._get_initial_version(), None)
+                versions[tag_key] = backend.get(tag_key)
+        return {tag: versions[tag_key] for tag, tag_key in tag_keys.items()}
+
+    def set(self, request, response, tag_versions):
+        """ Stores the given response associated with the given tag versions if it can be cached.
+
+        The tag versions must be the ones returned by ``get_tag_versions()`` before the page was
+        rendered. Responses that set cookies (eg. if the session of the user or a CSRF token was
+        created while rendering the page) and unsuccessful responses are not stored.
+        """
+        if (
+            response.status_code != 200 or response.streaming or response.cookies or
+            request.META.get('CSRF_COOKIE_USED') or
+            getattr(request, 'session', None) is not None and request.session.modified
+        ):
+            return
+
+        self.get_backend().set(
+            self.get_key(request),
+            {
+                'tags': tag_versions,
+                'content': response.content,
+                'content_type': response['Content-Type'],
+            },
+            machina_settings.ANONYMOUS_PAGE_CACHE_TIMEOUT,
+        )
+
+    def invalidate(self, tags):
+        """ Invalidates the pages associated with the given tags.
+
+        The tags are invalidated when the current transaction (if any) is committed so that pages
+        rendered concurrently with the ongoing changes are not kept in the cache.
+        """
+        if not self.enabled or not tags:
+            return
+        tags = list(tags)
+        transaction.on_commit(lambda: self._invalidate(tags))
+
+    def invalidate_forum_tree(self):
+        """ Invalidates all the pages. """
+        self.invalidate([self.forum_tree_tag, ])
+
+    def _invalidate(self, tags):
+        backend = self.get_backend()
+        for tag in tags:
+            tag_key = self._get_tag_key(tag)
+            try:
+                backend.incr(tag_key)
+            except ValueError:
+                # The tag was never associated with a cached page.
+                pass
+
+    def _get_initial_version(self):
+        # The initial version of a tag is derived from the current time in order to ensure that a
+        # page cached for a previous version is never served again if the version is evicted from
+        # the cache.
+        return int(time.time() * 1000)
+
+    def _get_tag_key(self, tag):
+        return '{}_{}'.format(self.tag_key_prefix, tag)
+
+
+cache = AnonymousPageCache()
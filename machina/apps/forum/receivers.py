@@ -6,10 +6,21 @@
 
 """
 
+from django.db import transaction
 from django.db.models import F
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from mptt.signals import node_moved
 
-from machina.apps.forum.signals import forum_viewed
+from machina.apps.forum.signals import forum_moved, forum_viewed
+from machina.core.db.models import get_model
+from machina.core.loading import get_class
+
+
+Forum = get_model('forum', 'Forum')
+
+forum_tree_cache = get_class('forum.tree', 'cache')
+page_cache = get_class('forum.cache', 'cache')
 
 
 @receiver(forum_viewed)
@@ -17,4 +28,44 @@ def update_forum_redirects_counter(sender, forum, user, request, response, **kwa
     """ Handles the update of the link redirects counter associated with link forums. """
     if forum.is_link and forum.link_redirects:
         forum.link_redirects_count = F('link_redirects_count') + 1
-        forum.save()
+        forum._simple_save(update_fields=['link_redirects_count', ])
+
+
+@receiver(post_save, sender=Forum)
+def invalidate_forum_tree_cache_on_forum_save(sender, instance, update_fields=None, **kwargs):
+    """ Invalidates the forum tree cache when a forum is created or updated.
+
+    Saves that only update the trackers of a forum are not considered. The cache is invalidated
+    once the current transaction (if any) is committed so that the tree of forums cannot be loaded
+    again before the changes are visible.
+    """
+    if update_fields is None or not set(sender.TRACKER_FIELDS).issuperset(update_fields):
+        transaction.on_commit(forum_tree_cache.bump_generation)
+
+
+@receiver(post_delete, sender=Forum)
+@receiver(forum_moved)
+@receiver(node_moved, sender=Forum)
+def invalidate_forum_tree_cache_on_forum_tree_change(sender, **kwargs):
+    """ Invalidates the forum tree cache when the tree of forums changes. """
+    transaction.on_commit(forum_tree_cache.bump_generation)
+
+
+@receiver(post_save, sender=Forum)
+def invalidate_page_cache_on_forum_save(sender, instance, update_fields=None, **kwargs):
+    """ Invalidates the cached pages displaying a forum when it is created or updated.
+
+    All the cached pages are invalidated unless only the trackers of the forum are updated.
+    """
+    if update_fields is None or not set(sender.TRACKER_FIELDS).issuperset(update_fields):
+        page_cache.invalidate_forum_tree()
+    else:
+        page_cache.invalidate(page_cache.get_tags(forum_ids=[instance.pk, ]))
+
+
+@receiver(post_delete, sender=Forum)
+@receiver(forum_moved)
+@receiver(node_moved, sender=Forum)
+def invalidate_page_cache_on_forum_tree_change(sender, **kwargs):
+    """ Invalidates all the cached pages when the tree of forums changes. """
+    page_cache.invalidate_forum_tree()
@@ -0,0 +1,90 @@
+"""
+    Forum registry
+    ==============
+
+    This module defines a ``ForumRegistry`` abstraction that allows to load the tree of forums once
+    and to share the same forum instances between all the components that need them while
+    processing a request.
+
+"""
+
+from machina.core.db.models import get_model
+from machina.core.loading import get_class
+
+
+Forum = get_model('forum', 'Forum')
+
+forum_tree_cache = get_class('forum.tree', 'cache')
+
+
+class ForumRegistry:
+    """ Provides access to all the forums of the tree of forums.
+
+    The structure of the tree of forums is provided by a ``ForumTree`` snapshot, which is kept in
+    each process if the forum tree cache is enabled. Forum instances are loaded using a single query
+    the first time all the forums are accessed, or individually when a single forum is requested
+    before. Forums, their ancestors, their children or their descendants can then be retrieved
+    without hitting the database again. A ``ForumRegistry`` instance is attached to each request by
+    the ``ForumPermissionMiddleware``; the same forum instances are thus used by the permission
+    handler, the tracking handler and the views.
+
+    """
+
+    def __init__(self):
+        self._tree = None
+        self._forums = None
+        self._forums_by_id = {}
+
+    @property
+    def tree(self):
+        """ Returns the ``ForumTree`` snapshot describing the structure of the tree of forums. """
+        if self._tree is None:
+            self._tree = forum_tree_cache.get_tree(forums=lambda: self.forums)
+        return self._tree
+
+    @property
+    def forums(self):
+        """ Returns the list of all the forums sorted by position in the tree of forums. """
+        if self._forums is None:
+            self._load()
+        return self._forums
+
+    def get(self, forum_id):
+        """ Returns the forum associated with the given ID or ``None`` if it does not exist. """
+        try:
+            forum_id = int(forum_id)
+        except (TypeError, ValueError):
+            return None
+        if forum_id not in self._forums_by_id and forum_id in self.tree and self._forums is None:
+            # Only the considered forum is fetched if all the forums have not been loaded yet.
+            forum = Forum.objects.filter(pk=forum_id).first()
+            if forum is not None:
+                self._forums_by_id[forum_id] = forum
+        return self._forums_by_id.get(forum_id)
+
+    def get_ancestors(self, forum, include_self=False):
+        """ Returns the ancestors of the given forum, starting with the top-level forum. """
+        ancestors = self._get_forums(self.tree.get_ancestors(forum.id))
+        return ancestors + [forum] if include_self else ancestors
+
+    def get_children(self, forum):
+        """ Returns the direct children of the given forum. """
+        return self._get_forums(self.tree.get_children(forum.id))
+
+    def get_descendants(self, forum, include_self=False):
+        """ Returns the descendants of the given forum sorted by position in the tree of forums. """
+        descendants = self._get_forums(self.tree.get_descendants(forum.id))
+        return [forum] + descendants if include_self else descendants
+
+    def _get_forums(self, nodes):
+        if self._forums is None and any(n.id not in self._forums_by_id for n in nodes):
+            self._load()
+        return [self._forums_by_id[n.id] for n in nodes if n.id in self._forums_by_id]
+
+    def _load(self):
+        # Forum instances that were already fetched individually are reused.
+        forums = [
+            self._forums_by_id.get(f.id, f) for f in Forum.objects.order_by('tree_id', 'lft')
+        ]
+        self._forums = forums
+        self._forums_by_id = {f.id: f for f in forums}
@@ -0,0 +1,195 @@
+"""
+    Forum tree
+    ==========
+
+    This module defines a ``ForumTree`` abstraction that represents an immutable snapshot of the
+    structure of the tree of forums, and a ``ForumTreeCache`` abstraction that allows to keep such
+    a snapshot in each process and to refresh it only when the tree of forums changes.
+
+"""
+
+import collections
+import threading
+import time
+
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.exceptions import ImproperlyConfigured
+
+from machina.conf import settings as machina_settings
+from machina.core.db.models import get_model
+
+
+ForumTreeNode = collections.namedtuple(
+    'ForumTreeNode',
+    ['id', 'parent_id', 'tree_id', 'lft', 'rght', 'level', 'name', 'slug', 'type', ],
+)
+
+
+class ForumTree:
+    """ An immutable snapshot of the structure of the tree of forums.
+
+    The snapshot only contains the structural attributes of the forums (IDs, MPTT fields, names,
+    slugs and types) as ``ForumTreeNode`` instances; denormalized trackers such as posts counts are
+    not part of it. Nodes are sorted by tree ID and by left value and are indexed by ID, by parent
+    and by position so that the parent, the children, the ancestors and the descendants of a forum
+    can be retrieved without hitting the database.
+
+    """
+
+    def __init__(self, nodes):
+        self.nodes = tuple(sorted(nodes, key=lambda n: (n.tree_id, n.lft)))
+        self._nodes_by_id = {n.id: n for n in self.nodes}
+        self._positions = {n.id: i for i, n in enumerate(self.nodes)}
+
+        children = collections.defaultdict(list)
+        for node in self.nodes:
+            children[node.parent_id].append(node)
+        self._children = {parent_id: tuple(nodes) for parent_id, nodes in children.items()}
+
+        # The ancestors of each node are computed in a single pass: the parent of a node is always
+        # positioned before it in the sorted list of nodes.
+        self._ancestors = {}
+        for node in self.nodes:
+            parent = self._nodes_by_id.get(node.parent_id)
+            self._ancestors[node.id] = (
+                self._ancestors[parent.id] + (parent, ) if parent is not None else ()
+            )
+
+    @classmethod
+    def load(cls):
+        """ Builds a snapshot of the tree of forums using a single query. """
+        Forum = get_model('forum', 'Forum')
+        return cls(
+            ForumTreeNode(*values)
+            for values in Forum.objects.values_list(*ForumTreeNode._fields)
+        )
+
+    @classmethod
+    def from_forums(cls, forums):
+        """ Builds a snapshot of the tree of forums from a list of all the forum instances. """
+        return cls(
+            ForumTreeNode(*(getattr(f, field) for field in ForumTreeNode._fields)) for f in forums
+        )
+
+    def __contains__(self, forum_id):
+        return forum_id in self._nodes_by_id
+
+    def get(self, forum_id):
+        """ Returns the node associated with the given forum ID or ``None``. """
+        return self._nodes_by_id.get(forum_id)
+
+    def get_parent(self, forum_id):
+        """ Returns the node of the parent of the given forum or ``None``. """
+        node = self._nodes_by_id.get(forum_id)
+        return self._nodes_by_id.get(node.parent_id) if node is not None else None
+
+    def get_children(self, forum_id):
+        """ Returns the nodes of the direct children of the given forum. """
+        return self._children.get(forum_id, ())
+
+    def get_ancestors(self, forum_id, include_self=False):
+        """ Returns the nodes of the ancestors of the given forum, starting with the root. """
+        ancestors = self._ancestors.get(forum_id, ())
+        return ancestors + (self._nodes_by_id[forum_id], ) if include_self else ancestors
+
+    def get_descendants(self, forum_id, include_self=False):
+        """ Returns the nodes of the descendants of the given forum sorted by position. """
+        position = self._positions[forum_id]
+        node = self.nodes[position]
+        # The descendants of a forum directly follow it in the sorted list of nodes.
+        descendants_count = (node.rght - node.lft - 1) // 2
+        start = position if include_self else position + 1
+        return self.nodes[start:position + 1 + descendants_count]
+
+
+class ForumTreeCache:
+    """ The process-local forum tree cache.
+
+    The structure of the tree of forums rarely changes while it is used by almost every request.
+    This cache keeps a ``ForumTree`` snapshot in each process. The snapshot is associated with a
+    "generation" number stored in one of the caches configured through Django's cache framework:
+    any change to the tree of forums (forum creations, updates, deletions or moves) bumps this
+    number, and each process builds a new snapshot the next time the tree is requested.
+
+    The cache is disabled unless the ``MACHINA_FORUM_TREE_CACHE_NAME`` setting points to a cache
+    configured in the ``CACHES`` setting. In that case a new snapshot is built each time the tree is
+    requested.
+
+    """
+
+    generation_key = 'machina_forum_tree_generation'
+
+    def __init__(self):
+        self._tree_generation = None
+        self._tree = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """ Returns ``True`` if the forum tree cache is enabled. """
+        return machina_settings.FORUM_TREE_CACHE_NAME is not None
+
+    def get_backend(self):
+        """ Returns the associated cache backend. """
+        try:
+            cache = caches[machina_settings.FORUM_TREE_CACHE_NAME]
+        except InvalidCacheBackendError:
+            raise ImproperlyConfigured(
+                'The forum tree cache backend ({}) is not configured'.format(
+                    machina_settings.FORUM_TREE_CACHE_NAME,
+                ),
+            )
+        return cache
+
+    def get_generation(self):
+        """ Returns the current forum tree generation number. """
+        backend = self.get_backend()
+        generation = backend.get(self.generation_key)
+        if generation is None:
+            # The initial generation number is derived from the current time in order to ensure that
+            # a snapshot built for a previous generation is never used again if the generation
+            # number is evicted from the cache.
+            backend.add(self.generation_key, int(time.time() * 1000), None)
+            generation = backend.get(self.generation_key)
+        return generation
+
+    def bump_generation(self):
+        """ Increments the forum tree generation number, invalidating the snapshots. """
+        self.clear()
+        if not self.enabled:
+            return
+        backend = self.get_backend()
+        try:
+            backend.incr(self.generation_key)
+        except ValueError:
+            backend.set(self.generation_key, int(time.time() * 1000), None)
+
+    def get_tree(self, forums=None):
+        """ Returns the snapshot of the tree of forums.
+
+        If the cache is disabled, a new snapshot is built: the optional ``forums`` callable can
+        provide all the forum instances in order to avoid an extra query in that case.
+        """
+        if not self.enabled:
+            return ForumTree.from_forums(forums()) if forums is not None else ForumTree.load()
+
+        generation = self.get_generation()
+        with self._lock:
+            if self._tree is not None and self._tree_generation == generation:
+                return self._tree
+
+        tree = ForumTree.load()
+
+        with self._lock:
+            self._tree_generation = generation
+            self._tree = tree
+        return tree
+
+    def clear(self):
+        """ Drops the snapshot kept by the current process. """
+        with self._lock:
+            self._tree_generation = None
+            self._tree = None
+
+
+cache = ForumTreeCache()
@@ -0,0 +1,46 @@
+"""
+    Forum view mixins
+    =================
+
+    This module defines view mixins that can be used by the views displaying forums and their
+    contents.
+
+"""
+
+from machina.core.loading import get_class
+
+
+page_cache = get_class('forum.cache', 'cache')
+
+
+class AnonymousPageCacheMixin:
+    """ Serves the pages rendered for anonymous users from the anonymous page cache.
+
+    Views using this mixin should define a ``get_page_cache_tags()`` method returning the tags
+    identifying the objects displayed by the page (see ``AnonymousPageCache``). This method is
+    called before the view is executed so that the versions of the tags are retrieved before the
+    page is rendered: it can only rely on the arguments of the view. Note that the view is not
+    executed at all when a page is served from the cache: the signals sent by the view (eg. the
+    ones used to update the views counters) are not sent in that case.
+
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        """ Returns the cached page if applicable or renders it and puts it into the cache. """
+        if not page_cache.is_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        response = page_cache.get(request)
+        if response is not None:
+            return response
+
+        tag_versions = page_cache.get_tag_versions(self.get_page_cache_tags())
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and hasattr(response, 'render'):
+            response.render()
+            page_cache.set(request, response, tag_versions)
+        return response
+
+    def get_page_cache_tags(self):
+        """ Returns the tags associated with the page to render. """
+        return []
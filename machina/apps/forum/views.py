@@ -6,25 +6,31 @@
 
 """
 
-from django.http import HttpResponseRedirect
-from django.shortcuts import get_object_or_404
+from django.http import Http404, HttpResponseRedirect
 from django.views.generic import ListView
 
 from machina.apps.forum.signals import forum_viewed
 from machina.conf import settings as machina_settings
 from machina.core.db.models import get_model
 from machina.core.loading import get_class
+from machina.core.paginator import CountedPaginator, KeysetPaginator
 
 
 Forum = get_model('forum', 'Forum')
 Topic = get_model('forum_conversation', 'Topic')
 
+AnonymousPageCacheMixin = get_class('forum.viewmixins', 'AnonymousPageCacheMixin')
 ForumVisibilityContentTree = get_class('forum.visibility', 'ForumVisibilityContentTree')
 PermissionRequiredMixin = get_class('forum_permission.viewmixins', 'PermissionRequiredMixin')
 TrackingHandler = get_class('forum_tracking.handler', 'TrackingHandler')
 
+forum_tree_cache = get_class('forum.tree', 'cache')
+page_cache = get_class('forum.cache', 'cache')
+is_trackers_update_pending = get_class(
+    'forum_conversation.trackers', 'is_trackers_update_pending')
 
-class IndexView(ListView):
+
+class IndexView(AnonymousPageCacheMixin, ListView):
     """ Displays the top-level forums. """
 
     context_object_name = 'forums'
@@ -51,8 +57,15 @@ class IndexView(ListView):
 
         return context
 
+    def get_page_cache_tags(self):
+        """ Returns the tags associated with the page to render. """
+        # The forums that will be displayed are not known yet: all the forums are considered. Only
+        # the structure of the tree of forums is used in order not to load the forums before the
+        # versions of the tags are retrieved.
+        return page_cache.get_tags(forum_ids=[n.id for n in forum_tree_cache.get_tree().nodes])
+
 
-class ForumView(PermissionRequiredMixin, ListView):
+class ForumView(AnonymousPageCacheMixin, PermissionRequiredMixin, ListView):
     """ Displays a forum and its topics. If applicable, its sub-forums can also be displayed. """
 
     context_object_name = 'topics'
@@ -74,7 +87,11 @@ class ForumView(PermissionRequiredMixin, ListView):
     def get_forum(self):
         """ Returns the forum to consider. """
         if not hasattr(self, 'forum'):
-            self.forum = get_object_or_404(Forum, pk=self.kwargs['pk'])
+            # The forum is retrieved from the forum registry of the request in order to avoid an
+            # extra query.
+            self.forum = self.request.forum_registry.get(self.kwargs['pk'])
+            if self.forum is None:
+                raise Http404
         return self.forum
 
     def get_queryset(self):
@@ -83,11 +100,41 @@ class ForumView(PermissionRequiredMixin, ListView):
         qs = (
             self.forum.topics
             .exclude(type=Topic.TOPIC_ANNOUNCE)
-            .exclude(approved=False)
+            .filter(approved=True)
             .select_related('poster', 'last_post', 'last_post__poster')
         )
         return qs
 
+    def get_announces(self):
+        """ Returns the announces of the forum, which are displayed on each page of the forum. """
+        if not hasattr(self, 'announces'):
+            self.announces = list(
+                self.get_forum()
+                .topics.select_related('poster', 'last_post', 'last_post__poster')
+                .filter(type=Topic.TOPIC_ANNOUNCE)
+            )
+        return self.announces
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        """ Returns the paginator to use for the topics of the forum.
+
+        The number of topics is given by the topics count of the forum, unless its trackers are
+        stale.
+        """
+        forum = self.get_forum()
+        count = None
+        if not is_trackers_update_pending(forum_ids=[forum.pk, ]):
+            # Announces are not part of the paginated topics but are included in the topics count
+            # of the forum.
+            approved_announces_count = len([t for t in self.get_announces() if t.approved])
+            count = max(forum.direct_topics_count - approved_announces_count, 0)
+        if machina_settings.PAGINATION_MODE != 'keyset':
+            return CountedPaginator(queryset, per_page, count=count, **kwargs)
+        return KeysetPaginator(
+            queryset, per_page, keys=['-type', '-last_post_on', 'id', ], count=count,
+            after=self.request.GET.get('after'), before=self.request.GET.get('before'), **kwargs
+        )
+
     def get_controlled_object(self):
         """ Returns the controlled object. """
         return self.get_forum()
@@ -107,11 +154,7 @@ class ForumView(PermissionRequiredMixin, ListView):
         )
 
         # The announces will be displayed on each page of the forum
-        context['announces'] = list(
-            self.get_forum()
-            .topics.select_related('poster', 'last_post', 'last_post__poster')
-            .filter(type=Topic.TOPIC_ANNOUNCE)
-        )
+        context['announces'] = self.get_announces()
 
         # Determines the topics that have not been read by the current user
         context['unread_topics'] = TrackingHandler(self.request).get_unread_topics(
@@ -120,6 +163,19 @@ class ForumView(PermissionRequiredMixin, ListView):
 
         return context
 
+    def get_page_cache_tags(self):
+        """ Returns the tags associated with the page to render. """
+        # The page displays the sub-forums of the forum and their last posts. Only the structure of
+        # the tree of forums is used in order not to load the forums before the versions of the tags
+        # are retrieved.
+        tree = forum_tree_cache.get_tree()
+        forum_id = int(self.kwargs['pk'])
+        if forum_id not in tree:
+            return []
+        return page_cache.get_tags(
+            forum_ids=[n.id for n in tree.get_descendants(forum_id, include_self=True)],
+        )
+
     def send_signal(self, request, response, forum):
         """ Sends the signal associated with the view. """
         self.view_signal.send(
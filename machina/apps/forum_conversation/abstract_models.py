@@ -8,10 +8,11 @@
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
 from django.utils.encoding import force_text
 from django.utils.text import slugify
+from django.utils.timezone import now
 from django.utils.translation import ugettext_lazy as _
 
 from machina.conf import settings as machina_settings
@@ -23,6 +24,10 @@ from machina.models.fields import MarkupTextField
 
 ApprovedManager = get_class('forum_conversation.managers', 'ApprovedManager')
 
+defer_trackers_update = get_class('forum_conversation.trackers', 'defer_trackers_update')
+is_trackers_update_deferred = get_class(
+    'forum_conversation.trackers', 'is_trackers_update_deferred')
+
 
 class AbstractTopic(DatedModel):
     """ Represents a forum topic. """
@@ -104,6 +109,12 @@ class AbstractTopic(DatedModel):
         app_label = 'forum_conversation'
         ordering = ['-type', '-last_post_on', ]
         get_latest_by = 'last_post_on'
+        indexes = [
+            models.Index(
+                fields=['forum', 'approved', 'type', 'last_post_on', ],
+                name='topic_forum_approved_idx',
+            ),
+        ]
         verbose_name = _('Topic')
         verbose_name_plural = _('Topics')
 
@@ -186,16 +197,78 @@ class AbstractTopic(DatedModel):
         self.forum.update_trackers()
 
     def update_trackers(self):
-        """ Updates the denormalized trackers associated with the topic instance. """
-        self.posts_count = self.posts.filter(approved=True).count()
-        first_post = self.posts.all().order_by('created').first()
-        last_post = self.posts.filter(approved=True).order_by('-created').first()
-        self.first_post = first_post
-        self.last_post = last_post
-        self.last_post_on = last_post.created if last_post else None
-        self._simple_save()
-        # Trigger the forum-level trackers update
-        self.forum.update_trackers()
+        """ Updates the denormalized trackers associated with the topic instance.
+
+        The row of the topic is locked while the trackers are computed (if supported by the
+        database) so that concurrent updates of the trackers of the same topic are serialized and
+        always take into account the posts that were previously committed.
+
+        If trackers updates are deferred, the topic is only recorded and its trackers (and those of
+        its forum) are recomputed when the current transaction is committed.
+        """
+        if is_trackers_update_deferred():
+            defer_trackers_update(topic_ids=[self.pk, ], forum_ids=[self.forum_id, ])
+            return
+
+        with transaction.atomic():
+            self._lock_for_update()
+            self.posts_count = self.posts.filter(approved=True).count()
+            first_post = self.posts.all().order_by('created').first()
+            last_post = self.posts.filter(approved=True).order_by('-created').first()
+            self.first_post = first_post
+            self.last_post = last_post
+            self.last_post_on = last_post.created if last_post else None
+            # The fields that are not related to the trackers (eg. the views count, which is
+            # concurrently incremented) are not written. The subject and the approval flag are
+            # written because they should correspond to the ones of the first post.
+            self._simple_save(update_fields=[
+                'subject', 'approved', 'posts_count', 'first_post', 'last_post', 'last_post_on',
+                'updated',
+            ])
+            # Trigger the forum-level trackers update
+            self.forum.update_trackers()
+
+    def _lock_for_update(self):
+        """ Locks the row of the topic until the end of the current transaction. """
+        list(
+            self.__class__._default_manager.select_for_update()
+            .filter(pk=self.pk).values_list('pk', flat=True)
+        )
+
+    def update_trackers_for_new_post(self, post):
+        """ Updates the denormalized trackers associated with the topic instance for a new post.
+
+        Unlike ``update_trackers``, this method does not recompute the trackers: it should only be
+        used for new approved posts that are not the first post of the topic. The posts count is
+        incremented using a single ``UPDATE`` query and the last post is only replaced if the new
+        post is more recent. The trackers of the forum are then updated in the same way.
+        """
+        is_newer = Q(last_post_on__isnull=True) | Q(last_post_on__lte=post.created)
+        self.__class__._default_manager.filter(pk=self.pk).update(
+            posts_count=F('posts_count') + 1,
+            last_post=Case(
+                When(is_newer, then=Value(post.pk)), default=F('last_post'),
+                output_field=models.IntegerField(),
+            ),
+            last_post_on=Case(
+                When(is_newer, then=Value(post.created)), default=F('last_post_on'),
+                output_field=models.DateTimeField(),
+            ),
+            updated=now(),
+        )
+
+        # Keeps the current instance in sync with the values that were written.
+        self.posts_count += 1
+        if self.last_post_on is None or self.last_post_on <= post.created:
+            last_post_field = self._meta.get_field('last_post')
+            if last_post_field.is_cached(self):
+                last_post_field.delete_cached_value(self)
+            self.last_post_id = post.pk
+            self.last_post_on = post.created
+
+        # Trigger the forum-level trackers update ; only approved topics are considered by forums.
+        if self.approved:
+            self.forum.update_trackers_for_new_post(post)
 
 
 class AbstractPost(DatedModel):
@@ -260,8 +333,19 @@ class AbstractPost(DatedModel):
     class Meta:
         abstract = True
         app_label = 'forum_conversation'
-        ordering = ['created', ]
+        ordering = ['created', 'id', ]
         get_latest_by = 'created'
+        indexes = [
+            models.Index(
+                fields=['topic', 'approved', 'created', ], name='post_topic_approved_idx',
+            ),
+            models.Index(
+                fields=['poster', 'approved', 'created', ], name='post_poster_approved_idx',
+            ),
+            models.Index(
+                fields=['approved', 'notifications_sent', ], name='post_notifications_idx',
+            ),
+        ]
         verbose_name = _('Post')
         verbose_name_plural = _('Posts')
 
@@ -285,9 +369,18 @@ class AbstractPost(DatedModel):
 
     @property
     def position(self):
-        """ Returns an integer corresponding to the position of the post in the topic. """
-        position = self.topic.posts.filter(Q(created__lt=self.created) | Q(id=self.id)).count()
-        return position
+        """ Returns an integer corresponding to the position of the post in the topic.
+
+        Only approved posts are taken into account since they are the only ones displayed in topics.
+        Posts are ordered by creation date and by ID; the position is computed by counting the
+        approved posts that precede the current one, which relies on an index covering the
+        ``(topic, approved, created)`` columns. The position of an unapproved post is the position
+        it would occupy if it was approved.
+        """
+        preceding_posts = self.topic.posts.filter(approved=True).filter(
+            Q(created__lt=self.created) | Q(created=self.created, id__lt=self.id),
+        )
+        return preceding_posts.count() + 1
 
     def clean(self):
         """ Validates the post instance. """
@@ -314,13 +407,31 @@ class AbstractPost(DatedModel):
 
         # Ensures that the subject of the thread corresponds to the one associated
         # with the first post. Do the same with the 'approved' flag.
-        if (new_post and self.topic.first_post is None) or self.is_topic_head:
+        if self.topic.first_post_id is None and is_trackers_update_deferred():
+            # The first post of the topic is only set once the deferred trackers update is
+            # performed: the posts of the topic are used to determine if the post is the first one.
+            is_topic_head = not self.topic.posts.filter(
+                Q(created__lt=self.created) | Q(created=self.created, id__lt=self.id),
+            ).exists()
+        else:
+            is_topic_head = (new_post and self.topic.first_post is None) or self.is_topic_head
+        if is_topic_head:
             if self.subject != self.topic.subject or self.approved != self.topic.approved:
                 self.topic.subject = self.subject
                 self.topic.approved = self.approved
-
-        # Trigger the topic-level trackers update
-        self.topic.update_trackers()
+                if is_trackers_update_deferred():
+                    # These values would otherwise be saved when updating the trackers of the topic.
+                    self.topic._simple_save(update_fields=['subject', 'approved', ])
+
+        # Trigger the topic-level trackers update. The trackers are incrementally updated for new
+        # approved replies if the corresponding update mode is enabled.
+        if (
+            machina_settings.TRACKERS_UPDATE_MODE == 'incremental' and
+            new_post and self.approved and self.topic.first_post_id is not None
+        ):
+            self.topic.update_trackers_for_new_post(self)
+        else:
+            self.topic.update_trackers()
 
     def delete(self, using=None):
         """ Deletes the post instance. """
@@ -0,0 +1,105 @@
+"""
+    Forum conversation cache
+    ========================
+
+    This module defines an abstraction allowing to put the rendered HTML fragments of forum posts
+    into cache.
+
+"""
+
+import hashlib
+
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
+from django.utils.safestring import mark_safe
+from django.utils.timezone import get_current_timezone_name
+from django.utils.translation import get_language
+
+from machina.conf import settings as machina_settings
+from machina.core.loading import get_class
+
+
+get_forum_member_display_name = get_class('forum_member.shortcuts', 'get_forum_member_display_name')
+
+
+class PostFragmentCache:
+    """ The post fragments cache.
+
+    Rendering the posts of a topic page is mostly spent in templates: each post embeds the
+    information of its poster (display name, avatar, signature, posts count) and its attachments.
+    This cache stores the HTML fragments rendered for each post. Fragments are keyed by the ID of
+    the post, its update date and a version of the profile of its poster (computed from the
+    attributes of the profile that are displayed), so that a fragment is never used once the post
+    or the profile of its poster has been updated. Fragments also depend on the active language and
+    time zone. Per-user bits (such as the edit or delete links) should not be part of the cached
+    fragments.
+
+    The cache is disabled unless the ``MACHINA_POST_FRAGMENT_CACHE_NAME`` setting points to a cache
+    configured in the ``CACHES`` setting.
+
+    """
+
+    key_prefix = 'machina_post_fragment'
+
+    @property
+    def enabled(self):
+        """ Returns ``True`` if the post fragments cache is enabled. """
+        return machina_settings.POST_FRAGMENT_CACHE_NAME is not None
+
+    def get_backend(self):
+        """ Returns the associated cache backend. """
+        try:
+            cache = caches[machina_settings.POST_FRAGMENT_CACHE_NAME]
+        except InvalidCacheBackendError:
+            raise ImproperlyConfigured(
+                'The post fragment cache backend ({}) is not configured'.format(
+                    machina_settings.POST_FRAGMENT_CACHE_NAME,
+                ),
+            )
+        return cache
+
+    def get_profile_version(self, post):
+        """ Returns a version of the profile of the poster of the given post. """
+        if post.poster is None:
+            return ''
+        try:
+            profile = post.poster.forum_profile
+        except ObjectDoesNotExist:
+            profile = None
+        values = [get_forum_member_display_name(post.poster)]
+        if profile is not None:
+            values += [
+                profile.avatar.name or '', getattr(profile.signature, 'raw', None) or '',
+                profile.posts_count,
+            ]
+        return hashlib.md5(repr(values).encode()).hexdigest()
+
+    def get_key(self, post, template_name, vary_on=()):
+        """ Returns the key of the fragment rendered using the given template for the given post.
+        """
+        values = [
+            template_name, post.pk, post.updated.timestamp(), self.get_profile_version(post),
+            get_language(), get_current_timezone_name(),
+        ] + list(vary_on)
+        return '{}_{}_{}'.format(
+            self.key_prefix, post.pk, hashlib.md5(repr(values).encode()).hexdigest(),
+        )
+
+    def get_or_render(self, post, template_name, render, vary_on=()):
+        """ Returns the fragment associated with the given post and template.
+
+        The ``render`` callable is used to render the fragment if it is not in the cache.
+        """
+        if not self.enabled:
+            return render()
+
+        backend = self.get_backend()
+        key = self.get_key(post, template_name, vary_on)
+        fragment = backend.get(key)
+        if fragment is None:
+            fragment = render()
+            backend.set(key, str(fragment), machina_settings.POST_FRAGMENT_CACHE_TIMEOUT)
+        return mark_safe(fragment)
+
+
+cache = PostFragmentCache()
@@ -22,8 +22,8 @@ TopicPoll = get_model('forum_polls', 'TopicPoll')
 
 PermissionHandler = get_class('forum_permission.handler', 'PermissionHandler')
 
-get_anonymous_user_forum_key = get_class(
-    'forum_permission.shortcuts', 'get_anonymous_user_forum_key',
+get_or_create_anonymous_user_forum_key = get_class(
+    'forum_permission.shortcuts', 'get_or_create_anonymous_user_forum_key',
 )
 
 
@@ -83,7 +83,7 @@ class PostForm(forms.ModelForm):
             if not self.user.is_anonymous:
                 self.instance.poster = self.user
             else:
-                self.instance.anonymous_key = get_anonymous_user_forum_key(self.user)
+                self.instance.anonymous_key = get_or_create_anonymous_user_forum_key(self.user)
         return super().clean()
 
     def save(self, commit=True):
@@ -104,7 +104,7 @@ class PostForm(forms.ModelForm):
                 post.poster = self.user
             else:
                 post.username = self.cleaned_data['username']
-                post.anonymous_key = get_anonymous_user_forum_key(self.user)
+                post.anonymous_key = get_or_create_anonymous_user_forum_key(self.user)
 
         # Locks the topic if appropriate.
         lock_topic = self.cleaned_data.get('lock_topic', False)
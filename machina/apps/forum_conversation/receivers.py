@@ -6,13 +6,83 @@
 
 """
 
+from django.core.exceptions import ObjectDoesNotExist
 from django.db.models import F
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from machina.apps.forum_conversation.signals import topic_viewed
+from machina.core.db.models import get_model
+from machina.core.loading import get_class
+
+
+Attachment = get_model('forum_attachments', 'Attachment')
+Post = get_model('forum_conversation', 'Post')
+Topic = get_model('forum_conversation', 'Topic')
+TopicPoll = get_model('forum_polls', 'TopicPoll')
+TopicPollOption = get_model('forum_polls', 'TopicPollOption')
+TopicPollVote = get_model('forum_polls', 'TopicPollVote')
+
+page_cache = get_class('forum.cache', 'cache')
 
 
 @receiver(topic_viewed)
 def update_topic_counter(sender, topic, user, request, response, **kwargs):
     """ Handles the update of the views counter associated with topics. """
     topic.__class__._default_manager.filter(id=topic.id).update(views_count=F('views_count') + 1)
+
+
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+def invalidate_page_cache_on_topic_change(sender, instance, **kwargs):
+    """ Invalidates the cached pages displaying a topic when it is saved or deleted. """
+    page_cache.invalidate(
+        page_cache.get_tags(forum_ids=[instance.forum_id, ], topic_ids=[instance.pk, ]),
+    )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_page_cache_on_post_change(sender, instance, **kwargs):
+    """ Invalidates the cached pages displaying a post when it is saved or deleted. """
+    try:
+        forum_ids = [instance.topic.forum_id, ]
+    except ObjectDoesNotExist:
+        # The topic of the post was deleted: the related pages are invalidated by the receiver
+        # handling the deletion of the topic.
+        forum_ids = []
+    page_cache.invalidate(
+        page_cache.get_tags(forum_ids=forum_ids, topic_ids=[instance.topic_id, ]),
+    )
+
+
+@receiver(post_save, sender=Attachment)
+@receiver(post_delete, sender=Attachment)
+def invalidate_page_cache_on_attachment_change(sender, instance, **kwargs):
+    """ Invalidates the cached pages displaying an attachment when it is saved or deleted. """
+    try:
+        page_cache.invalidate(page_cache.get_tags(topic_ids=[instance.post.topic_id, ]))
+    except ObjectDoesNotExist:
+        # The post of the attachment was deleted.
+        pass
+
+
+@receiver(post_save, sender=TopicPoll)
+@receiver(post_delete, sender=TopicPoll)
+def invalidate_page_cache_on_poll_change(sender, instance, **kwargs):
+    """ Invalidates the cached pages displaying a poll when it is saved or deleted. """
+    page_cache.invalidate(page_cache.get_tags(topic_ids=[instance.topic_id, ]))
+
+
+@receiver(post_save, sender=TopicPollOption)
+@receiver(post_delete, sender=TopicPollOption)
+@receiver(post_save, sender=TopicPollVote)
+@receiver(post_delete, sender=TopicPollVote)
+def invalidate_page_cache_on_poll_option_change(sender, instance, **kwargs):
+    """ Invalidates the cached pages displaying a poll when its options or votes change. """
+    try:
+        poll_option = instance if isinstance(instance, TopicPollOption) else instance.poll_option
+        page_cache.invalidate(page_cache.get_tags(topic_ids=[poll_option.poll.topic_id, ]))
+    except ObjectDoesNotExist:
+        # The poll was deleted.
+        pass
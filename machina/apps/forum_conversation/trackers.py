@@ -0,0 +1,212 @@
+"""
+    Forum conversation trackers
+    ===========================
+
+    This module provides functions allowing to recompute the denormalized trackers of topics and
+    forums (posts counts, first and last posts, ...) using set-based queries, and to defer such
+    recomputations until the current transaction is committed.
+
+"""
+
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from machina.conf import settings as machina_settings
+from machina.core.db.models import get_model
+from machina.core.loading import get_class
+
+
+def get_topic_trackers():
+    """ Returns the expressions allowing to compute the trackers of topics in ``UPDATE`` queries.
+
+    The returned dictionary associates the names of the tracker fields of the ``Topic`` model with
+    expressions relying on subqueries.
+    """
+    Post = get_model('forum_conversation', 'Post')
+
+    posts = Post.objects.filter(topic=OuterRef('pk')).order_by()
+    approved_posts = posts.filter(approved=True)
+    last_approved_posts = approved_posts.order_by('-created', '-pk')
+
+    return {
+        'posts_count': Coalesce(
+            Subquery(
+                approved_posts.values('topic').annotate(count=Count('pk')).values('count'),
+                output_field=models.IntegerField(),
+            ),
+            0,
+        ),
+        'first_post': Subquery(posts.order_by('created', 'pk').values('pk')[:1]),
+        'last_post': Subquery(last_approved_posts.values('pk')[:1]),
+        'last_post_on': Subquery(last_approved_posts.values('created')[:1]),
+    }
+
+
+def get_forum_trackers():
+    """ Returns the expressions allowing to compute the trackers of forums in ``UPDATE`` queries.
+
+    The returned dictionary associates the names of the tracker fields of the ``Forum`` model with
+    expressions relying on subqueries. These expressions rely on the trackers of topics.
+    """
+    Topic = get_model('forum_conversation', 'Topic')
+
+    approved_topics = Topic.objects.filter(forum=OuterRef('pk'), approved=True).order_by()
+    last_topics = approved_topics.filter(last_post_on__isnull=False).order_by(
+        F('last_post_on').desc(), '-pk',
+    )
+
+    return {
+        'direct_topics_count': Coalesce(
+            Subquery(
+                approved_topics.values('forum').annotate(count=Count('pk')).values('count'),
+                output_field=models.IntegerField(),
+            ),
+            0,
+        ),
+        'direct_posts_count': Coalesce(
+            Subquery(
+                approved_topics.values('forum').annotate(total=Sum('posts_count')).values('total'),
+                output_field=models.IntegerField(),
+            ),
+            0,
+        ),
+        'last_post': Subquery(last_topics.values('last_post')[:1]),
+        'last_post_on': Subquery(last_topics.values('last_post_on')[:1]),
+    }
+
+
+def get_forum_profile_trackers():
+    """ Returns the expressions allowing to compute the trackers of forum profiles in ``UPDATE``
+        queries.
+    """
+    Post = get_model('forum_conversation', 'Post')
+
+    approved_posts = Post.objects.filter(poster=OuterRef('user'), approved=True).order_by()
+
+    return {
+        'posts_count': Coalesce(
+            Subquery(
+                approved_posts.values('poster').annotate(count=Count('pk')).values('count'),
+                output_field=models.IntegerField(),
+            ),
+            0,
+        ),
+    }
+
+
+def get_drifted_objects_count(queryset, trackers):
+    """ Returns the number of objects whose trackers differ from the values that can be computed
+        using the given tracker expressions.
+    """
+    names = list(trackers)
+    attnames = [queryset.model._meta.get_field(name).attname for name in names]
+    computed_names = ['computed_{}'.format(name) for name in names]
+    values = (
+        queryset.order_by()
+        .annotate(**{'computed_{}'.format(name): trackers[name] for name in names})
+        .values_list(*(attnames + computed_names))
+    )
+    return sum(
+        1 for row in values.iterator()
+        if row[:len(attnames)] != row[len(attnames):]
+    )
+
+
+def recompute_topic_trackers(topic_ids):
+    """ Recomputes the trackers of the topics whose IDs are given using a single query. """
+    Topic = get_model('forum_conversation', 'Topic')
+    return Topic.objects.filter(pk__in=topic_ids).update(**get_topic_trackers())
+
+
+def recompute_forum_trackers(forum_ids):
+    """ Recomputes the trackers of the forums whose IDs are given using a single query. """
+    Forum = get_model('forum', 'Forum')
+    return Forum.objects.filter(pk__in=forum_ids).update(**get_forum_trackers())
+
+
+def is_trackers_update_deferred():
+    """ Returns ``True`` if trackers updates should be deferred until the end of the transaction.
+
+    This is the case if the ``MACHINA_TRACKERS_UPDATE_MODE`` setting is set to ``'deferred'`` and
+    if a transaction is in progress.
+    """
+    return (
+        machina_settings.TRACKERS_UPDATE_MODE == 'deferred' and
+        transaction.get_connection().in_atomic_block
+    )
+
+
+def defer_trackers_update(topic_ids=(), forum_ids=()):
+    """ Records topics and forums whose trackers should be recomputed at commit time.
+
+    All the topics and forums recorded during a transaction are recomputed once, using set-based
+    queries, when the transaction is committed. The recorded topics and forums are discarded if the
+    transaction (or the savepoint in which they were recorded) is rolled back.
+    """
+    connection = transaction.get_connection()
+    savepoint_ids = set(connection.savepoint_ids)
+    for update_savepoint_ids, update in _get_pending_updates():
+        if update_savepoint_ids == savepoint_ids:
+            break
+    else:
+        # The callback is registered once for the current transaction (or savepoint).
+        update = DeferredTrackersUpdate()
+        transaction.on_commit(update)
+    update.topic_ids.update(topic_ids)
+    update.forum_ids.update(forum_ids)
+
+
+def is_trackers_update_pending(topic_ids=(), forum_ids=()):
+    """ Returns ``True`` if the trackers of one of the given topics or forums are stale.
+
+    This is the case if the recomputation of these trackers was deferred until the end of the
+    current transaction and has not been performed yet.
+    """
+    return any(
+        not update.topic_ids.isdisjoint(topic_ids) or not update.forum_ids.isdisjoint(forum_ids)
+        for _, update in _get_pending_updates()
+    )
+
+
+class DeferredTrackersUpdate:
+    """ Recomputes the trackers of the recorded topics and forums when it is called.
+
+    Instances of this class are registered as ``on_commit`` callbacks: the recorded topics and
+    forums are thus tied to the transaction (or the savepoint) in which they were recorded and are
+    discarded by Django if it is rolled back.
+    """
+
+    def __init__(self):
+        self.topic_ids = set()
+        self.forum_ids = set()
+
+    def __call__(self):
+        topic_ids, forum_ids = set(self.topic_ids), set(self.forum_ids)
+        self.topic_ids.clear()
+        self.forum_ids.clear()
+        if not topic_ids and not forum_ids:
+            return
+
+        with transaction.atomic():
+            # Topics are considered first because the trackers of forums depend on them.
+            if topic_ids:
+                recompute_topic_trackers(topic_ids)
+            if forum_ids:
+                recompute_forum_trackers(forum_ids)
+
+        # The trackers are updated using UPDATE queries: the pages displaying them are invalidated
+        # explicitly.
+        page_cache = get_class('forum.cache', 'cache')
+        page_cache.invalidate(page_cache.get_tags(forum_ids=forum_ids, topic_ids=topic_ids))
+
+
+def _get_pending_updates():
+    # The deferred updates are retrieved from the callbacks that will be executed when the current
+    # transaction is committed: Django drops the callbacks of rolled back transactions and
+    # savepoints.
+    connection = transaction.get_connection()
+    return [
+        (savepoint_ids, func) for savepoint_ids, func in connection.run_on_commit
+        if isinstance(func, DeferredTrackersUpdate)
+    ]
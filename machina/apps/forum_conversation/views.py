@@ -19,6 +19,7 @@ from machina.apps.forum_conversation.signals import topic_viewed
 from machina.conf import settings as machina_settings
 from machina.core.db.models import get_model
 from machina.core.loading import get_class
+from machina.core.paginator import CountedPaginator, KeysetPaginator
 
 
 Attachment = get_model('forum_attachments', 'Attachment')
@@ -34,11 +35,15 @@ TopicPollOptionFormset = get_class('forum_polls.forms', 'TopicPollOptionFormset'
 TopicPollVoteForm = get_class('forum_polls.forms', 'TopicPollVoteForm')
 
 attachments_cache = get_class('forum_attachments.cache', 'cache')
+page_cache = get_class('forum.cache', 'cache')
+is_trackers_update_pending = get_class(
+    'forum_conversation.trackers', 'is_trackers_update_pending')
 
+AnonymousPageCacheMixin = get_class('forum.viewmixins', 'AnonymousPageCacheMixin')
 PermissionRequiredMixin = get_class('forum_permission.viewmixins', 'PermissionRequiredMixin')
 
 
-class TopicView(PermissionRequiredMixin, ListView):
+class TopicView(AnonymousPageCacheMixin, PermissionRequiredMixin, ListView):
     """ Displays a forum topic. """
 
     context_object_name = 'posts'
@@ -57,7 +62,9 @@ class TopicView(PermissionRequiredMixin, ListView):
         if requested_post:
             try:
                 assert requested_post.isdigit()
-                post = topic.posts.get(pk=requested_post)
+                post = topic.posts.only('id', 'topic', 'created', 'approved').get(
+                    pk=requested_post,
+                )
                 requested_page = (
                     ((post.position - 1) // machina_settings.TOPIC_POSTS_NUMBER_PER_PAGE) + 1
                 )
@@ -84,12 +91,28 @@ class TopicView(PermissionRequiredMixin, ListView):
         qs = (
             self.topic.posts
             .all()
-            .exclude(approved=False)
+            .filter(approved=True)
             .select_related('poster', 'updated_by')
             .prefetch_related('attachments', 'poster__forum_profile')
         )
         return qs
 
+    def get_paginator(self, queryset, per_page, **kwargs):
+        """ Returns the paginator to use for the posts of the topic.
+
+        The number of posts is given by the posts count of the topic, unless its trackers are stale.
+        """
+        topic = self.get_topic()
+        count = (
+            topic.posts_count if not is_trackers_update_pending(topic_ids=[topic.pk, ]) else None
+        )
+        if machina_settings.PAGINATION_MODE != 'keyset':
+            return CountedPaginator(queryset, per_page, count=count, **kwargs)
+        return KeysetPaginator(
+            queryset, per_page, keys=['created', 'id', ], count=count,
+            after=self.request.GET.get('after'), before=self.request.GET.get('before'), **kwargs
+        )
+
     def get_controlled_object(self):
         """ Returns the controlled object. """
         return self.get_topic().forum
@@ -103,6 +126,16 @@ class TopicView(PermissionRequiredMixin, ListView):
         context['topic'] = topic
         context['forum'] = topic.forum
 
+        # Computes the permissions of the current user for the considered topic and posts once in
+        # order to avoid performing the same checks for each displayed post.
+        permission_handler = self.request.forum_permission_handler
+        context['topic_permissions'] = permission_handler.get_topic_permissions(
+            [topic], self.request.user,
+        ).get(topic.id, {})
+        context['post_permissions'] = permission_handler.get_post_permissions(
+            context['posts'], self.request.user,
+        )
+
         # Handles the case when a poll is associated to the topic
         try:
             if hasattr(topic, 'poll') and topic.poll.options.exists():
@@ -115,6 +148,19 @@ class TopicView(PermissionRequiredMixin, ListView):
 
         return context
 
+    def get_page_cache_tags(self):
+        """ Returns the tags associated with the page to render. """
+        # The page displays the profiles of the posters of the displayed posts. The posts that will
+        # be displayed are not known yet: the posters of all the posts of the topic are considered.
+        # The topic itself is not loaded before the versions of the tags are retrieved.
+        topic_id = int(self.kwargs['pk'])
+        poster_ids = (
+            Post.objects.filter(topic_id=topic_id, approved=True, poster__isnull=False)
+            .values_list('poster_id', flat=True)
+            .distinct()
+        )
+        return page_cache.get_tags(topic_ids=[topic_id, ], user_ids=poster_ids)
+
     def send_signal(self, request, response, topic):
         """ Sends the signal associated with the view. """
         self.view_signal.send(
@@ -9,10 +9,11 @@
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ObjectDoesNotExist
 from django.db.models import F
-from django.db.models.signals import post_delete, pre_save, post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
 from machina.core.db.models import get_model
+from machina.core.loading import get_class
 
 
 User = get_user_model()
@@ -21,6 +22,8 @@ Post = get_model('forum_conversation', 'Post')
 Topic = get_model('forum_conversation', 'Topic')
 ForumProfile = get_model('forum_member', 'ForumProfile')
 
+page_cache = get_class('forum.cache', 'cache')
+
 
 @receiver(post_save, sender=Topic)
 def auto_subscribe(sender, instance, created, raw, **kwargs):
@@ -179,3 +182,15 @@ def auto_subscribe_to_topic_for_post(sender, instance, raw, created, **kwargs):
 
     if hasattr(poster, 'forum_profile') and poster.forum_profile.auto_subscribe_posts:
         poster.topic_subscriptions.add(instance.topic)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=ForumProfile)
+@receiver(post_delete, sender=ForumProfile)
+def invalidate_page_cache_on_profile_change(sender, instance, **kwargs):
+    """ Invalidates the cached pages displaying a member when their profile is updated.
+
+    This includes the updates of the posts count of the member.
+    """
+    user_id = instance.pk if isinstance(instance, User) else instance.user_id
+    page_cache.invalidate(page_cache.get_tags(user_ids=[user_id, ]))
@@ -51,7 +51,7 @@ class UserPostsView(ListView):
         """ Returns the list of items for this view. """
         # Determines the forums that can be accessed by the current user
         forums = self.request.forum_permission_handler.get_readable_forums(
-            Forum.objects.all(), self.request.user,
+            self.request.forum_registry.forums, self.request.user,
         )
 
         # Returns the posts submitted by the considered user.
@@ -98,7 +98,7 @@ class ForumProfileDetailView(DetailView):
 
         # Fetches the recent posts added by the considered user
         forums = self.request.forum_permission_handler.get_readable_forums(
-            Forum.objects.all(), self.request.user,
+            self.request.forum_registry.forums, self.request.user,
         )
         recent_posts = (
             Post.approved_objects
@@ -148,3 +148,47 @@ class AbstractGroupForumPermission(BaseAuthForumPermission):
         if self.forum:
             return '{} - {} - {}'.format(self.permission, self.group, self.forum)
         return '{} - {}'.format(self.permission, self.group)
+
+
+class AbstractEffectiveForumPermission(models.Model):
+    """ Represents the effective forum permissions of a user (anonymous or not).
+
+    Effective forum permissions are materialized combinations of the user forum permissions, the
+    group forum permissions and the default authenticated user forum permissions that apply to a
+    specific user. The granted permissions are stored as a bitmask (see ``PermissionBitmasks``)
+    along with the version of the layout of this bitmask: bitmasks stored for another layout (eg.
+    before permissions were added to the configuration) are ignored and computed again. An instance
+    whose forum is null defines the permissions that are granted for all the forums that are not
+    associated with another instance for the considered user. Since null values are distinct in
+    unique constraints, partial unique indexes covering the instances of anonymous users and the
+    instances whose forum is null are created by the migrations on PostgreSQL and SQLite.
+
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.CASCADE,
+        verbose_name=_('User'),
+    )
+    anonymous_user = models.BooleanField(
+        verbose_name=_('Target anonymous user'), default=False, db_index=True,
+    )
+    forum = models.ForeignKey(
+        'forum.Forum', blank=True, null=True, on_delete=models.CASCADE, verbose_name=_('Forum'),
+    )
+    perms_mask = models.BigIntegerField(verbose_name=_('Permissions bitmask'), default=0)
+    perms_layout = models.CharField(
+        max_length=32, blank=True, verbose_name=_('Permissions bitmask layout'),
+    )
+
+    class Meta:
+        abstract = True
+        unique_together = ('user', 'forum', )
+        app_label = 'forum_permission'
+        verbose_name = _('Effective forum permission')
+        verbose_name_plural = _('Effective forum permissions')
+
+    def __str__(self):
+        user = self.user if not self.anonymous_user else _('Anonymous user')
+        if self.forum:
+            return '{} - {}'.format(user, self.forum)
+        return '{}'.format(user)
@@ -0,0 +1,92 @@
+"""
+    Forum permission bitmasks
+    =========================
+
+    This module defines a ``PermissionBitmasks`` abstraction that allows to represent sets of forum
+    permission codenames as integer bitmasks.
+
+"""
+
+import collections
+import hashlib
+
+from machina.core.loading import get_class
+
+
+PermissionConfig = get_class('forum_permission.defaults', 'PermissionConfig')
+
+
+class PermissionBitmasks:
+    """ Maps forum permission codenames to integer bits.
+
+    Each permission codename defined by the ``PermissionConfig`` class is associated with a single
+    bit. The mapping only depends on the order of the permissions defined in the configuration so
+    it is stable between processes. This allows to grant, deny or merge permissions using single
+    integer operations and to store per-forum permissions in a compact way.
+
+    Codenames that are not defined in the ``PermissionConfig`` class are not associated with any bit
+    and are thus never considered as granted.
+
+    """
+
+    def __init__(self, codenames=None):
+        self.codenames = tuple(
+            codenames if codenames is not None
+            else (p['fields']['codename'] for p in PermissionConfig.permissions)
+        )
+        self._bits = {codename: 1 << i for i, codename in enumerate(self.codenames)}
+
+    @property
+    def layout_version(self):
+        """ Returns a version identifying the bits associated with the permission codenames.
+
+        This version changes whenever permissions are added, removed or reordered in the
+        configuration. It allows to detect bitmasks that were stored for another layout.
+        """
+        return hashlib.md5(','.join(self.codenames).encode()).hexdigest()
+
+    @property
+    def full_mask(self):
+        """ Returns the bitmask containing all the permission codenames. """
+        return (1 << len(self.codenames)) - 1
+
+    def get_bit(self, codename):
+        """ Returns the bit associated with the given codename (``0`` for unknown codenames). """
+        return self._bits.get(codename, 0)
+
+    def get_mask(self, codenames):
+        """ Returns the bitmask corresponding to the given codenames. """
+        mask = 0
+        for codename in codenames:
+            mask |= self._bits.get(codename, 0)
+        return mask
+
+    def get_codenames(self, mask):
+        """ Returns the set of codenames corresponding to the given bitmask. """
+        return frozenset(c for c in self.codenames if mask & self._bits[c])
+
+    def split_rows(self, rows):
+        """ Splits permission rows into global and per-forum bitmasks.
+
+        Each row should be a ``(forum_id, codename, has_perm)`` tuple. A three-tuple is returned:
+        the first element is the bitmask of globally granted permissions (global permissions that
+        are not granted are not considered), the second one is a dictionary associating forum IDs
+        with the bitmasks of granted permissions and the last one is a dictionary associating forum
+        IDs with the bitmasks of non granted permissions.
+        """
+        global_mask = 0
+        per_forum_granted_masks = collections.defaultdict(int)
+        per_forum_nongranted_masks = collections.defaultdict(int)
+        for forum_id, codename, has_perm in rows:
+            bit = self._bits.get(codename, 0)
+            if forum_id is None:
+                if has_perm:
+                    global_mask |= bit
+            elif has_perm:
+                per_forum_granted_masks[forum_id] |= bit
+            else:
+                per_forum_nongranted_masks[forum_id] |= bit
+        return global_mask, per_forum_granted_masks, per_forum_nongranted_masks
+
+
+bitmasks = PermissionBitmasks()
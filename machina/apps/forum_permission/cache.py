@@ -0,0 +1,146 @@
+"""
+    Forum permission cache
+    ======================
+
+    This module defines an abstraction allowing to share computed forum permissions between
+    requests by relying on one of the caches configured through Django's cache framework.
+
+"""
+
+import threading
+import time
+
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.exceptions import ImproperlyConfigured
+
+from machina.conf import settings as machina_settings
+
+
+class PermissionCache:
+    """ The cross-request permissions cache.
+
+    The permission cache stores the results of permission computations (eg. the forums that are
+    granted to a user for a given list of permission codenames, or the permission codenames that
+    are granted to a user for a given forum). All the stored values are keyed by a permission
+    "generation" number: any change to user/group forum permissions, to group memberships or to the
+    forum tree bumps this number, which makes all the previously stored values unreachable.
+
+    The cache is disabled unless the ``MACHINA_PERMISSION_CACHE_NAME`` setting points to a cache
+    configured in the ``CACHES`` setting.
+
+    Values that are shared by many users (eg. the permissions of anonymous users) can also be kept
+    in a process-wide snapshot. The snapshot is tied to the current generation number: it is
+    dropped as soon as the generation number changes, so that such values can be retrieved without
+    hitting the cache backend again.
+
+    """
+
+    generation_key = 'machina_permissions_generation'
+    key_prefix = 'machina_permissions'
+
+    def __init__(self):
+        self._snapshot_generation = None
+        self._snapshot = {}
+        self._snapshot_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """ Returns ``True`` if the permission cache is enabled. """
+        return machina_settings.PERMISSION_CACHE_NAME is not None
+
+    def get_backend(self):
+        """ Returns the associated cache backend. """
+        try:
+            cache = caches[machina_settings.PERMISSION_CACHE_NAME]
+        except InvalidCacheBackendError:
+            raise ImproperlyConfigured(
+                'The permission cache backend ({}) is not configured'.format(
+                    machina_settings.PERMISSION_CACHE_NAME,
+                ),
+            )
+        return cache
+
+    def get_generation(self):
+        """ Returns the current permission generation number. """
+        backend = self.get_backend()
+        generation = backend.get(self.generation_key)
+        if generation is None:
+            # The initial generation number is derived from the current time in order to ensure that
+            # values stored for a previous generation cannot be reached again if the generation
+            # number is evicted from the cache.
+            backend.add(self.generation_key, self._get_initial_generation(), None)
+            generation = backend.get(self.generation_key)
+        return generation
+
+    def bump_generation(self):
+        """ Increments the permission generation number, invalidating all the stored values. """
+        self.clear_snapshot()
+        if not self.enabled:
+            return
+        backend = self.get_backend()
+        try:
+            backend.incr(self.generation_key)
+        except ValueError:
+            backend.set(self.generation_key, self._get_initial_generation(), None)
+
+    def get_principal_key(self, user):
+        """ Returns a string identifying the given user in the keys of the stored values. """
+        return 'anonymous' if user.is_anonymous else 'user:{}'.format(user.id)
+
+    def get(self, generation, key, snapshot=False):
+        """ Returns the value stored for the given generation number and key.
+
+        If ``snapshot`` is set, the value is first looked up in the process-wide snapshot and the
+        value retrieved from the cache backend is added to the snapshot.
+        """
+        if snapshot:
+            value = self._get_snapshot_value(generation, key)
+            if value is not None:
+                return value
+
+        value = self.get_backend().get(self._make_key(generation, key))
+
+        if snapshot and value is not None:
+            self._set_snapshot_value(generation, key, value)
+
+        return value
+
+    def set(self, generation, key, value, snapshot=False):
+        """ Stores a value for the given generation number and key.
+
+        If ``snapshot`` is set, the value is also added to the process-wide snapshot.
+        """
+        self.get_backend().set(
+            self._make_key(generation, key), value, machina_settings.PERMISSION_CACHE_TIMEOUT,
+        )
+        if snapshot:
+            self._set_snapshot_value(generation, key, value)
+
+    def clear_snapshot(self):
+        """ Drops all the values of the process-wide snapshot. """
+        with self._snapshot_lock:
+            self._snapshot_generation = None
+            self._snapshot = {}
+
+    def _get_snapshot_value(self, generation, key):
+        with self._snapshot_lock:
+            if self._snapshot_generation != generation:
+                return None
+            return self._snapshot.get(key)
+
+    def _set_snapshot_value(self, generation, key, value):
+        with self._snapshot_lock:
+            if self._snapshot_generation != generation:
+                # The values of previous generations are obsolete.
+                self._snapshot_generation = generation
+                self._snapshot = {}
+            self._snapshot[key] = value
+
+    def _get_initial_generation(self):
+        return int(time.time() * 1000)
+
+    def _make_key(self, generation, key):
+        return '{}:{}:{}'.format(self.key_prefix, generation, key)
+
+
+cache = PermissionCache()
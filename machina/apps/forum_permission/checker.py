@@ -8,16 +8,92 @@
 """
 
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Value
 
 from machina.conf import settings as machina_settings
 from machina.core.db.models import get_model
+from machina.core.loading import get_class
 
 
+EffectiveForumPermission = get_model('forum_permission', 'EffectiveForumPermission')
 ForumPermission = get_model('forum_permission', 'ForumPermission')
 GroupForumPermission = get_model('forum_permission', 'GroupForumPermission')
 UserForumPermission = get_model('forum_permission', 'UserForumPermission')
 
+bitmasks = get_class('forum_permission.bitmasks', 'bitmasks')
+permission_cache = get_class('forum_permission.cache', 'cache')
+
+
+class ForumPermissionMatrix:
+    """ Represents the permissions granted to a user for each forum.
+
+    A ``ForumPermissionMatrix`` is computed once from all the user and group forum permissions
+    associated with a user. Granted permissions are stored as integer bitmasks (see
+    ``PermissionBitmasks``). Each forum that has specific permissions for the considered user (or
+    for their groups) gets its own bitmask ; all the other forums share the bitmask of the
+    permissions that are granted globally. This allows to retrieve the permissions of a user for any
+    forum without hitting the database.
+
+    """
+
+    def __init__(self, default_mask=0, per_forum_masks=None):
+        # The "default_mask" argument should contain the bitmask of the permissions that are granted
+        # for forums without any specific permission while the "per_forum_masks" argument should be
+        # a dictionary associating forum IDs with the bitmasks of granted permissions.
+        self.default_mask = default_mask
+        self.per_forum_masks = per_forum_masks or {}
+
+    @classmethod
+    def from_rows(cls, user_rows, group_rows=None, default_authenticated_perms=None):
+        """ Initializes a ``ForumPermissionMatrix`` instance from permission rows.
+
+        Each row should be a ``(forum_id, codename, has_perm)`` tuple. The permissions specified by
+        the ``default_authenticated_perms`` argument are used as user global permissions if no such
+        permissions are granted to the user.
+        """
+        user_global_mask, user_granted, user_nongranted = bitmasks.split_rows(user_rows)
+        group_global_mask, group_granted, group_nongranted = bitmasks.split_rows(group_rows or [])
+
+        # If the considered user have no global permissions, the default permissions are used
+        # instead.
+        if not user_global_mask and default_authenticated_perms:
+            user_global_mask = bitmasks.get_mask(default_authenticated_perms)
+
+        per_forum_masks = {}
+        forum_ids = (
+            set(user_granted) | set(user_nongranted) | set(group_granted) | set(group_nongranted)
+        )
+        for forum_id in forum_ids:
+            # Explicitly granted permissions always take precedence over the same non granted
+            # permissions while the permissions that are not granted to the user cannot be granted
+            # by their groups.
+            granted_user_mask = (
+                (user_global_mask & ~user_nongranted[forum_id]) | user_granted[forum_id]
+            )
+            granted_group_mask = (
+                ((group_global_mask & ~group_nongranted[forum_id]) | group_granted[forum_id]) &
+                ~user_nongranted[forum_id]
+            )
+            per_forum_masks[forum_id] = granted_user_mask | granted_group_mask
+
+        return cls(
+            default_mask=user_global_mask | group_global_mask, per_forum_masks=per_forum_masks,
+        )
+
+    def get_mask(self, forum_id):
+        """ Returns the bitmask of the permissions that are granted for the given forum ID. """
+        return self.per_forum_masks.get(forum_id, self.default_mask)
+
+    def get_perms(self, forum_id):
+        """ Returns the permission codenames that are granted for the given forum ID. """
+        return bitmasks.get_codenames(self.get_mask(forum_id))
+
+    def has_perm(self, forum_id, perm):
+        """ Returns ``True`` if the given permission codename is granted for the given forum ID. """
+        bit = bitmasks.get_bit(perm)
+        return bool(bit) and bool(self.get_mask(forum_id) & bit)
+
 
 class ForumPermissionChecker:
     """ The ForumPermissionChecker allows to check forum permissions on Forum instances. """
@@ -34,7 +110,7 @@ class ForumPermissionChecker:
         elif self.user and self.user.is_superuser:
             # The superuser have all permissions
             return True
-        return perm in self.get_perms(forum)
+        return self.get_permission_matrix().has_perm(forum.id, perm)
 
     def get_perms(self, forum):
         """ Returns the list of permission codenames of all permissions for the given forum. """
@@ -42,114 +118,265 @@ class ForumPermissionChecker:
         if not self.user.is_anonymous and not self.user.is_active:
             return []
 
-        user_model = get_user_model()
-        user_groups_related_name = user_model.groups.field.related_query_name()
-
         if forum.id not in self._forum_perms_cache:
             if self.user and self.user.is_superuser:
                 # The superuser has all the permissions.
                 perms = list(ForumPermission.objects.values_list('codename', flat=True))
             elif self.user:
-                default_auth_forum_perms = (
-                    machina_settings.DEFAULT_AUTHENTICATED_USER_FORUM_PERMISSIONS
-                )
+                perms = self.get_permission_matrix().get_perms(forum.id)
+
+            self._forum_perms_cache[forum.id] = perms
+
+        return self._forum_perms_cache[forum.id]
 
+    def get_permission_matrix(self):
+        """ Returns the ``ForumPermissionMatrix`` instance associated with the considered user.
+
+        All the user and group forum permissions associated with the user are fetched using a single
+        query. The resulting matrix can be shared between requests if the permission cache is
+        enabled.
+        """
+        if not hasattr(self, '_permission_matrix'):
+            shared_cache_key = 'perms_matrix:{}'.format(self.get_principal_key())
+            snapshot = self.has_shared_permissions()
+            matrix = self._get_shared_cache_value(shared_cache_key, snapshot=snapshot)
+            if matrix is None:
+                matrix = self._compute_permission_matrix()
+                self._set_shared_cache_value(shared_cache_key, matrix, snapshot=snapshot)
+            self._permission_matrix = matrix
+        return self._permission_matrix
+
+    def get_principal_key(self):
+        """ Returns a string identifying the permissions of the considered user in the cache keys.
+
+        If the permission cache is enabled, registered users without user forum permissions are
+        identified by the sorted IDs of their groups: all these users share the same permissions as
+        long as they belong to the same groups. This allows the values computed for one of these
+        users to be reused for all the others.
+        """
+        if self.user.is_anonymous or not self.has_shared_permissions():
+            return permission_cache.get_principal_key(self.user)
+        _, group_ids = self._get_user_permission_layer()
+        return 'groups:{}'.format(','.join(str(group_id) for group_id in group_ids))
+
+    def has_shared_permissions(self):
+        """ Returns ``True`` if the permissions of the user are shared with other users.
+
+        This is the case for anonymous users and, if the permission cache is enabled, for registered
+        users without user forum permissions. The values computed for such users are also kept in
+        the process-wide snapshot of the permission cache.
+        """
+        if self.user.is_anonymous:
+            return True
+        elif self._get_permission_cache_generation() is None:
+            return False
+        user_rows, _ = self._get_user_permission_layer()
+        return not user_rows
+
+    def get_permission_rows(self, perm_codenames=None):
+        """ Returns the user and group forum permission rows associated with the considered user.
+
+        A two-tuple of lists is returned: the first list contains the user permission rows and the
+        second one contains the group permission rows. Each row is a ``(forum_id, codename,
+        has_perm)`` tuple. Both kinds of permissions are fetched using a single query. The rows can
+        be restricted to the given permission codenames.
+
+        If the permission cache is enabled, the group permission rows are shared between all the
+        users that belong to the same groups and only the user permission rows (if any) are fetched
+        for each user.
+        """
+        if self._get_permission_cache_generation() is None:
+            return self._fetch_permission_rows(perm_codenames)
+
+        user_rows, group_ids = self._get_user_permission_layer()
+        group_rows = self._get_group_permission_layer(group_ids)
+        if perm_codenames is not None:
+            perm_codenames = set(perm_codenames)
+            user_rows = [r for r in user_rows if r[1] in perm_codenames]
+            group_rows = [r for r in group_rows if r[1] in perm_codenames]
+        return list(user_rows), list(group_rows)
+
+    def _fetch_permission_rows(self, perm_codenames=None):
+        """ Fetches the user and group forum permission rows using a single query. """
+        user_kwargs_filter = (
+            {'anonymous_user': True} if self.user.is_anonymous else {'user': self.user}
+        )
+        codenames_filter = (
+            {'permission__codename__in': perm_codenames} if perm_codenames is not None else {}
+        )
+
+        # Fetches the permissions of the considered user. The permissions of its groups are fetched
+        # using the same query if the user is a registered user.
+        rows = (
+            UserForumPermission.objects
+            .filter(**user_kwargs_filter)
+            .filter(**codenames_filter)
+            .annotate(from_group=Value(False, output_field=BooleanField()))
+            .values_list('forum_id', 'permission__codename', 'has_perm', 'from_group')
+        )
+        if not self.user.is_anonymous:
+            user_model = get_user_model()
+            user_groups_related_name = user_model.groups.field.related_query_name()
+            rows = rows.union(
+                GroupForumPermission.objects
+                .filter(**{'group__{}'.format(user_groups_related_name): self.user})
+                .filter(**codenames_filter)
+                .annotate(from_group=Value(True, output_field=BooleanField()))
+                .values_list('forum_id', 'permission__codename', 'has_perm', 'from_group'),
+                all=True,
+            )
+
+        user_rows, group_rows = [], []
+        for forum_id, codename, has_perm, from_group in rows:
+            (group_rows if from_group else user_rows).append((forum_id, codename, has_perm))
+
+        return user_rows, group_rows
+
+    def _get_user_permission_layer(self):
+        """ Returns the user permission rows and the sorted group IDs of the considered user. """
+        if not hasattr(self, '_user_permission_layer'):
+            shared_cache_key = 'user_layer:{}'.format(
+                permission_cache.get_principal_key(self.user),
+            )
+            layer = self._get_shared_cache_value(shared_cache_key, snapshot=self.user.is_anonymous)
+            if layer is None:
                 user_kwargs_filter = (
-                    {'anonymous_user': True} if self.user.is_anonymous
-                    else {'user': self.user}
+                    {'anonymous_user': True} if self.user.is_anonymous else {'user': self.user}
                 )
-
-                # Fetches the permissions of the considered user for the given forum.
-                user_perms = (
-                    UserForumPermission.objects.select_related()
+                user_rows = tuple(
+                    UserForumPermission.objects
                     .filter(**user_kwargs_filter)
-                    .filter(Q(forum__isnull=True) | Q(forum=forum))
+                    .values_list('forum_id', 'permission__codename', 'has_perm')
                 )
-
-                # Computes the list of permissions that are granted for all the forums.
-                globally_granted_user_perms = list(
-                    filter(lambda p: p.has_perm and p.forum_id is None, user_perms)
+                group_ids = (
+                    tuple(sorted(self.user.groups.values_list('id', flat=True)))
+                    if not self.user.is_anonymous else ()
                 )
-                globally_granted_user_perms = [
-                    p.permission.codename for p in globally_granted_user_perms
-                ]
-
-                # Computes the list of permissions that are granted on a per-forum basis.
-                per_forum_granted_user_perms = list(
-                    filter(lambda p: p.has_perm and p.forum_id is not None, user_perms)
+                layer = (user_rows, group_ids)
+                self._set_shared_cache_value(
+                    shared_cache_key, layer, snapshot=self.user.is_anonymous,
                 )
-                per_forum_granted_user_perms = [
-                    p.permission.codename for p in per_forum_granted_user_perms
-                ]
+            self._user_permission_layer = layer
+        return self._user_permission_layer
 
-                # Computes the list of permissions that are not granted on a per-forum basis.
-                per_forum_nongranted_user_perms = list(
-                    filter(lambda p: not p.has_perm and p.forum_id is not None, user_perms)
-                )
-                per_forum_nongranted_user_perms = [
-                    p.permission.codename for p in per_forum_nongranted_user_perms
-                ]
-
-                # If the considered user have no global permissions, the permissions defined by the
-                # DEFAULT_AUTHENTICATED_USER_FORUM_PERMISSIONS settings are used instead.
-                if self.user.is_authenticated and not globally_granted_user_perms:
-                    globally_granted_user_perms = default_auth_forum_perms
-
-                # Finally computes the list of permission codenames that are granted to the user for
-                # the considered forum.
-                granted_user_perms = [
-                    c for c in globally_granted_user_perms if
-                    c not in per_forum_nongranted_user_perms
-                ]
-                granted_user_perms += per_forum_granted_user_perms
-                granted_user_perms = set(granted_user_perms)
-
-                perms = granted_user_perms
-
-                # If the user is a registered user, we have to check the permissions of its groups
-                # in order to determine the additional permissions they could have.
-                if not self.user.is_anonymous:
-                    group_perms = (
-                        GroupForumPermission.objects.select_related()
-                        .filter(**{'group__{}'.format(user_groups_related_name): self.user})
-                        .filter(Q(forum__isnull=True) | Q(forum=forum))
-                    )
-
-                    globally_granted_group_perms = list(
-                        filter(lambda p: p.has_perm and p.forum_id is None, group_perms)
-                    )
-                    globally_granted_group_perms = [
-                        p.permission.codename for p in globally_granted_group_perms
-                    ]
-
-                    per_forum_granted_group_perms = list(
-                        filter(lambda p: p.has_perm and p.forum_id is not None, group_perms)
-                    )
-                    per_forum_granted_group_perms = [
-                        p.permission.codename for p in per_forum_granted_group_perms
-                    ]
-
-                    per_forum_nongranted_group_perms = list(
-                        filter(lambda p: not p.has_perm and p.forum_id is not None, group_perms)
-                    )
-                    per_forum_nongranted_group_perms = [
-                        p.permission.codename for p in per_forum_nongranted_group_perms
-                    ]
-
-                    granted_group_perms = [
-                        c for c in globally_granted_group_perms if
-                        c not in per_forum_nongranted_group_perms
-                    ]
-                    granted_group_perms += per_forum_granted_group_perms
-                    granted_group_perms = filter(
-                        lambda x: x not in per_forum_nongranted_user_perms, granted_group_perms
-                    )
-                    granted_group_perms = set(granted_group_perms)
-
-                    # Includes the permissions granted for the user' groups in the initial set of
-                    # permission codenames.
-                    perms |= granted_group_perms
+    def _get_group_permission_layer(self, group_ids):
+        """ Returns the group permission rows associated with the given group IDs. """
+        if not group_ids:
+            return ()
+        shared_cache_key = 'group_layer:{}'.format(','.join(str(i) for i in group_ids))
+        # The group permission rows are shared by all the users belonging to the same groups so they
+        # are also kept in the process-wide snapshot of the permission cache.
+        group_rows = self._get_shared_cache_value(shared_cache_key, snapshot=True)
+        if group_rows is None:
+            group_rows = tuple(
+                GroupForumPermission.objects
+                .filter(group_id__in=group_ids)
+                .values_list('forum_id', 'permission__codename', 'has_perm')
+            )
+            self._set_shared_cache_value(shared_cache_key, group_rows, snapshot=True)
+        return group_rows
 
-            self._forum_perms_cache[forum.id] = perms
+    def rebuild_effective_permissions(self):
+        """ Computes the permissions of the considered user and stores them as effective forum
+            permissions.
 
-        return self._forum_perms_cache[forum.id]
+        The ``ForumPermissionMatrix`` instance that was stored is returned.
+        """
+        matrix = self._compute_permission_matrix_from_rows()
+        principal_kwargs = self._get_effective_permissions_principal_kwargs()
+        layout = bitmasks.layout_version
+        effective_perms = [
+            EffectiveForumPermission(
+                forum_id=None, perms_mask=matrix.default_mask, perms_layout=layout,
+                **principal_kwargs
+            ),
+        ]
+        effective_perms.extend(
+            EffectiveForumPermission(
+                forum_id=forum_id, perms_mask=mask, perms_layout=layout, **principal_kwargs
+            )
+            for forum_id, mask in matrix.per_forum_masks.items()
+        )
+        try:
+            with transaction.atomic():
+                EffectiveForumPermission.objects.filter(**principal_kwargs).delete()
+                EffectiveForumPermission.objects.bulk_create(effective_perms)
+        except IntegrityError:
+            # The effective forum permissions of the user were stored concurrently.
+            pass
+        return matrix
+
+    def _compute_permission_matrix(self):
+        """ Computes the ``ForumPermissionMatrix`` instance associated with the considered user.
+
+        If effective forum permissions are enabled, the matrix is loaded from the effective forum
+        permissions of the user using a single indexed query. These effective permissions are
+        computed and stored if they don't exist yet.
+        """
+        if machina_settings.EFFECTIVE_FORUM_PERMISSIONS:
+            matrix = self._load_effective_permission_matrix()
+            return matrix if matrix is not None else self.rebuild_effective_permissions()
+        return self._compute_permission_matrix_from_rows()
+
+    def _compute_permission_matrix_from_rows(self):
+        """ Computes the ``ForumPermissionMatrix`` instance using the forum permission rows. """
+        user_rows, group_rows = self.get_permission_rows()
+        return ForumPermissionMatrix.from_rows(
+            user_rows, group_rows,
+            default_authenticated_perms=(
+                machina_settings.DEFAULT_AUTHENTICATED_USER_FORUM_PERMISSIONS
+                if self.user.is_authenticated else None
+            ),
+        )
+
+    def _load_effective_permission_matrix(self):
+        """ Loads the ``ForumPermissionMatrix`` instance from the effective forum permissions.
+
+        ``None`` is returned if the effective forum permissions of the user were not computed yet,
+        if they were computed for another layout of the permission bitmasks or if they contain
+        duplicate rows (which can be stored by concurrent requests on databases that do not support
+        partial unique indexes, such as MySQL).
+        """
+        default_mask, per_forum_masks = None, {}
+        rows_count = 0
+        for forum_id, perms_mask in (
+            EffectiveForumPermission.objects
+            .filter(
+                perms_layout=bitmasks.layout_version,
+                **self._get_effective_permissions_principal_kwargs()
+            )
+            .values_list('forum_id', 'perms_mask')
+        ):
+            rows_count += 1
+            if forum_id is None:
+                default_mask = perms_mask
+            else:
+                per_forum_masks[forum_id] = perms_mask
+        if default_mask is None or rows_count != len(per_forum_masks) + 1:
+            return None
+        return ForumPermissionMatrix(default_mask=default_mask, per_forum_masks=per_forum_masks)
+
+    def _get_effective_permissions_principal_kwargs(self):
+        return {'anonymous_user': True} if self.user.is_anonymous else {'user': self.user}
+
+    def _get_shared_cache_value(self, key, snapshot=False):
+        """ Returns the value stored for the given key in the cross-request permission cache. """
+        generation = self._get_permission_cache_generation()
+        return (
+            permission_cache.get(generation, key, snapshot=snapshot)
+            if generation is not None else None
+        )
+
+    def _set_shared_cache_value(self, key, value, snapshot=False):
+        """ Stores a value for the given key in the cross-request permission cache. """
+        generation = self._get_permission_cache_generation()
+        if generation is not None:
+            permission_cache.set(generation, key, value, snapshot=snapshot)
+
+    def _get_permission_cache_generation(self):
+        """ Returns the permission generation number to use for the lifetime of the checker. """
+        if not hasattr(self, '_permission_cache_generation'):
+            self._permission_cache_generation = (
+                permission_cache.get_generation() if permission_cache.enabled else None
+            )
+        return self._permission_cache_generation
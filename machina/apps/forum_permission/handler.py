@@ -7,14 +7,12 @@
 
 """
 
-import collections
 import datetime as dt
-from functools import reduce
 
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import Exists, OuterRef, Q
 from django.utils.timezone import now
-from mptt.utils import get_cached_trees
 
 from machina.conf import settings as machina_settings
 from machina.core.db.models import get_model
@@ -32,6 +30,10 @@ ForumPermissionChecker = get_class('forum_permission.checker', 'ForumPermissionC
 get_anonymous_user_forum_key = get_class(
     'forum_permission.shortcuts', 'get_anonymous_user_forum_key')
 
+bitmasks = get_class('forum_permission.bitmasks', 'bitmasks')
+forum_tree_cache = get_class('forum.tree', 'cache')
+permission_cache = get_class('forum_permission.cache', 'cache')
+
 
 class PermissionHandler:
     """ Defines filter / access logic related to forums.
@@ -42,7 +44,11 @@ class PermissionHandler:
 
     """
 
-    def __init__(self):
+    def __init__(self, forum_registry=None):
+        # The forum registry (if any) provides the forums that are considered by the handler. This
+        # allows to share the same forum instances with other components during a request.
+        self.forum_registry = forum_registry
+
         # This dictionary will store the forums that are granted for a specific lit of permission
         # codenames and a given user.
         self._granted_forums_cache = {}
@@ -61,15 +67,30 @@ class PermissionHandler:
     def forum_list_filter(self, qs, user):
         """ Filters the given queryset in order to return a list of forums that can be seen and read
             by the specified user (at least).
+
+        Querysets (and managers) are filtered in the database. Any other iterable of forums (eg. a
+        list of forums that were already fetched) is filtered in memory without performing extra
+        queries.
         """
         # Any superuser should see all the forums
         if user.is_superuser:
             return qs
 
-        # Check whether the forums can be viewed by the given user
-        forums_to_hide = self._get_hidden_forum_ids(qs, user)
+        # Check whether the forums can be viewed by the given user. The visible forums are computed
+        # in memory so the IDs of the forums to keep (or to hide) can be used directly.
+        visible_forum_ids, hidden_forum_ids = self._get_visible_and_hidden_forum_ids(user)
+
+        if isinstance(qs, (models.Manager, models.QuerySet)):
+            if not hidden_forum_ids:
+                return qs.all()
+            # The shortest list of IDs is used in order to keep the generated SQL query small.
+            return (
+                qs.filter(id__in=visible_forum_ids)
+                if len(visible_forum_ids) <= len(hidden_forum_ids)
+                else qs.exclude(id__in=hidden_forum_ids)
+            )
 
-        return qs.exclude(id__in=forums_to_hide)
+        return [f for f in qs if f.id in visible_forum_ids]
 
     def get_readable_forums(self, forums, user):
         """ Returns a queryset of forums that can be read by the considered user. """
@@ -78,11 +99,11 @@ class PermissionHandler:
             return forums
 
         # Fetches the forums that can be read by the given user.
-        readable_forums = self._get_forums_for_user(
+        readable_forum_ids = self._get_granted_forum_ids(
             user, ['can_read_forum', ], use_tree_hierarchy=True)
-        return forums.filter(id__in=[f.id for f in readable_forums]) \
+        return forums.filter(id__in=readable_forum_ids) \
             if isinstance(forums, (models.Manager, models.QuerySet)) \
-            else list(filter(lambda f: f in readable_forums, forums))
+            else list(filter(lambda f: f.id in readable_forum_ids, forums))
 
     # Verification methods
     # --
@@ -185,6 +206,10 @@ class PermissionHandler:
             forum_key = get_anonymous_user_forum_key(user)
             if forum_key:
                 user_votes = user_votes.filter(anonymous_key=forum_key)
+            elif hasattr(user, 'forum_key_factory'):
+                # The anonymous user has no forum key yet: they did not vote in the considered poll
+                # and a forum key will be created for them if they do.
+                user_votes = user_votes.none()
             else:
                 # If the forum key of the anonymous user cannot be retrieved, the user should not be
                 # allowed to vote in the considered poll.
@@ -310,9 +335,129 @@ class PermissionHandler:
         """ Given a forum, checks whether the user can approve its posts. """
         return self._perform_basic_permission_check(forum, user, 'can_approve_posts')
 
+    # Bulk verification methods
+    # --
+
+    def get_post_permissions(self, posts, user):
+        """ Returns the permissions of the user for each of the given posts.
+
+        A dictionary associating each post ID with a dictionary of permission flags
+        (``can_edit_post`` and ``can_delete_post``) is returned. The flags are computed in one pass
+        using the permissions of the user for the forums of the considered posts ; they correspond
+        to the results of the ``can_edit_post`` and ``can_delete_post`` methods. If one of these
+        methods is overridden by a subclass, it is called to compute the corresponding flag.
+        """
+        can_edit_own_posts_bit = bitmasks.get_bit('can_edit_own_posts')
+        can_edit_posts_bit = bitmasks.get_bit('can_edit_posts')
+        can_delete_own_posts_bit = bitmasks.get_bit('can_delete_own_posts')
+        can_delete_posts_bit = bitmasks.get_bit('can_delete_posts')
+        forum_key = None if user.is_authenticated else get_anonymous_user_forum_key(user)
+        overridden_methods = self._get_overridden_methods(['can_edit_post', 'can_delete_post'])
+
+        post_permissions = {}
+        for post in posts:
+            topic = post.topic
+            forum_mask = self._get_forum_perms_mask(topic.forum_id, user)
+            is_author = (
+                (post.poster_id == user.id) if user.is_authenticated else
+                (post.anonymous_key is not None and post.anonymous_key == forum_key)
+            )
+            post_permissions[post.id] = {
+                'can_edit_post': bool(
+                    (
+                        is_author and forum_mask & can_edit_own_posts_bit and
+                        not topic.is_locked
+                    ) or
+                    forum_mask & can_edit_posts_bit
+                ),
+                'can_delete_post': bool(
+                    (is_author and forum_mask & can_delete_own_posts_bit) or
+                    forum_mask & can_delete_posts_bit
+                ),
+            }
+            for method_name in overridden_methods:
+                post_permissions[post.id][method_name] = getattr(self, method_name)(post, user)
+        return post_permissions
+
+    def get_topic_permissions(self, topics, user):
+        """ Returns the permissions of the user for each of the given topics.
+
+        A dictionary associating each topic ID with a dictionary of permission flags is returned.
+        The keys of these dictionaries correspond to the names of the following methods:
+        ``can_add_post``, ``can_subscribe_to_topic``, ``can_unsubscribe_from_topic``,
+        ``can_lock_topics``, ``can_move_topics``, ``can_delete_topics``,
+        ``can_update_topics_to_normal_topics``, ``can_update_topics_to_sticky_topics`` and
+        ``can_update_topics_to_announces``. The flags are computed in one pass and the topic
+        subscriptions of the user are fetched using a single query. If one of these methods is
+        overridden by a subclass, it is called to compute the corresponding flag.
+        """
+        topics = list(topics)
+        get_bit = bitmasks.get_bit
+        overridden_topic_methods = self._get_overridden_methods(
+            ['can_add_post', 'can_subscribe_to_topic', 'can_unsubscribe_from_topic'],
+        )
+        overridden_forum_methods = self._get_overridden_methods([
+            'can_lock_topics', 'can_move_topics', 'can_delete_topics',
+            'can_update_topics_to_normal_topics', 'can_update_topics_to_sticky_topics',
+            'can_update_topics_to_announces',
+        ])
+
+        # Fetches the IDs of the topics the user is subscribed to.
+        subscribed_topic_ids = set()
+        if user.is_authenticated and topics:
+            subscribed_topic_ids = set(
+                user.topic_subscriptions
+                .filter(id__in=[t.id for t in topics])
+                .values_list('id', flat=True)
+            )
+
+        topic_permissions = {}
+        for topic in topics:
+            forum_mask = self._get_forum_perms_mask(topic.forum_id, user)
+            can_read_forum = bool(forum_mask & get_bit('can_read_forum'))
+            can_edit_posts = bool(forum_mask & get_bit('can_edit_posts'))
+            is_subscriber = topic.id in subscribed_topic_ids
+            topic_permissions[topic.id] = {
+                'can_add_post': bool(
+                    forum_mask & get_bit('can_reply_to_topics') and
+                    (not topic.is_locked or forum_mask & get_bit('can_reply_to_locked_topics'))
+                ),
+                'can_subscribe_to_topic': (
+                    user.is_authenticated and not is_subscriber and can_read_forum
+                ),
+                'can_unsubscribe_from_topic': (
+                    user.is_authenticated and is_subscriber and can_read_forum
+                ),
+                'can_lock_topics': bool(forum_mask & get_bit('can_lock_topics')),
+                'can_move_topics': bool(forum_mask & get_bit('can_move_topics')),
+                'can_delete_topics': bool(forum_mask & get_bit('can_delete_posts')),
+                'can_update_topics_to_normal_topics': can_edit_posts,
+                'can_update_topics_to_sticky_topics': (
+                    can_edit_posts and bool(forum_mask & get_bit('can_post_stickies'))
+                ),
+                'can_update_topics_to_announces': (
+                    can_edit_posts and bool(forum_mask & get_bit('can_post_announcements'))
+                ),
+            }
+            for method_name in overridden_topic_methods:
+                topic_permissions[topic.id][method_name] = getattr(self, method_name)(topic, user)
+            for method_name in overridden_forum_methods:
+                topic_permissions[topic.id][method_name] = getattr(self, method_name)(
+                    topic.forum, user,
+                )
+        return topic_permissions
+
     # Common
     # --
 
+    def _get_overridden_methods(self, method_names):
+        """ Returns the names of the given methods that are overridden by the class of the handler.
+        """
+        return [
+            name for name in method_names
+            if getattr(type(self), name) is not getattr(PermissionHandler, name)
+        ]
+
     def _is_post_author(self, post, user):
         return (
             (post.poster == user) if user.is_authenticated else
@@ -322,14 +467,17 @@ class PermissionHandler:
             )
         )
 
-    def _get_hidden_forum_ids(self, forums, user):
-        """ Given a set of forums and a user, returns the list of forums that are not visible by
-            this user.
+    def _get_visible_and_hidden_forum_ids(self, user):
+        """ Given a user, returns the set of IDs of the forums that are visible by this user and the
+            set of IDs of the forums that are not visible by this user.
         """
-        visible_forums = self._get_forums_for_user(
+        visible_forum_ids = self._get_granted_forum_ids(
             user, ['can_see_forum', 'can_read_forum', ], use_tree_hierarchy=True,
         )
-        return forums.exclude(id__in=[f.id for f in visible_forums])
+        hidden_forum_ids = {
+            n.id for n in self._get_forum_tree().nodes if n.id not in visible_forum_ids
+        }
+        return visible_forum_ids, hidden_forum_ids
 
     def _get_forums_for_user(self, user, perm_codenames, use_tree_hierarchy=False):
         """ Returns all the forums that satisfy the given list of permission codenames.
@@ -340,164 +488,206 @@ class PermissionHandler:
         that a forum which has an ancestor which is not in the granted forums set will not be
         returned.
         """
-        granted_forums_cache_key = '{}__{}'.format(
+        granted_forum_ids = self._get_granted_forum_ids(user, perm_codenames, use_tree_hierarchy)
+        return [f for f in self._get_all_forums() if f.id in granted_forum_ids]
+
+    def _get_granted_forum_ids(self, user, perm_codenames, use_tree_hierarchy=False):
+        """ Returns the IDs of all the forums that satisfy the given list of permission codenames.
+
+        Granted forums are computed using the structure of the tree of forums only, so forum
+        instances don't need to be fetched from the database.
+        """
+        granted_forums_cache_key = '{}__{}__{}'.format(
             ':'.join(perm_codenames), user.id if not user.is_anonymous else 'anonymous',
+            int(use_tree_hierarchy),
         )
 
         if granted_forums_cache_key in self._granted_forums_cache:
             return self._granted_forums_cache[granted_forums_cache_key]
 
-        forums = self._get_all_forums()
+        nodes = self._get_forum_tree().nodes
 
-        # First check if the user is a superuser and if so, returns the forum queryset immediately.
+        # First check if the user is a superuser and if so, returns all the forums immediately.
         if user.is_superuser:  # pragma: no cover
-            forum_objects = forums
+            granted_forum_ids = frozenset(n.id for n in nodes)
 
         else:
-            # Generates the appropriate queryset filter in order to handle both authenticated users
-            # and anonymous users.
-            user_kwargs_filter = {'anonymous_user': True} if user.is_anonymous else {'user': user}
-
-            # Get all the user permissions for the considered user.
-            user_perms = (
-                UserForumPermission.objects
-                .filter(**user_kwargs_filter)
-                .filter(permission__codename__in=perm_codenames)
-            )
-
-            # The first thing to do is to compute three lists of permissions: one containing only
-            # globally granted permissions, one containing granted permissions (these permissions
-            # are associated with specific forums) and one containing non granted permissions (the
-            # latest are also associated with specific forums).
-            globally_granted_user_perms = list(
-                filter(lambda p: p.has_perm and p.forum_id is None, user_perms)
-            )
-            per_forum_granted_user_perms = list(
-                filter(lambda p: p.has_perm and p.forum_id is not None, user_perms)
+            # The granted forums can be shared between requests if the permission cache is enabled.
+            # The forums granted to users whose permissions are shared with other users (eg.
+            # anonymous users) are also kept in the process-wide snapshot of the permission cache.
+            checker = self._get_checker(user)
+            shared_cache_key = 'granted_forums:{}:{}:{}'.format(
+                checker.get_principal_key(), ':'.join(perm_codenames), int(use_tree_hierarchy),
             )
-            per_forum_nongranted_user_perms = list(
-                filter(lambda p: not p.has_perm and p.forum_id is not None, user_perms)
-            )
-
-            # Using the previous lists we are able to compute a list of forums ids for which
-            # permissions are explicitly not granted. It should be noted that any permission that is
-            # explicitely set for a user will not be considered as non granted if a "non granted"
-            # permission also exists. The explicitly granted permissions always win precedence.
-            granted_user_forum_ids = [p.forum_id for p in per_forum_granted_user_perms]
-            nongranted_forum_ids = [
-                p.forum_id for p in per_forum_nongranted_user_perms
-                if p.forum_id not in granted_user_forum_ids
-            ]
-
-            required_perm_codenames_count = len(perm_codenames)
-            initial_forum_ids = [f.id for f in forums]
-
-            # Now we build a dictionary allowing to associate each forum ID of the initial queryset
-            # with a set of permissions that are granted for the considered forum.
-            granted_permissions_per_forum = collections.defaultdict(set)
-            for perm in per_forum_granted_user_perms:
-                granted_permissions_per_forum[perm.forum_id].add(perm.permission_id)
-            for forum_id in initial_forum_ids:
-                granted_permissions_per_forum[forum_id].update(
-                    [perm.permission_id for perm in globally_granted_user_perms]
-                )
-
-            if not user.is_anonymous:
-                user_model = get_user_model()
+            snapshot = checker.has_shared_permissions()
+            granted_forum_ids = self._get_shared_cache_value(shared_cache_key, snapshot=snapshot)
 
-                # Get all the group permissions for the considered user.
-                group_perms = (
-                    GroupForumPermission.objects
-                    .filter(
-                        **{
-                            'group__{0}'.format(user_model.groups.field.related_query_name()): user
-                        }
+            if granted_forum_ids is None:
+                granted_forum_ids = frozenset(
+                    n.id for n in self._compute_forums_for_user(
+                        user, nodes, perm_codenames, use_tree_hierarchy,
                     )
-                    .filter(permission__codename__in=perm_codenames)
                 )
-
-                # Again, we compute three lists of permissions. But this time we are considering
-                # group permissions. The first list contains only globally granted permissions. The
-                # second one contains only granted permissions that are associated with specific
-                # forums. The third list contains non granted permissions.
-                globally_granted_group_perms = list(
-                    filter(lambda p: p.has_perm and p.forum_id is None, group_perms)
-                )
-                per_forum_granted_group_perms = list(
-                    filter(lambda p: p.has_perm and p.forum_id is not None, group_perms)
-                )
-                per_forum_nongranted_group_perms = list(
-                    filter(lambda p: not p.has_perm and p.forum_id is not None, group_perms)
+                self._set_shared_cache_value(
+                    shared_cache_key, granted_forum_ids, snapshot=snapshot,
                 )
 
-                # Now we can update the list of forums ids for which permissions are explicitly not
-                # granted.
-                granted_group_forum_ids = [p.forum_id for p in per_forum_granted_group_perms]
-                nongranted_forum_ids += [
-                    p.forum_id for p in per_forum_nongranted_group_perms
-                    if p.forum_id not in granted_group_forum_ids
-                ]
-
-                # Now we will update our previous dictionary that associated each forum ID with a
-                # set of granted permissions (at the user level). We will update it with the new
-                # permissions we've computed for the user's groups.
-                for perm in per_forum_granted_group_perms:
-                    granted_permissions_per_forum[perm.forum_id].add(perm.permission_id)
-                for forum_id in initial_forum_ids:
-                    granted_permissions_per_forum[forum_id].update(
-                        [perm.permission_id for perm in globally_granted_group_perms]
-                    )
+        self._granted_forums_cache[granted_forums_cache_key] = granted_forum_ids
+        return granted_forum_ids
 
-            # We keep only the forum IDs for which the length of the set containing the granted
-            # permissions is equal to the number of initial permission codenames. The other forums
-            # have not all the required granted permissions, so we just throw them away.
-            for forum_id in list(granted_permissions_per_forum):
-                if len(granted_permissions_per_forum[forum_id]) < required_perm_codenames_count:
-                    del granted_permissions_per_forum[forum_id]
-
-            # Alright! It is now possible to filter the initial queryset using the forums associated
-            # with the granted permissions and the list of forums for which permissions are
-            # explicitly not granted.
-            forum_objects = [
-                f for f in forums
-                if f.id in granted_permissions_per_forum and f.id not in nongranted_forum_ids
-            ]
-
-            if (
-                not user.is_anonymous and
-                set(perm_codenames).issubset(
-                    set(machina_settings.DEFAULT_AUTHENTICATED_USER_FORUM_PERMISSIONS)
-                )
-            ):
-                forum_objects += [
-                    f for f in forums if f.id not in nongranted_forum_ids and f not in forum_objects
-                ]
+    def _compute_forums_for_user(self, user, forums, perm_codenames, use_tree_hierarchy):
+        """ Computes the forums that satisfy the given list of permission codenames for a user.
 
+        The considered forums can be forum instances or ``ForumTreeNode`` instances. This method
+        always hits the database in order to fetch the user and group forum permissions that should
+        be considered. Permissions are combined using the bitmasks provided by the
+        ``PermissionBitmasks`` class.
+        """
+        if machina_settings.PERMISSION_RESOLUTION == 'database':
+            granted_forum_ids = self._compute_granted_forum_ids_in_database(user, perm_codenames)
+            forum_objects = [f for f in forums if f.id in granted_forum_ids]
             if use_tree_hierarchy:
                 forum_objects = self._filter_granted_forums_using_tree(forum_objects)
+            return forum_objects
+
+        required_perms_mask = bitmasks.get_mask(perm_codenames)
+
+        # Fetches the user permissions and the group permissions (for registered users) that are
+        # related to the considered permission codenames.
+        user_rows, group_rows = self._get_checker(user).get_permission_rows(perm_codenames)
+
+        # The first thing to do is to compute the bitmask of globally granted permissions, the
+        # bitmasks of granted permissions (these permissions are associated with specific forums)
+        # and the bitmasks of non granted permissions (the latest are also associated with specific
+        # forums). This is done for both user permissions and group permissions.
+        user_global_mask, user_granted, user_nongranted = bitmasks.split_rows(user_rows)
+        group_global_mask, group_granted, group_nongranted = bitmasks.split_rows(group_rows)
+
+        # Using the previous bitmasks we are able to compute a set of forums ids for which
+        # permissions are explicitly not granted. It should be noted that any permission that is
+        # explicitely set for a user (or a group) will not be considered as non granted if a "non
+        # granted" permission also exists. The explicitly granted permissions always win precedence.
+        nongranted_forum_ids = {
+            forum_id for forum_id in user_nongranted if not user_granted.get(forum_id)
+        }
+        nongranted_forum_ids.update(
+            forum_id for forum_id in group_nongranted if not group_granted.get(forum_id)
+        )
+
+        # We keep only the forums for which the bitmask of granted permissions contains all the
+        # required permissions and which are not associated with explicitly non granted permissions.
+        global_mask = user_global_mask | group_global_mask
+        forum_objects = [
+            f for f in forums
+            if (
+                (global_mask | user_granted.get(f.id, 0) | group_granted.get(f.id, 0)) &
+                required_perms_mask
+            ) == required_perms_mask and f.id not in nongranted_forum_ids
+        ]
+
+        if (
+            not user.is_anonymous and
+            set(perm_codenames).issubset(
+                set(machina_settings.DEFAULT_AUTHENTICATED_USER_FORUM_PERMISSIONS)
+            )
+        ):
+            forum_objects = [f for f in forums if f.id not in nongranted_forum_ids]
+
+        if use_tree_hierarchy:
+            forum_objects = self._filter_granted_forums_using_tree(forum_objects)
 
-        self._granted_forums_cache[granted_forums_cache_key] = forum_objects
         return forum_objects
 
-    def _filter_granted_forums_using_tree(self, granted_forums):
-        top_nodes = self._get_top_nodes()
-        d = reduce(
-            lambda a, b: a + self._filter_granted_node_using_tree(b, granted_forums), top_nodes, []
+    def _compute_granted_forum_ids_in_database(self, user, perm_codenames):
+        """ Computes the IDs of the forums that satisfy the given list of permission codenames.
+
+        The same rules as the ones used by the ``_compute_forums_for_user`` method are applied but
+        the forum permissions are resolved by the database using a single query: each forum is
+        annotated with ``EXISTS`` subqueries over the user and group forum permissions so that only
+        the IDs of the granted forums are returned.
+        """
+        user_perms = UserForumPermission.objects.filter(
+            **({'anonymous_user': True} if user.is_anonymous else {'user': user})
+        )
+        perms_layers = [('user', user_perms)]
+        if not user.is_anonymous:
+            user_groups_related_name = get_user_model().groups.field.related_query_name()
+            perms_layers.append((
+                'group',
+                GroupForumPermission.objects.filter(
+                    **{'group__{}'.format(user_groups_related_name): user}
+                ),
+            ))
+
+        annotations = {}
+        nongranted_filter = None
+        required_perms_filter = Q()
+        default_perms_apply = (
+            not user.is_anonymous and
+            set(perm_codenames).issubset(
+                set(machina_settings.DEFAULT_AUTHENTICATED_USER_FORUM_PERMISSIONS)
+            )
         )
-        return Forum.objects.filter(id__in=d)
 
-    def _filter_granted_node_using_tree(self, f, granted_forums):
-        if f in granted_forums:
-            return [f.id, ] + reduce(
-                lambda a, b: a + self._filter_granted_node_using_tree(b, granted_forums),
-                f.get_children(), []
+        for layer_name, perms in perms_layers:
+            # A forum is not granted if at least one of the considered permissions is explicitly
+            # not granted for this forum, unless another one is explicitly granted for this forum
+            # at the same level (user or group).
+            forum_perms = perms.filter(
+                forum=OuterRef('pk'), permission__codename__in=perm_codenames,
+            )
+            granted_name = '{}_granted'.format(layer_name)
+            nongranted_name = '{}_nongranted'.format(layer_name)
+            annotations[granted_name] = Exists(forum_perms.filter(has_perm=True))
+            annotations[nongranted_name] = Exists(forum_perms.filter(has_perm=False))
+            layer_nongranted_filter = Q(**{nongranted_name: True, granted_name: False})
+            nongranted_filter = (
+                layer_nongranted_filter if nongranted_filter is None
+                else nongranted_filter | layer_nongranted_filter
             )
-        return []
 
-    def _get_top_nodes(self):
-        if not hasattr(self, '_top_nodes'):
-            self._top_nodes = get_cached_trees(Forum.objects.all())
-        return self._top_nodes
+        if not default_perms_apply:
+            # Each required permission must be granted globally or for the considered forum, either
+            # to the user or to one of their groups.
+            for i, codename in enumerate(perm_codenames):
+                codename_filter = Q()
+                for layer_name, perms in perms_layers:
+                    name = '{}_has_perm_{}'.format(layer_name, i)
+                    annotations[name] = Exists(
+                        perms.filter(
+                            Q(forum=OuterRef('pk')) | Q(forum__isnull=True),
+                            permission__codename=codename, has_perm=True,
+                        ),
+                    )
+                    codename_filter |= Q(**{name: True})
+                required_perms_filter &= codename_filter
+
+        return set(
+            Forum.objects
+            .annotate(**annotations)
+            .filter(required_perms_filter & ~nongranted_filter)
+            .values_list('id', flat=True)
+        )
+
+    def _filter_granted_forums_using_tree(self, granted_forums):
+        """ Removes the granted forums that have an ancestor which is not granted.
+
+        A single pass is performed over all the forums sorted by tree ID and left value: the
+        ``lft``/``rght`` interval of each forum which is not granted is used to skip its whole
+        subtree. The returned list contains the granted forums that are kept.
+        """
+        granted_forums_by_id = {f.id: f for f in granted_forums}
+        filtered_forums = []
+        skipped_tree_id, skipped_rght = None, None
+        for node in self._get_forum_tree().nodes:
+            if node.tree_id == skipped_tree_id and node.lft < skipped_rght:
+                # The forum is a descendant of a forum which is not granted.
+                continue
+            if node.id in granted_forums_by_id:
+                filtered_forums.append(granted_forums_by_id[node.id])
+            else:
+                skipped_tree_id, skipped_rght = node.tree_id, node.rght
+        return filtered_forums
 
     def _perform_basic_permission_check(self, forum, user, permission):
         """ Given a forum and a user, checks whether the latter has the passed permission.
@@ -516,6 +706,15 @@ class PermissionHandler:
         check = (user.is_superuser or checker.has_perm(permission, forum))
         return check
 
+    def _get_forum_perms_mask(self, forum_id, user):
+        """ Returns the bitmask of the permissions granted to the user for the given forum ID. """
+        if user.is_superuser:
+            return bitmasks.full_mask
+        elif not user.is_anonymous and not user.is_active:
+            # An inactive user has no permissions.
+            return 0
+        return self._get_checker(user).get_permission_matrix().get_mask(forum_id)
+
     def _get_checker(self, user):
         """ Return a ForumPermissionChecker instance for the given user. """
         user_perm_checkers_cache_key = user.id if not user.is_anonymous else 'anonymous'
@@ -527,8 +726,41 @@ class PermissionHandler:
         self._user_perm_checkers_cache[user_perm_checkers_cache_key] = checker
         return checker
 
+    def _get_shared_cache_value(self, key, snapshot=False):
+        """ Returns the value stored for the given key in the cross-request permission cache. """
+        generation = self._get_permission_cache_generation()
+        return (
+            permission_cache.get(generation, key, snapshot=snapshot)
+            if generation is not None else None
+        )
+
+    def _set_shared_cache_value(self, key, value, snapshot=False):
+        """ Stores a value for the given key in the cross-request permission cache. """
+        generation = self._get_permission_cache_generation()
+        if generation is not None:
+            permission_cache.set(generation, key, value, snapshot=snapshot)
+
+    def _get_permission_cache_generation(self):
+        """ Returns the permission generation number to use for the lifetime of the handler. """
+        if not hasattr(self, '_permission_cache_generation'):
+            self._permission_cache_generation = (
+                permission_cache.get_generation() if permission_cache.enabled else None
+            )
+        return self._permission_cache_generation
+
     def _get_all_forums(self):
         """ Returns all forums. """
         if not hasattr(self, '_all_forums'):
-            self._all_forums = list(Forum.objects.all())
+            self._all_forums = (
+                self.forum_registry.forums if self.forum_registry is not None
+                else list(Forum.objects.all())
+            )
         return self._all_forums
+
+    def _get_forum_tree(self):
+        """ Returns the snapshot of the structure of the tree of forums. """
+        if self.forum_registry is not None:
+            return self.forum_registry.tree
+        if not hasattr(self, '_forum_tree'):
+            self._forum_tree = forum_tree_cache.get_tree(forums=self._get_all_forums)
+        return self._forum_tree
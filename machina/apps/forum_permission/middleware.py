@@ -8,12 +8,14 @@
 """
 
 import uuid
+from functools import partial
 
 from django.utils.deprecation import MiddlewareMixin
 
 from machina.core.loading import get_class
 
 
+ForumRegistry = get_class('forum.registry', 'ForumRegistry')
 PermissionHandler = get_class('forum_permission.handler', 'PermissionHandler')
 
 
@@ -22,7 +24,13 @@ class ForumPermissionMiddleware(MiddlewareMixin):
 
     This allows to cache the permissions for the lifetime of the request object. The middleware also
     attaches a random identifier to each anonymous user in order to perform proper permission checks
-    for anonymous users. This identifier is stored in the session.
+    for anonymous users. This identifier is stored in the session. It is only created when it is
+    actually needed (eg. when an anonymous user posts a message or votes in a poll) so that no
+    session is created for anonymous users who only browse the forums.
+
+    A ``ForumRegistry`` instance is also attached to each request. This registry is shared by the
+    permission handler and by the views so that the tree of forums is loaded at most once per
+    request.
 
     """
 
@@ -30,15 +38,25 @@ class ForumPermissionMiddleware(MiddlewareMixin):
 
     def process_request(self, request):
         if not request.user.is_authenticated:
-            # Get the anonymous forum key and attaches it the AnonymousUser instance.
+            # Get the anonymous forum key and attaches it the AnonymousUser instance. A function
+            # allowing to create this key later on is also attached to the AnonymousUser instance.
             anonymous_forum_key = request.session.get(self.anonymous_forum_key_session_id, None)
-            if anonymous_forum_key is None:
-                anonymous_forum_key = self.get_anonymous_forum_key()
-                request.session[self.anonymous_forum_key_session_id] = anonymous_forum_key
-
-            setattr(request.user, 'forum_key', anonymous_forum_key)
-
-        request.forum_permission_handler = PermissionHandler()
+            if anonymous_forum_key is not None:
+                setattr(request.user, 'forum_key', anonymous_forum_key)
+            setattr(
+                request.user, 'forum_key_factory',
+                partial(self.create_anonymous_forum_key, request),
+            )
+
+        request.forum_registry = ForumRegistry()
+        request.forum_permission_handler = PermissionHandler(forum_registry=request.forum_registry)
+
+    def create_anonymous_forum_key(self, request):
+        """ Creates an anonymous forum key and stores it in the session of the given request. """
+        anonymous_forum_key = self.get_anonymous_forum_key()
+        request.session[self.anonymous_forum_key_session_id] = anonymous_forum_key
+        setattr(request.user, 'forum_key', anonymous_forum_key)
+        return anonymous_forum_key
 
     def get_anonymous_forum_key(self):
         """ Returns a random anonymous forum key. """
@@ -0,0 +1,65 @@
+# Generated by Django 2.2.28 on 2026-10-17 01:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Null values are distinct in unique constraints: the effective permissions of anonymous users and
+# the effective permissions whose forum is null are covered by partial unique indexes. These indexes
+# are not created on databases that do not support partial indexes (eg. MySQL).
+PARTIAL_UNIQUE_INDEXES = [
+    ('effective_perm_user_default_uniq', '(user_id)', 'forum_id IS NULL'),
+    ('effective_perm_anonymous_forum_uniq', '(forum_id)', 'user_id IS NULL'),
+    (
+        'effective_perm_anonymous_default_uniq', '(anonymous_user)',
+        'user_id IS NULL AND forum_id IS NULL',
+    ),
+]
+
+
+def create_partial_unique_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('postgresql', 'sqlite'):
+        return
+    for name, columns, condition in PARTIAL_UNIQUE_INDEXES:
+        schema_editor.execute(
+            'CREATE UNIQUE INDEX {} ON forum_permission_effectiveforumpermission {} '
+            'WHERE {}'.format(name, columns, condition),
+        )
+
+
+def drop_partial_unique_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('postgresql', 'sqlite'):
+        return
+    for name, _, _ in PARTIAL_UNIQUE_INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS {}'.format(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0011_forum_subscribers'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('forum_permission', '0003_remove_forumpermission_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectiveForumPermission',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anonymous_user', models.BooleanField(db_index=True, default=False, verbose_name='Target anonymous user')),
+                ('perms_mask', models.BigIntegerField(default=0, verbose_name='Permissions bitmask')),
+                ('perms_layout', models.CharField(blank=True, max_length=32, verbose_name='Permissions bitmask layout')),
+                ('forum', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='forum.Forum', verbose_name='Forum')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Effective forum permission',
+                'verbose_name_plural': 'Effective forum permissions',
+                'abstract': False,
+                'unique_together': {('user', 'forum')},
+            },
+        ),
+        migrations.RunPython(create_partial_unique_indexes, drop_partial_unique_indexes),
+    ]
@@ -6,16 +6,29 @@
 
 """
 
-from django.db.models.signals import post_migrate
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
 from django.dispatch import receiver
+from mptt.signals import node_moved
 
+from machina.apps.forum.signals import forum_moved
+from machina.conf import settings as machina_settings
 from machina.core.db.models import get_model
 from machina.core.loading import get_class
 
 
+EffectiveForumPermission = get_model('forum_permission', 'EffectiveForumPermission')
+Forum = get_model('forum', 'Forum')
 ForumPermission = get_model('forum_permission', 'ForumPermission')
+GroupForumPermission = get_model('forum_permission', 'GroupForumPermission')
+UserForumPermission = get_model('forum_permission', 'UserForumPermission')
+
 PermissionConfig = get_class('forum_permission.defaults', 'PermissionConfig')
 
+page_cache = get_class('forum.cache', 'cache')
+permission_cache = get_class('forum_permission.cache', 'cache')
+
 
 def create_permissions():
     """ Creates all the permissions from the permission configuration. """
@@ -32,3 +45,100 @@ def create_global_permissions(sender, **kwargs):
     """ Creates all the permissions from the permission configuration during migrations. """
     if sender.name.endswith('forum_permission'):
         create_permissions()
+
+
+@receiver(post_save, sender=UserForumPermission)
+@receiver(post_delete, sender=UserForumPermission)
+@receiver(post_save, sender=GroupForumPermission)
+@receiver(post_delete, sender=GroupForumPermission)
+def invalidate_permission_cache_on_permission_change(sender, **kwargs):
+    """ Invalidates the shared permission cache when user or group forum permissions change.
+
+    As for the other receivers of this module, the permission generation number is only bumped once
+    the current transaction is committed: otherwise concurrent requests could store the permissions
+    they read before the commit under the new generation number. The cached pages are also
+    invalidated because the permissions of anonymous users determine the contents of these pages.
+    """
+    transaction.on_commit(permission_cache.bump_generation)
+    page_cache.invalidate_forum_tree()
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def invalidate_permission_cache_on_group_membership_change(sender, action, **kwargs):
+    """ Invalidates the shared permission cache when group memberships change. """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(permission_cache.bump_generation)
+
+
+@receiver(post_save, sender=Forum)
+def invalidate_permission_cache_on_forum_creation(sender, instance, created, **kwargs):
+    """ Invalidates the shared permission cache when a forum is added to the forum tree.
+
+    Forum updates that do not result in a change of the forum tree (eg. counters updates) are not
+    considered.
+    """
+    if created:
+        transaction.on_commit(permission_cache.bump_generation)
+
+
+@receiver(post_delete, sender=Forum)
+@receiver(forum_moved)
+@receiver(node_moved, sender=Forum)
+def invalidate_permission_cache_on_forum_tree_change(sender, **kwargs):
+    """ Invalidates the shared permission cache when the forum tree changes. """
+    transaction.on_commit(permission_cache.bump_generation)
+
+
+def invalidate_effective_permissions(**kwargs):
+    """ Removes the effective forum permissions matching the given filters.
+
+    Effective forum permissions are computed again the next time they are used. They are removed
+    once the current transaction is committed: otherwise concurrent requests could compute them
+    again from the permissions they read before the commit.
+    """
+    if machina_settings.EFFECTIVE_FORUM_PERMISSIONS:
+        transaction.on_commit(
+            lambda: EffectiveForumPermission.objects.filter(**kwargs).delete(),
+        )
+
+
+@receiver(post_save, sender=UserForumPermission)
+@receiver(post_delete, sender=UserForumPermission)
+def invalidate_effective_permissions_on_user_permission_change(sender, instance, **kwargs):
+    """ Invalidates the effective forum permissions of a user whose forum permissions change. """
+    if instance.anonymous_user:
+        invalidate_effective_permissions(anonymous_user=True)
+    else:
+        invalidate_effective_permissions(user_id=instance.user_id)
+
+
+@receiver(post_save, sender=GroupForumPermission)
+@receiver(post_delete, sender=GroupForumPermission)
+def invalidate_effective_permissions_on_group_permission_change(sender, instance, **kwargs):
+    """ Invalidates the effective forum permissions of the members of a group whose forum
+        permissions change.
+    """
+    user_model = get_user_model()
+    invalidate_effective_permissions(
+        user_id__in=list(
+            user_model.objects.filter(groups=instance.group_id).values_list('pk', flat=True),
+        ),
+    )
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def invalidate_effective_permissions_on_group_membership_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """ Invalidates the effective forum permissions of the users whose group memberships change. """
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        # The groups of a specific user changed.
+        invalidate_effective_permissions(user_id=instance.pk)
+    elif reverse and action in ('post_add', 'post_remove'):
+        # Users were added to (or removed from) a specific group.
+        invalidate_effective_permissions(user_id__in=pk_set)
+    elif reverse and action == 'pre_clear':
+        # All the users of a specific group are going to be removed from this group.
+        invalidate_effective_permissions(
+            user_id__in=list(instance.user_set.values_list('pk', flat=True)),
+        )
@@ -79,3 +79,15 @@ def get_anonymous_user_forum_key(user):
         user.forum_key if isinstance(user, AnonymousUser) and hasattr(user, 'forum_key')
         else None
     )
+
+
+def get_or_create_anonymous_user_forum_key(user):
+    """ Returns the forum key identifier associated with the considered anonymous user.
+
+    The forum key is created if the anonymous user does not have one yet.
+    """
+    if not isinstance(user, AnonymousUser):
+        return None
+    if not hasattr(user, 'forum_key') and hasattr(user, 'forum_key_factory'):
+        user.forum_key_factory()
+    return getattr(user, 'forum_key', None)
@@ -17,6 +17,7 @@ Forum = get_model('forum', 'Forum')
 ForumReadTrack = get_model('forum_tracking', 'ForumReadTrack')
 TopicReadTrack = get_model('forum_tracking', 'TopicReadTrack')
 
+ForumRegistry = get_class('forum.registry', 'ForumRegistry')
 PermissionHandler = get_class('forum_permission.handler', 'PermissionHandler')
 
 
@@ -30,13 +31,14 @@ class TrackingHandler:
 
     def __init__(self, request=None):
         self.request = request
+        self.forum_registry = request.forum_registry if request else ForumRegistry()
         self.perm_handler = request.forum_permission_handler if request \
-            else PermissionHandler()
+            else PermissionHandler(forum_registry=self.forum_registry)
 
     def get_unread_forums(self, user):
         """ Returns the list of unread forums for the given user. """
         return self.get_unread_forums_from_list(
-            user, self.perm_handler.get_readable_forums(Forum.objects.all(), user))
+            user, self.perm_handler.get_readable_forums(self.forum_registry.forums, user))
 
     def get_unread_forums_from_list(self, user, forums):
         """ Returns the list of unread forums for the given user from a given list of forums. """
@@ -68,7 +68,7 @@ class MarkForumsReadView(LoginRequiredMixin, TemplateView):
             )
         else:
             forums = request.forum_permission_handler.get_readable_forums(
-                Forum.objects.all(), request.user,
+                request.forum_registry.forums, request.user,
             )
 
         # Marks forums as read
@@ -136,7 +136,7 @@ class UnreadTopicsView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         """ Returns the list of items for this view. """
         forums = self.request.forum_permission_handler.get_readable_forums(
-            Forum.objects.all(), self.request.user,
+            self.request.forum_registry.forums, self.request.user,
         )
         topics = Topic.objects.filter(forum__in=forums)
         topics_pk = map(lambda t: t.pk, track_handler.get_unread_topics(topics, self.request.user))
@@ -30,6 +30,9 @@ USER_DISPLAY_NAME_METHOD = getattr(
 DEFAULT_FROM_EMAIL = getattr(
     settings, 'MACHINA_DEFAULT_FROM_EMAIL', settings.DEFAULT_FROM_EMAIL)
 ENABLE_EMAIL_NOTIFICATIONS = getattr(settings, 'MACHINA_ENABLE_EMAIL_NOTIFICATIONS', False)
+PAGINATION_MODE = getattr(settings, 'MACHINA_PAGINATION_MODE', 'offset')
+ANONYMOUS_PAGE_CACHE_NAME = getattr(settings, 'MACHINA_ANONYMOUS_PAGE_CACHE_NAME', None)
+ANONYMOUS_PAGE_CACHE_TIMEOUT = getattr(settings, 'MACHINA_ANONYMOUS_PAGE_CACHE_TIMEOUT', 60 * 10)
 
 
 # Forum
@@ -43,6 +46,7 @@ DEFAULT_FORUM_IMAGE_SETTINGS = {
 }
 
 FORUM_TOPICS_NUMBER_PER_PAGE = getattr(settings, 'MACHINA_FORUM_TOPICS_NUMBER_PER_PAGE', 20)
+FORUM_TREE_CACHE_NAME = getattr(settings, 'MACHINA_FORUM_TREE_CACHE_NAME', None)
 
 
 # Conversation
@@ -51,6 +55,11 @@ POST_CONTENT_MAX_LENGTH = getattr(settings, 'MACHINA_POST_CONTENT_MAX_LENGTH', N
 
 TOPIC_POSTS_NUMBER_PER_PAGE = getattr(settings, 'MACHINA_TOPIC_POSTS_NUMBER_PER_PAGE', 15)
 TOPIC_REVIEW_POSTS_NUMBER = getattr(settings, 'MACHINA_TOPIC_REVIEW_POSTS_NUMBER', 10)
+TRACKERS_UPDATE_MODE = getattr(settings, 'MACHINA_TRACKERS_UPDATE_MODE', 'full')
+POST_FRAGMENT_CACHE_NAME = getattr(settings, 'MACHINA_POST_FRAGMENT_CACHE_NAME', None)
+POST_FRAGMENT_CACHE_TIMEOUT = getattr(
+    settings, 'MACHINA_POST_FRAGMENT_CACHE_TIMEOUT', 60 * 60 * 24,
+)
 
 
 # Polls
@@ -99,3 +108,7 @@ PROFILE_POSTS_NUMBER_PER_PAGE = getattr(settings, 'MACHINA_PROFILE_POSTS_NUMBER_
 DEFAULT_AUTHENTICATED_USER_FORUM_PERMISSIONS = getattr(
     settings, 'MACHINA_DEFAULT_AUTHENTICATED_USER_FORUM_PERMISSIONS', []
 )
+PERMISSION_CACHE_NAME = getattr(settings, 'MACHINA_PERMISSION_CACHE_NAME', None)
+PERMISSION_CACHE_TIMEOUT = getattr(settings, 'MACHINA_PERMISSION_CACHE_TIMEOUT', 60 * 60)
+PERMISSION_RESOLUTION = getattr(settings, 'MACHINA_PERMISSION_RESOLUTION', 'python')
+EFFECTIVE_FORUM_PERMISSIONS = getattr(settings, 'MACHINA_EFFECTIVE_FORUM_PERMISSIONS', False)
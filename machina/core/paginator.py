@@ -0,0 +1,152 @@
+"""
+    Paginators
+    ==========
+
+    This module defines paginators that can be used to avoid the costly queries performed by
+    Django's default paginator when browsing very long lists of objects (eg. the posts of
+    megathreads or the topics of very active forums).
+
+"""
+
+import base64
+import json
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class CountedPaginator(Paginator):
+    """ A paginator whose total number of objects can be provided instead of being computed.
+
+    The ``count`` argument allows to avoid the ``COUNT(*)`` query performed by Django's default
+    paginator, for example by using the value of a denormalized counter. If it is ``None``, the
+    objects are counted as usual.
+
+    """
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        if count is not None:
+            self.count = count
+        super().__init__(object_list, per_page, **kwargs)
+
+
+class KeysetPage(Page):
+    """ A page of objects retrieved by a ``KeysetPaginator``.
+
+    In addition to the attributes of Django's pages, keyset pages provide the cursors that should be
+    used to reach the previous and the next pages.
+
+    """
+
+    @cached_property
+    def previous_cursor(self):
+        """ Returns the cursor allowing to reach the previous page or ``None``. """
+        if not self.has_previous() or not len(self.object_list):
+            return None
+        return self.paginator.get_cursor(self.object_list[0])
+
+    @cached_property
+    def next_cursor(self):
+        """ Returns the cursor allowing to reach the next page or ``None``. """
+        if not self.has_next() or not len(self.object_list):
+            return None
+        return self.paginator.get_cursor(self.object_list[len(self.object_list) - 1])
+
+
+class KeysetPaginator(CountedPaginator):
+    """ A paginator relying on keyset (seek) pagination instead of ``OFFSET`` clauses.
+
+    The objects are ordered using the specified ``keys`` (eg. ``['created', 'id']``), which must
+    define a total ordering of the objects: the last key should be unique. A page is retrieved using
+    a filter on these keys when an ``after`` (or ``before``) cursor pointing to the last (or first)
+    object of the previous (or next) page is provided, so that browsing a list page by page does
+    not require to scan the preceding objects. Other pages are retrieved using ``OFFSET`` clauses
+    computed from the beginning or from the end of the list, whichever is the closest.
+
+    As with ``CountedPaginator``, the total number of objects can be provided using the ``count``
+    argument in order to avoid a ``COUNT(*)`` query.
+
+    """
+
+    def __init__(self, object_list, per_page, keys, after=None, before=None, **kwargs):
+        self.keys = list(keys)
+        self.after = after
+        self.before = before
+        super().__init__(object_list.order_by(*self.keys), per_page, **kwargs)
+
+    def page(self, number):
+        """ Returns a ``KeysetPage`` object for the given 1-based page number. """
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        if top - bottom <= 0:
+            return self._get_page([], number, self)
+
+        after_values = self.decode_cursor(self.after)
+        before_values = self.decode_cursor(self.before)
+        if after_values is not None and number > 1:
+            object_list = list(
+                self.object_list.filter(self._get_seek_filter(after_values))[:top - bottom])
+        elif before_values is not None and number < self.num_pages:
+            object_list = list(
+                self.object_list.reverse().filter(self._get_seek_filter(before_values, True))[
+                    :top - bottom])
+            object_list.reverse()
+        elif bottom > self.count - top:
+            # The requested page is closer to the end of the list: its objects are retrieved in the
+            # reverse order in order to scan less rows.
+            object_list = list(self.object_list.reverse()[self.count - top:self.count - bottom])
+            object_list.reverse()
+        else:
+            object_list = list(self.object_list[bottom:top])
+
+        return self._get_page(object_list, number, self)
+
+    def _get_page(self, *args, **kwargs):
+        return KeysetPage(*args, **kwargs)
+
+    def get_cursor(self, obj):
+        """ Returns the cursor pointing to the given object. """
+        values = [self._get_field(key).value_to_string(obj) for key in self.keys]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """ Returns the values of the keys encoded in the given cursor or ``None``.
+
+        ``None`` is also returned if the cursor is not valid or if it contains ``NULL`` values: in
+        that case pages are retrieved using ``OFFSET`` clauses.
+        """
+        if not cursor:
+            return None
+        try:
+            values = json.loads(
+                base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode(),
+            )
+            assert isinstance(values, list) and len(values) == len(self.keys)
+            values = [self._get_field(key).to_python(v) for key, v in zip(self.keys, values)]
+        except (AssertionError, TypeError, ValueError, ValidationError):
+            return None
+        return values if None not in values else None
+
+    def _get_field(self, key):
+        return self.object_list.model._meta.get_field(key.lstrip('-'))
+
+    def _get_seek_filter(self, values, backwards=False):
+        # Builds the filter selecting the objects that follow (or precede if "backwards" is set)
+        # the object whose keys have the given values. For keys (a, -b, c) and values (x, y, z),
+        # the objects that follow are those that match: a > x OR (a = x AND b < y) OR (a = x AND
+        # b = y AND c > z).
+        conditions = []
+        for i, key in enumerate(self.keys):
+            name = key.lstrip('-')
+            descending = key.startswith('-') != backwards
+            condition = Q(**{'{}__{}'.format(name, 'lt' if descending else 'gt'): values[i]})
+            for previous_key, previous_value in zip(self.keys[:i], values[:i]):
+                condition &= Q(**{previous_key.lstrip('-'): previous_value})
+            conditions.append(condition)
+        return reduce(lambda a, b: a | b, conditions)
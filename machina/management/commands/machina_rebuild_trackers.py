@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from machina.core.db.models import get_model
+from machina.core.loading import get_class
+
+
+Forum = get_model('forum', 'Forum')
+ForumProfile = get_model('forum_member', 'ForumProfile')
+Topic = get_model('forum_conversation', 'Topic')
+
+get_drifted_objects_count = get_class(
+    'forum_conversation.trackers', 'get_drifted_objects_count')
+get_forum_profile_trackers = get_class(
+    'forum_conversation.trackers', 'get_forum_profile_trackers')
+get_forum_trackers = get_class('forum_conversation.trackers', 'get_forum_trackers')
+get_topic_trackers = get_class('forum_conversation.trackers', 'get_topic_trackers')
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the denormalized trackers (posts counts, first and last posts, ...) of topics, '
+        'forums and forum profiles.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true', dest='dry_run',
+            help='Report the number of objects whose trackers are wrong without updating them.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000, dest='chunk_size',
+            help='The size of the ranges of IDs considered by each query.',
+        )
+
+    def handle(self, *args, **options):
+        """ Rebuilds the trackers of topics, forums and forum profiles using set-based queries. """
+        # The trackers of topics are rebuilt first because the trackers of forums depend on them.
+        families = [
+            ('topics', Topic, get_topic_trackers),
+            ('forums', Forum, get_forum_trackers),
+            ('forum profiles', ForumProfile, get_forum_profile_trackers),
+        ]
+
+        for name, model, get_trackers in families:
+            trackers = get_trackers()
+            count = 0
+            for queryset in self.get_chunks(model, options['chunk_size']):
+                if options['dry_run']:
+                    count += get_drifted_objects_count(queryset, trackers)
+                else:
+                    with transaction.atomic():
+                        count += queryset.update(**trackers)
+
+            if options['dry_run']:
+                self.stdout.write(
+                    '{}: {} object(s) with drifted trackers'.format(name.capitalize(), count),
+                )
+            else:
+                self.stdout.write('{}: {} object(s) rebuilt'.format(name.capitalize(), count))
+
+    def get_chunks(self, model, chunk_size):
+        """ Returns querysets covering consecutive ranges of IDs of the given model. """
+        bounds = model._default_manager.aggregate(min_id=Min('pk'), max_id=Max('pk'))
+        if bounds['min_id'] is None:
+            return
+        for start in range(bounds['min_id'], bounds['max_id'] + 1, chunk_size):
+            yield model._default_manager.filter(pk__gte=start, pk__lt=start + chunk_size)
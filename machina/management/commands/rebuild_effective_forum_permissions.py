@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+
+from machina.core.db.models import get_model
+from machina.core.loading import get_class
+
+
+EffectiveForumPermission = get_model('forum_permission', 'EffectiveForumPermission')
+
+ForumPermissionChecker = get_class('forum_permission.checker', 'ForumPermissionChecker')
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the effective forum permissions of all the users.'
+
+    def handle(self, *args, **options):
+        """ Rebuilds the effective forum permissions of the anonymous user and of all the users. """
+        EffectiveForumPermission.objects.all().delete()
+
+        ForumPermissionChecker(AnonymousUser()).rebuild_effective_permissions()
+        users_count = 0
+        for user in get_user_model().objects.filter(is_active=True).iterator():
+            ForumPermissionChecker(user).rebuild_effective_permissions()
+            users_count += 1
+
+        self.stdout.write(
+            'Effective forum permissions rebuilt for {} user(s) and for anonymous users'.format(
+                users_count,
+            ),
+        )
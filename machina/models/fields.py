@@ -174,7 +174,11 @@ class MarkupTextField(models.TextField):
         except AttributeError:
             return value
 
-    def render_data(self, signal, sender, instance=None, **kwargs):
+    def render_data(self, signal, sender, instance=None, update_fields=None, **kwargs):
+        # The data is not rendered again if the field is not part of the fields to save.
+        if update_fields is not None and self.attname not in update_fields:
+            return
+
         value = getattr(instance, self.attname)
 
         rendered = None
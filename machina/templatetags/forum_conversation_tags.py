@@ -1,8 +1,11 @@
 from django import template
 
 from machina.conf import settings as machina_settings
+from machina.core.loading import get_class
 
 
+post_fragment_cache = get_class('forum_conversation.cache', 'cache')
+
 register = template.Library()
 
 
@@ -39,3 +42,25 @@ def topic_pages_inline_list(topic):
         data_dict['first_pages'] = range(1, pages_number + 1)
 
     return data_dict
+
+
+@register.simple_tag(takes_context=True)
+def cached_post_fragment(context, post, template_name, *vary_on):
+    """ This will render the given template for the passed post using the post fragments cache.
+
+    The template is rendered with the current context. Additional arguments can be used to specify
+    values the rendered fragment depends on (in addition to the post and to the profile of its
+    poster): they are included in the cache key. The rendered fragment should not contain
+    information that are specific to the current user.
+
+    Usage::
+
+        {% cached_post_fragment post 'forum_conversation/partials/post_body.html' var %}
+
+    """
+    def render():
+        fragment_template = context.template.engine.get_template(template_name)
+        with context.push(post=post):
+            return fragment_template.render(context)
+
+    return post_fragment_cache.get_or_render(post, template_name, render, vary_on)
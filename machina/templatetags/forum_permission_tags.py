@@ -1,3 +1,4 @@
+import functools
 import inspect
 
 from django import template
@@ -10,6 +11,44 @@ PermissionHandler = get_class('forum_permission.handler', 'PermissionHandler')
 register = template.Library()
 
 
+@functools.lru_cache(maxsize=None)
+def get_allowed_method_names(handler_class):
+    """ Returns the names of the permission handler methods that can be used in templates.
+
+    The allowed method names only depend on the considered permission handler class so they are
+    computed once for each class.
+    """
+    allowed_methods = inspect.getmembers(
+        handler_class, predicate=lambda m: inspect.isfunction(m) or inspect.ismethod(m),
+    )
+    return tuple(a[0] for a in allowed_methods if not a[0].startswith('_'))
+
+
+@functools.lru_cache(maxsize=None)
+def get_permission_functions(handler_class, methods):
+    """ Returns the functions of the given permission handler class implementing the given methods.
+
+    The methods are validated and looked up once for each permission handler class so that the
+    methods overridden by custom permission handlers are taken into account.
+    """
+    for method in methods:
+        _check_method_name(handler_class, method)
+    return tuple((method, getattr(handler_class, method)) for method in methods)
+
+
+def _get_permission_handler(context):
+    request = context.get('request', None)
+    return request.forum_permission_handler if request else PermissionHandler()
+
+
+def _check_method_name(handler_class, method):
+    allowed_method_names = get_allowed_method_names(handler_class)
+    if method not in allowed_method_names:
+        raise template.TemplateSyntaxError(
+            'Only the following methods are allowed through '
+            'this templatetag: {}'.format(list(allowed_method_names)))
+
+
 @register.simple_tag(takes_context=True)
 def get_permission(context, method, *args, **kwargs):
     """ This will return a boolean indicating if the considered permission is granted for the passed
@@ -20,16 +59,80 @@ def get_permission(context, method, *args, **kwargs):
         {% get_permission 'can_access_moderation_panel' request.user as var %}
 
     """
-    request = context.get('request', None)
-    perm_handler = request.forum_permission_handler if request else PermissionHandler()
+    perm_handler = _get_permission_handler(context)
+    _check_method_name(type(perm_handler), method)
+    perm_method = getattr(perm_handler, method)
+    return perm_method(*args, **kwargs)
 
-    allowed_methods = inspect.getmembers(perm_handler, predicate=inspect.ismethod)
-    allowed_method_names = [a[0] for a in allowed_methods if not a[0].startswith('_')]
 
-    if method not in allowed_method_names:
+class GetPermissionsNode(template.Node):
+    def __init__(self, methods, args, target_var):
+        self.methods = tuple(methods)
+        self.args = args
+        self.target_var = target_var
+
+    def render(self, context):
+        perm_handler = _get_permission_handler(context)
+        perm_functions = get_permission_functions(type(perm_handler), self.methods)
+        args = [arg.resolve(context) for arg in self.args]
+        context[self.target_var] = {
+            method: perm_function(perm_handler, *args) for method, perm_function in perm_functions
+        }
+        return ''
+
+
+@register.tag
+def get_permissions(parser, token):
+    """ This will return a dictionary indicating if each of the considered permissions is granted
+        for the passed arguments.
+
+    Unknown method names are reported when the template is compiled. The methods are then looked
+    up on the class of the permission handler used when the template is rendered (once for each
+    class) so that the methods overridden by custom permission handlers are used.
+
+    Usage::
+
+        {% get_permissions 'can_add_post' 'can_subscribe_to_topic' with topic request.user as var %}
+        {% if var.can_add_post %}...{% endif %}
+
+    """
+    bits = token.split_contents()
+    tag_name = bits.pop(0)
+    if len(bits) < 4 or bits[-2] != 'as' or 'with' not in bits:
         raise template.TemplateSyntaxError(
-            'Only the following methods are allowed through '
-            'this templatetag: {}'.format(allowed_method_names))
+            "'{0}' tag requires the following syntax: "
+            "{{% {0} 'method' ['method' ...] with arg [arg ...] as var %}}".format(tag_name))
 
-    perm_method = getattr(perm_handler, method)
-    return perm_method(*args, **kwargs)
+    target_var = bits[-1]
+    with_index = bits.index('with')
+    methods, args = bits[:with_index], bits[with_index + 1:-2]
+    if not methods or not args:
+        raise template.TemplateSyntaxError(
+            "'{}' tag requires at least one method name and one argument".format(tag_name))
+
+    method_names = []
+    for method in methods:
+        if method[0] != method[-1] or method[0] not in ('"', "'"):
+            raise template.TemplateSyntaxError(
+                "'{}' tag method names must be quoted strings".format(tag_name))
+        method = method[1:-1]
+        _check_method_name(PermissionHandler, method)
+        method_names.append(method)
+
+    return GetPermissionsNode(
+        method_names, [parser.compile_filter(arg) for arg in args], target_var,
+    )
+
+
+@register.filter
+def object_permissions(permissions, obj):
+    """ This will return the permission flags associated with the passed object in a dictionary of
+        precomputed permissions (such as the ones returned by the ``get_post_permissions`` and
+        ``get_topic_permissions`` methods of the permission handler).
+
+    Usage::
+
+        {% with post_permissions|object_permissions:post as perms %}...{% endwith %}
+
+    """
+    return permissions.get(obj.id, {}) if permissions else {}
@@ -78,3 +78,22 @@ def forum_list(context, forum_visibility_contents):
         data_dict['root_level_sub'] = root_level + 2
 
     return data_dict
+
+
+@register.simple_tag(takes_context=True)
+def get_forum_ancestors(context, forum):
+    """ Returns the ancestors of the considered forum.
+
+    The structure of the tree of forums provided by the forum registry of the current request is
+    used (if available) in order to avoid hitting the database. The returned ancestors provide (at
+    least) the ``id``, ``name`` and ``slug`` attributes.
+
+    Usage::
+
+        {% get_forum_ancestors forum as ancestors %}
+
+    """
+    registry = getattr(context.get('request'), 'forum_registry', None)
+    if registry is None or forum.id not in registry.tree:
+        return forum.get_ancestors()
+    return registry.tree.get_ancestors(forum.id)
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.28 on 2026-10-17 02:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum_conversation', '0012_post_notifications_sent'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='post',
+            options={
+                'get_latest_by': 'created', 'ordering': ['created', 'id'], 'verbose_name': 'Post',
+                'verbose_name_plural': 'Posts',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(
+                fields=['topic', 'approved', 'created'], name='post_topic_approved_idx',
+            ),
+        ),
+    ]
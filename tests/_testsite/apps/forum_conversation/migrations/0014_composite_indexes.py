@@ -0,0 +1,67 @@
+# Generated by Django 2.2.28 on 2026-10-17 02:15
+
+from django.db import migrations, models
+
+
+# On PostgreSQL, partial indexes restricted to approved posts and topics are also created. They are
+# smaller than the composite indexes and match the orderings used to paginate topics and forums.
+POSTGRESQL_PARTIAL_INDEXES = [
+    (
+        'post_topic_approved_pidx', 'forum_conversation_post', '(topic_id, created, id)',
+        'approved',
+    ),
+    (
+        'topic_forum_approved_pidx', 'forum_conversation_topic',
+        '(forum_id, type DESC, last_post_on DESC, id)', 'approved',
+    ),
+    (
+        'post_notifications_pidx', 'forum_conversation_post', '(id)',
+        'approved AND NOT notifications_sent',
+    ),
+]
+
+
+def create_partial_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, columns, condition in POSTGRESQL_PARTIAL_INDEXES:
+        schema_editor.execute(
+            'CREATE INDEX {} ON {} {} WHERE {}'.format(name, table, columns, condition),
+        )
+
+
+def drop_partial_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _, _ in POSTGRESQL_PARTIAL_INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS {}'.format(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum_conversation', '0013_post_topic_approved_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(
+                fields=['poster', 'approved', 'created'], name='post_poster_approved_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(
+                fields=['approved', 'notifications_sent'], name='post_notifications_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(
+                fields=['forum', 'approved', 'type', 'last_post_on'],
+                name='topic_forum_approved_idx',
+            ),
+        ),
+        migrations.RunPython(create_partial_indexes, drop_partial_indexes),
+    ]
@@ -0,0 +1,49 @@
+import pytest
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers', 'benchmark: benchmark tests (only executed with the --benchmarks option)',
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--benchmarks'):
+        return
+    skip_benchmark = pytest.mark.skip(reason='benchmarks are executed with the --benchmarks option')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip_benchmark)
+
+
+@pytest.fixture(scope='session')
+def benchmark_results(request):
+    """ Collects the results of the benchmarks in order to report them at the end of the run. """
+    results = []
+    request.config._machina_benchmark_results = results
+    return results
+
+
+def pytest_terminal_summary(terminalreporter):
+    plans = getattr(terminalreporter.config, '_machina_query_plans', None)
+    if plans:
+        terminalreporter.section('machina query plans')
+        for plan in plans:
+            terminalreporter.write_line(plan['query'])
+            terminalreporter.write_line('    before: {}'.format(plan['before']))
+            terminalreporter.write_line('    after:  {}'.format(plan['after']))
+
+    results = getattr(terminalreporter.config, '_machina_benchmark_results', None)
+    if not results:
+        return
+    terminalreporter.section('machina benchmarks')
+    terminalreporter.write_line(
+        '{:<40} {:<10} {:<10} {:>8} {:>10} {:>12}'.format(
+            'operation', 'resolution', 'tree', 'forums', 'queries', 'time (ms)',
+        ),
+    )
+    for result in results:
+        terminalreporter.write_line(
+            '{operation:<40} {resolution:<10} {tree:<10} {forums:>8} {queries:>10} '
+            '{time:>12.2f}'.format(**result),
+        )
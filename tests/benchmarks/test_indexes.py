@@ -0,0 +1,179 @@
+import datetime as dt
+import random
+from importlib import import_module
+
+import pytest
+from django.db import connection
+from django.utils import timezone
+
+from machina.core.db.models import get_model
+from machina.test.factories import UserFactory, create_forum
+
+
+Post = get_model('forum_conversation', 'Post')
+Topic = get_model('forum_conversation', 'Topic')
+
+# The composite indexes whose effects on the query plans of the hot queries are measured.
+COMPOSITE_INDEXES = [
+    'post_topic_approved_idx', 'post_poster_approved_idx', 'post_notifications_idx',
+    'topic_forum_approved_idx',
+]
+
+# The partial indexes that are only created on PostgreSQL.
+POSTGRESQL_PARTIAL_INDEXES = import_module(
+    'machina.apps.forum_conversation.migrations.0014_composite_indexes',
+).POSTGRESQL_PARTIAL_INDEXES
+
+
+def build_dataset(forums_count=5, topics_count=400, posts_count=20000, seed=42):
+    """ Creates forums, topics and posts (with some unapproved ones) using bulk inserts. """
+    rnd = random.Random(seed)
+    users = [UserFactory.create() for _ in range(20)]
+    forums = [create_forum() for _ in range(forums_count)]
+    now = timezone.now()
+
+    Topic.objects.bulk_create([
+        Topic(
+            forum=rnd.choice(forums), poster=rnd.choice(users), subject='Topic {}'.format(i),
+            slug='topic-{}'.format(i), type=Topic.TOPIC_STICKY if rnd.random() < 0.02 else 0,
+            status=Topic.TOPIC_UNLOCKED, approved=rnd.random() < 0.95,
+            last_post_on=now - dt.timedelta(minutes=i),
+        )
+        for i in range(topics_count)
+    ])
+    topics = list(Topic.objects.all())
+
+    Post.objects.bulk_create([
+        Post(
+            topic=rnd.choice(topics), poster=rnd.choice(users), subject='Post {}'.format(i),
+            content='Content', approved=rnd.random() < 0.95,
+            notifications_sent=rnd.random() < 0.99,
+        )
+        for i in range(posts_count)
+    ])
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return forums, topics, users
+
+
+def explain(queryset, label):
+    """ Returns the query plan of the given queryset as a single line.
+
+    The given label is added to the explained statement as a comment so that statements prepared
+    for another state of the schema are never reused.
+    """
+    sql, params = queryset.query.sql_with_params()
+    prefix = 'EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite' else 'EXPLAIN'
+    with connection.cursor() as cursor:
+        cursor.execute('{} {} /* {} */'.format(prefix, sql, label), params)
+        rows = cursor.fetchall()
+    return ' / '.join(str(row[-1]) for row in rows)
+
+
+def get_index_names():
+    """ Returns the names of the indexes of the post and topic tables. """
+    with connection.cursor() as cursor:
+        return {
+            name
+            for model in (Post, Topic)
+            for name in connection.introspection.get_constraints(cursor, model._meta.db_table)
+        }
+
+
+def get_benchmarked_index_names():
+    names = list(COMPOSITE_INDEXES)
+    if connection.vendor == 'postgresql':
+        names += [name for name, _, _, _ in POSTGRESQL_PARTIAL_INDEXES]
+    return names
+
+
+def drop_indexes():
+    with connection.cursor() as cursor:
+        for name in get_benchmarked_index_names():
+            cursor.execute('DROP INDEX {}'.format(name))
+
+
+def create_indexes():
+    # The statements are generated by the schema editor but executed directly: the SQLite schema
+    # editor cannot be entered inside the transaction of the test.
+    schema_editor = connection.schema_editor()
+    statements = [
+        str(index.create_sql(model, schema_editor))
+        for model in (Post, Topic)
+        for index in model._meta.indexes
+        if index.name in COMPOSITE_INDEXES
+    ]
+    if connection.vendor == 'postgresql':
+        statements += [
+            'CREATE INDEX {} ON {} {} WHERE {}'.format(name, table, columns, condition)
+            for name, table, columns, condition in POSTGRESQL_PARTIAL_INDEXES
+        ]
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.execute('ANALYZE')
+
+
+@pytest.fixture(scope='session')
+def query_plans(request):
+    """ Collects the query plans of the hot queries in order to report them at the end of the run.
+    """
+    plans = []
+    request.config._machina_query_plans = plans
+    return plans
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+class TestIndexesBenchmarks(object):
+    @pytest.fixture(autouse=True)
+    def setup(self, query_plans):
+        self.forums, self.topics, self.users = build_dataset()
+        self.plans = query_plans
+        if connection.vendor == 'postgresql':
+            # The planner is forced to consider the indexes even for the small generated dataset.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def get_hot_querysets(self):
+        topic = self.topics[0]
+        return {
+            'topic page': (
+                Post.objects.filter(topic=topic, approved=True).order_by('created', 'id')[:15]
+            ),
+            'post position': (
+                Post.objects.filter(topic=topic, approved=True, created__lt=timezone.now())
+                .order_by().values('id')
+            ),
+            'forum page': (
+                Topic.objects.filter(forum=self.forums[0], approved=True)
+                .exclude(type=Topic.TOPIC_ANNOUNCE).order_by('-type', '-last_post_on')[:20]
+            ),
+            'profile posts': (
+                Post.objects.filter(poster=self.users[0], approved=True).order_by('-created')[:15]
+            ),
+            'send_notifications': Post.objects.filter(approved=True, notifications_sent=False),
+        }
+
+    def test_query_plans_of_hot_queries(self):
+        # The "before" plans are computed on a schema without the benchmarked indexes. These
+        # indexes are then created again in order to compute the "after" plans.
+        drop_indexes()
+        assert get_index_names().isdisjoint(get_benchmarked_index_names())
+        plans_before = {
+            name: explain(qs, 'before') for name, qs in self.get_hot_querysets().items()
+        }
+        create_indexes()
+        assert get_index_names().issuperset(get_benchmarked_index_names())
+        plans_after = {
+            name: explain(qs, 'after') for name, qs in self.get_hot_querysets().items()
+        }
+
+        for name in plans_after:
+            self.plans.append({
+                'query': name, 'before': plans_before[name], 'after': plans_after[name],
+            })
+            if connection.vendor == 'sqlite':
+                assert any(index in plans_after[name] for index in COMPOSITE_INDEXES)
+                assert not any(index in plans_before[name] for index in COMPOSITE_INDEXES)
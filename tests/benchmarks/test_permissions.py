@@ -0,0 +1,177 @@
+import random
+import time
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from machina.conf import settings as machina_settings
+from machina.core.db.models import get_model
+from machina.core.loading import get_class
+from machina.test.factories import GroupFactory, UserFactory, create_category_forum, create_forum
+
+
+Forum = get_model('forum', 'Forum')
+ForumPermission = get_model('forum_permission', 'ForumPermission')
+GroupForumPermission = get_model('forum_permission', 'GroupForumPermission')
+UserForumPermission = get_model('forum_permission', 'UserForumPermission')
+
+ForumPermissionChecker = get_class('forum_permission.checker', 'ForumPermissionChecker')
+PermissionHandler = get_class('forum_permission.handler', 'PermissionHandler')
+
+
+# Each tree shape is defined by a depth and by the number of children of each node.
+TREE_SHAPES = {
+    'deep': (8, 2),
+    'wide': (2, 24),
+    'balanced': (4, 4),
+}
+
+READ_CODENAMES = ['can_see_forum', 'can_read_forum']
+MODERATION_CODENAMES = ['can_approve_posts', 'can_lock_topics', 'can_delete_posts']
+
+
+def build_forum_tree(depth, width):
+    """ Creates a forum tree with the given depth and number of children per node. """
+    forums = []
+    parents = [create_category_forum()]
+    forums.extend(parents)
+    for _ in range(depth):
+        children = []
+        for parent in parents:
+            for _ in range(width):
+                children.append(create_forum(parent=parent))
+        forums.extend(children)
+        parents = children
+    return forums
+
+
+def build_permissions(forums, users, groups, seed=42):
+    """ Creates mixed user, group and anonymous grants and denials for the given forums. """
+    rnd = random.Random(seed)
+    permissions = {p.codename: p for p in ForumPermission.objects.all()}
+    user_perms, group_perms = [], []
+
+    # Global grants.
+    for codename in READ_CODENAMES:
+        user_perms.append(UserForumPermission(
+            anonymous_user=True, permission=permissions[codename], has_perm=True,
+        ))
+        for group in groups:
+            group_perms.append(GroupForumPermission(
+                group=group, permission=permissions[codename], has_perm=True,
+            ))
+
+    # Per-forum grants and denials.
+    for forum in forums:
+        for codename in READ_CODENAMES:
+            if rnd.random() < 0.05:
+                user_perms.append(UserForumPermission(
+                    anonymous_user=True, forum=forum, permission=permissions[codename],
+                    has_perm=False,
+                ))
+            if rnd.random() < 0.05:
+                user_perms.append(UserForumPermission(
+                    user=rnd.choice(users), forum=forum, permission=permissions[codename],
+                    has_perm=rnd.random() < 0.5,
+                ))
+        for group in groups:
+            if rnd.random() < 0.1:
+                group_perms.append(GroupForumPermission(
+                    group=group, forum=forum, permission=permissions['can_read_forum'],
+                    has_perm=False,
+                ))
+            if rnd.random() < 0.2:
+                for codename in rnd.sample(MODERATION_CODENAMES, 2):
+                    group_perms.append(GroupForumPermission(
+                        group=group, forum=forum, permission=permissions[codename],
+                        has_perm=True,
+                    ))
+
+    UserForumPermission.objects.bulk_create(user_perms)
+    GroupForumPermission.objects.bulk_create(group_perms)
+
+
+def measure(func, repeat=3):
+    """ Returns the number of queries performed by the given callable and its best wall time. """
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    return len(context.captured_queries), min(timings) * 1000
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+class TestPermissionBenchmarks(object):
+    @pytest.fixture(autouse=True, params=['python', 'database'])
+    def resolution(self, request):
+        self.resolution = request.param
+        machina_settings.PERMISSION_RESOLUTION = request.param
+        yield
+        machina_settings.PERMISSION_RESOLUTION = 'python'
+
+    @pytest.fixture(autouse=True, params=sorted(TREE_SHAPES))
+    def setup(self, request, benchmark_results):
+        self.tree = request.param
+        self.forums = build_forum_tree(*TREE_SHAPES[self.tree])
+        self.groups = [GroupFactory.create() for _ in range(4)]
+        self.users = [UserFactory.create() for _ in range(4)]
+        for i, user in enumerate(self.users):
+            user.groups.add(*self.groups[:i + 1])
+        build_permissions(self.forums, self.users, self.groups)
+        self.results = benchmark_results
+
+    def get_user(self, user_index):
+        if user_index is None:
+            return AnonymousUser(), 'anonymous'
+        return self.users[user_index], 'user, {} group(s)'.format(user_index + 1)
+
+    def run(self, operation, func):
+        queries, duration = measure(func)
+        self.results.append({
+            'operation': operation, 'resolution': self.resolution, 'tree': self.tree,
+            'forums': len(self.forums),
+            'queries': queries, 'time': duration,
+        })
+        return queries
+
+    @pytest.mark.parametrize('user_index', [None, 0, 3])
+    def test_get_readable_forums(self, user_index):
+        user, label = self.get_user(user_index)
+        queries = self.run(
+            'get_readable_forums ({})'.format(label),
+            lambda: PermissionHandler().get_readable_forums(Forum.objects.all(), user),
+        )
+        assert queries <= 2
+
+    @pytest.mark.parametrize('user_index', [None, 0, 3])
+    def test_forum_list_filter(self, user_index):
+        user, label = self.get_user(user_index)
+        queries = self.run(
+            'forum_list_filter ({})'.format(label),
+            lambda: list(PermissionHandler().forum_list_filter(Forum.objects.all(), user)),
+        )
+        assert queries <= 3
+
+    def test_get_moderation_queue_forums(self):
+        user = self.users[3]
+        queries = self.run(
+            'get_moderation_queue_forums',
+            lambda: PermissionHandler().get_moderation_queue_forums(user),
+        )
+        assert queries <= 2
+
+    def test_has_perm_on_each_forum(self):
+        user = self.users[3]
+
+        def check_all_forums():
+            checker = ForumPermissionChecker(user)
+            for forum in self.forums:
+                checker.has_perm('can_read_forum', forum)
+
+        queries = self.run('has_perm (each forum)', check_all_forums)
+        assert queries <= 1
@@ -6,6 +6,13 @@ import pytest
 from . import settings
 
 
+def pytest_addoption(parser):
+    parser.addoption(
+        '--benchmarks', action='store_true', default=False,
+        help='Run the benchmarks located in the tests/benchmarks directory.',
+    )
+
+
 @pytest.yield_fixture(scope='session', autouse=True)
 def empty_media():
     """ Removes the directories inside the MEDIA_ROOT that could have been filled during tests. """
@@ -1,14 +1,25 @@
 import pytest
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.db import connection
+from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from machina.apps.forum.signals import forum_viewed
+from machina.apps.forum_conversation.signals import topic_viewed
+from machina.conf import settings as machina_settings
 from machina.core.db.models import get_model
 from machina.core.loading import get_class
 from machina.test.context_managers import mock_signal_receiver
-from machina.test.factories import create_forum, create_link_forum
+from machina.test.factories import (
+    PostFactory, UserFactory, create_forum, create_link_forum, create_topic
+)
 from machina.test.testcases import BaseClientTestCase
 
 
+ForumProfile = get_model('forum_member', 'ForumProfile')
 Post = get_model('forum_conversation', 'Post')
 Topic = get_model('forum_conversation', 'Topic')
 
@@ -50,6 +61,20 @@ class TestForumView(BaseClientTestCase):
         # Check
         assert response.status_code == 403
 
+    def test_displays_the_actions_the_user_can_perform_on_the_forum(self):
+        # Setup
+        assign_perm('can_start_new_topics', self.user, self.top_level_forum)
+        correct_url = reverse('forum:forum', kwargs={
+            'slug': self.top_level_forum.slug, 'pk': self.top_level_forum.id})
+        topic_create_url = reverse('forum_conversation:topic_create', kwargs={
+            'forum_slug': self.top_level_forum.slug, 'forum_pk': self.top_level_forum.id})
+        subscribe_url = reverse('forum_member:forum_subscribe', args=(self.top_level_forum.pk, ))
+        # Run
+        response = self.client.get(correct_url)
+        # Check
+        assert response.content.count(topic_create_url.encode()) == 2
+        assert subscribe_url.encode() in response.content
+
     def test_triggers_a_viewed_signal(self):
         # Setup
         forum_url = reverse('forum:forum', kwargs={
@@ -63,6 +88,58 @@ class TestForumView(BaseClientTestCase):
                 self.client.get(url)
                 assert receiver.call_count == 1
 
+    def test_uses_the_topics_count_of_the_forum_to_paginate_the_topics(self):
+        # Setup
+        for i in range(0, 25):
+            # 20 topics per page
+            topic = create_topic(
+                forum=self.top_level_forum, poster=self.user,
+                type=Topic.TOPIC_ANNOUNCE if i < 2 else Topic.TOPIC_POST,
+            )
+            PostFactory.create(topic=topic, poster=self.user)
+        correct_url = reverse('forum:forum', kwargs={
+            'slug': self.top_level_forum.slug, 'pk': self.top_level_forum.id})
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(correct_url, {'page': 2})
+        # Check
+        assert response.context_data['paginator'].count == 23
+        assert len(response.context_data['topics']) == 3
+        assert not [
+            q for q in context.captured_queries
+            if q['sql'].startswith(
+                'SELECT COUNT(*) AS "__count" FROM "forum_conversation_topic"')
+        ]
+
+    def test_can_paginate_the_topics_using_keyset_cursors(self):
+        # Setup
+        machina_settings.PAGINATION_MODE = 'keyset'
+        for i in range(0, 25):
+            # 20 topics per page
+            topic = create_topic(
+                forum=self.top_level_forum, poster=self.user,
+                type=Topic.TOPIC_ANNOUNCE if i < 2 else Topic.TOPIC_POST,
+            )
+            PostFactory.create(topic=topic, poster=self.user)
+        correct_url = reverse('forum:forum', kwargs={
+            'slug': self.top_level_forum.slug, 'pk': self.top_level_forum.id})
+        try:
+            # Run
+            response = self.client.get(correct_url)
+            next_page_response = self.client.get(correct_url, {
+                'page': 2, 'after': response.context_data['page_obj'].next_cursor,
+            })
+        finally:
+            machina_settings.PAGINATION_MODE = 'offset'
+        # Check
+        topics = list(
+            Topic.objects.filter(type=Topic.TOPIC_POST).order_by('-last_post_on', 'id')
+        )
+        assert response.context_data['paginator'].num_pages == 2
+        assert list(response.context_data['topics']) == topics[:20]
+        assert list(next_page_response.context_data['topics']) == topics[20:]
+        assert len(next_page_response.context_data['announces']) == 2
+
     def test_redirects_to_the_link_of_a_link_forum(self):
         # Setup
         correct_url = reverse('forum:forum', kwargs={
@@ -84,3 +161,110 @@ class TestForumView(BaseClientTestCase):
         top_level_link = self.top_level_link.__class__._default_manager.get(
             pk=self.top_level_link.pk)
         assert top_level_link.link_redirects_count == initial_redirects_count + 1
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAnonymousPageCache(object):
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        machina_settings.ANONYMOUS_PAGE_CACHE_NAME = 'default'
+        caches['default'].clear()
+        self.client = Client()
+        self.u1 = UserFactory.create()
+
+        # Set up a top-level forum, a sub-forum and a topic
+        self.top_level_forum = create_forum()
+        self.sub_forum = create_forum(parent=self.top_level_forum)
+        self.topic = create_topic(forum=self.sub_forum, poster=self.u1)
+        PostFactory.create(topic=self.topic, poster=self.u1, content='first post')
+
+        # Assign some permissions
+        for forum in (self.top_level_forum, self.sub_forum):
+            assign_perm('can_see_forum', AnonymousUser(), forum)
+            assign_perm('can_read_forum', AnonymousUser(), forum)
+
+        self.urls = [
+            reverse('forum:index'),
+            reverse('forum:forum', kwargs={
+                'slug': self.top_level_forum.slug, 'pk': self.top_level_forum.pk}),
+            reverse('forum:forum', kwargs={
+                'slug': self.sub_forum.slug, 'pk': self.sub_forum.pk}),
+            reverse('forum_conversation:topic', kwargs={
+                'forum_slug': self.sub_forum.slug, 'forum_pk': self.sub_forum.pk,
+                'slug': self.topic.slug, 'pk': self.topic.pk}),
+        ]
+        yield
+        machina_settings.ANONYMOUS_PAGE_CACHE_NAME = None
+
+    def test_serves_the_pages_of_anonymous_users_from_the_cache(self):
+        # Setup
+        responses = [self.client.get(url) for url in self.urls]
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            cached_responses = [self.client.get(url) for url in self.urls]
+        # Check
+        assert not len(context.captured_queries)
+        for response, cached_response in zip(responses, cached_responses):
+            assert cached_response.status_code == 200
+            assert cached_response.content == response.content
+
+    def test_does_not_create_sessions_for_anonymous_users(self):
+        # Run
+        response = self.client.get(self.urls[-1])
+        # Check
+        assert settings.SESSION_COOKIE_NAME not in response.cookies
+
+    def test_invalidates_the_pages_displaying_a_new_post(self):
+        # Setup
+        for url in self.urls:
+            self.client.get(url)
+        # Run
+        PostFactory.create(topic=self.topic, poster=self.u1, content='second post')
+        # Check
+        for url in self.urls:
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(url)
+            assert len(context.captured_queries)
+        assert b'second post' in self.client.get(self.urls[-1]).content
+
+    def test_does_not_serve_a_page_whose_content_changed_while_it_was_rendered(self):
+        # Setup
+        def create_post(**kwargs):
+            PostFactory.create(topic=self.topic, poster=self.u1, content='second post')
+        with mock_signal_receiver(topic_viewed, wraps=create_post):
+            self.client.get(self.urls[-1])
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.urls[-1])
+        # Check
+        assert len(context.captured_queries)
+        assert b'second post' in response.content
+
+    def test_invalidates_the_pages_displaying_a_member_whose_profile_is_updated(self):
+        # Setup
+        self.client.get(self.urls[-1])
+        profile = ForumProfile.objects.get(user=self.u1)
+        # Run
+        profile.signature = 'my signature'
+        profile.save()
+        # Check
+        assert b'my signature' in self.client.get(self.urls[-1]).content
+
+    def test_invalidates_all_the_pages_when_the_permissions_change(self):
+        # Setup
+        self.client.get(self.urls[-1])
+        # Run
+        remove_perm('can_read_forum', AnonymousUser(), self.sub_forum)
+        # Check
+        assert self.client.get(self.urls[-1]).status_code == 302
+
+    def test_does_not_serve_the_pages_of_users_having_a_session_from_the_cache(self):
+        # Setup
+        self.client.get(self.urls[-1])
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'dummy'
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.urls[-1])
+        # Check
+        assert response.status_code == 200
+        assert len(context.captured_queries)
@@ -1,4 +1,6 @@
 import pytest
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
 from django.urls import reverse
 from faker import Faker
 
@@ -96,3 +98,22 @@ class TestTopicPollVoteView(BaseClientTestCase):
         votes = TopicPollVote.objects.filter(voter=self.user)
         assert votes.count() == 1
         assert votes[0].poll_option == self.option_1
+
+    def test_can_be_used_to_vote_by_anonymous_users_without_session(self):
+        # Setup
+        assign_perm('can_read_forum', AnonymousUser(), self.top_level_forum)
+        assign_perm('can_vote_in_polls', AnonymousUser(), self.top_level_forum)
+        self.client.logout()
+        self.client.cookies.pop(settings.SESSION_COOKIE_NAME, None)
+        correct_url = reverse('forum_conversation:topic_poll_vote', kwargs={'pk': self.poll.pk})
+        post_data = {
+            'options': [self.option_1.pk, ],
+        }
+        # Run
+        response = self.client.post(correct_url, post_data)
+        # Check
+        assert response.status_code == 302
+        forum_key = self.client.session['_anonymous_forum_key']
+        votes = TopicPollVote.objects.filter(anonymous_key=forum_key)
+        assert votes.count() == 1
+        assert votes[0].poll_option == self.option_1
@@ -2,6 +2,8 @@ import pytest
 from django.contrib.auth.models import AnonymousUser
 from django.contrib.messages import constants as MSG  # noqa
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.encoding import force_bytes
 from faker import Faker
@@ -11,6 +13,7 @@ from machina.apps.forum_conversation.forum_polls.forms import (
     TopicPollOptionFormset, TopicPollVoteForm
 )
 from machina.apps.forum_conversation.signals import topic_viewed
+from machina.conf import settings as machina_settings
 from machina.core.db.models import get_model
 from machina.core.loading import get_class
 from machina.test.context_managers import mock_signal_receiver
@@ -184,6 +187,70 @@ class TestTopicView(BaseClientTestCase):
         response = self.client.get(correct_url, {'post': last_post_pk}, follow=True)
         assert response.context_data['page_obj'].number == 3
 
+    def test_does_not_consider_unapproved_posts_when_paginating_based_on_a_post_id(self):
+        # Setup
+        for _ in range(0, 20):
+            # 15 posts per page
+            PostFactory.create(topic=self.topic, poster=self.user, approved=False)
+        for _ in range(0, 10):
+            PostFactory.create(topic=self.topic, poster=self.user)
+        correct_url = reverse('forum_conversation:topic', kwargs={
+            'forum_slug': self.top_level_forum.slug, 'forum_pk': self.top_level_forum.pk,
+            'slug': self.topic.slug, 'pk': self.topic.id})
+        # Run
+        response = self.client.get(correct_url, {'post': self.topic.last_post.pk}, follow=True)
+        # Check
+        assert response.status_code == 200
+        assert response.context_data['page_obj'].number == 1
+
+    def test_uses_the_posts_count_of_the_topic_to_paginate_the_posts(self):
+        # Setup
+        for _ in range(0, 20):
+            # 15 posts per page
+            PostFactory.create(topic=self.topic, poster=self.user)
+        correct_url = reverse('forum_conversation:topic', kwargs={
+            'forum_slug': self.top_level_forum.slug, 'forum_pk': self.top_level_forum.pk,
+            'slug': self.topic.slug, 'pk': self.topic.id})
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(correct_url, {'page': 2})
+        # Check
+        assert response.context_data['paginator'].num_pages == 2
+        assert len(response.context_data['posts']) == 6
+        assert not [
+            q for q in context.captured_queries
+            if q['sql'].startswith('SELECT COUNT(*) AS "__count" FROM "forum_conversation_post"')
+        ]
+
+    def test_can_paginate_the_posts_using_keyset_cursors(self):
+        # Setup
+        machina_settings.PAGINATION_MODE = 'keyset'
+        for _ in range(0, 40):
+            # 15 posts per page
+            PostFactory.create(topic=self.topic, poster=self.user)
+        correct_url = reverse('forum_conversation:topic', kwargs={
+            'forum_slug': self.top_level_forum.slug, 'forum_pk': self.top_level_forum.pk,
+            'slug': self.topic.slug, 'pk': self.topic.id})
+        try:
+            # Run
+            response = self.client.get(correct_url, {'page': 2})
+            page_obj = response.context_data['page_obj']
+            next_page_response = self.client.get(
+                correct_url, {'page': 3, 'after': page_obj.next_cursor})
+            previous_page_response = self.client.get(
+                correct_url, {'page': 1, 'before': page_obj.previous_cursor})
+            post_response = self.client.get(correct_url, {'post': self.topic.last_post.pk})
+        finally:
+            machina_settings.PAGINATION_MODE = 'offset'
+        # Check
+        posts = list(self.topic.posts.order_by('created', 'id'))
+        assert response.context_data['paginator'].num_pages == 3
+        assert list(response.context_data['posts']) == posts[15:30]
+        assert '&after={}'.format(page_obj.next_cursor) in response.content.decode()
+        assert list(next_page_response.context_data['posts']) == posts[30:]
+        assert list(previous_page_response.context_data['posts']) == posts[:15]
+        assert post_response.context_data['page_obj'].number == 3
+
     def test_properly_handles_a_bad_post_id_in_parameters(self):
         # Setup
         for _ in range(0, 40):
@@ -1044,6 +1111,27 @@ class TestPostCreateView(BaseClientTestCase):
         assert response.status_code == 200
         assert response.context['post_form'].errors
 
+    def test_creates_a_forum_key_for_anonymous_posters(self):
+        # Setup
+        self.client.logout()
+        assign_perm('can_read_forum', AnonymousUser(), self.top_level_forum)
+        assign_perm('can_reply_to_topics', AnonymousUser(), self.top_level_forum)
+        correct_url = reverse(
+            'forum_conversation:post_create',
+            kwargs={'forum_slug': self.top_level_forum.slug, 'forum_pk': self.top_level_forum.pk,
+                    'topic_slug': self.topic.slug, 'topic_pk': self.topic.pk})
+        post_data = {
+            'subject': faker.text(max_nb_chars=200),
+            'content': '[b]{}[/b]'.format(faker.text()),
+            'username': 'anonymous',
+        }
+        # Run
+        self.client.post(correct_url, post_data, follow=True)
+        # Check
+        post = Post.objects.get(username='anonymous')
+        assert post.anonymous_key is not None
+        assert self.client.session['_anonymous_forum_key'] == post.anonymous_key
+
 
 class TestPostUpdateView(BaseClientTestCase):
     @pytest.fixture(autouse=True)
@@ -1,9 +1,12 @@
 import pytest
 from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import caches
+from django.db import connection
 from django.template import Context
 from django.template.base import Template
 from django.template.loader import render_to_string
 from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
 
 from machina.conf import settings as machina_settings
 from machina.core.db.models import get_model
@@ -146,3 +149,67 @@ class TestTopicPagesInlineListTag(BaseConversationTagsTestCase):
         assert rendered_small == expected_out_small
         assert rendered_huge == expected_out_huge
         assert rendered_multiple == expected_out_multiple
+
+
+class TestCachedPostFragmentTag(BaseConversationTagsTestCase):
+    @pytest.fixture(autouse=True)
+    def enable_cache(self):
+        machina_settings.POST_FRAGMENT_CACHE_NAME = 'default'
+        caches['default'].clear()
+        yield
+        machina_settings.POST_FRAGMENT_CACHE_NAME = None
+
+    def get_rendered(self, post, *vary_on):
+        t = Template(
+            self.loadstatement +
+            '{% cached_post_fragment post "forum_conversation/partials/post_sidebar.html" '
+            'var %}')
+        c = Context({'post': post, 'var': vary_on[0] if vary_on else None})
+        return t.render(c)
+
+    def test_can_render_a_post_fragment(self):
+        # Setup
+        machina_settings.POST_FRAGMENT_CACHE_NAME = None
+        expected_out = render_to_string(
+            'machina/forum_conversation/partials/post_sidebar.html', {'post': self.post_1})
+        # Run & check
+        assert self.get_rendered(self.post_1) == expected_out
+
+    def test_puts_the_rendered_fragments_into_the_cache(self):
+        # Setup
+        rendered = self.get_rendered(Post.objects.get(pk=self.post_1.pk))
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            cached_rendered = self.get_rendered(Post.objects.get(pk=self.post_1.pk))
+        # Check
+        assert cached_rendered == rendered
+        assert len(context.captured_queries) == 3  # post, poster and forum profile
+
+    def test_renders_a_new_fragment_if_the_post_is_updated(self):
+        # Setup
+        post = Post.objects.get(pk=self.post_1.pk)
+        self.get_rendered(post)
+        post.content = 'Updated content'
+        post.save()
+        # Run
+        self.get_rendered(Post.objects.get(pk=self.post_1.pk))
+        # Check
+        assert len(caches['default']._cache) == 2
+
+    def test_renders_a_new_fragment_if_the_profile_of_the_poster_is_updated(self):
+        # Setup
+        post = Post.objects.get(pk=self.post_1.pk)
+        profile = post.poster.forum_profile
+        rendered = self.get_rendered(post)
+        profile.posts_count = 42
+        profile.save()
+        # Run & check
+        assert self.get_rendered(Post.objects.get(pk=self.post_1.pk)) != rendered
+
+    def test_uses_the_additional_arguments_to_build_the_cache_key(self):
+        # Setup
+        self.get_rendered(self.post_1, 'value')
+        # Run & check
+        assert len(caches['default']._cache) == 1
+        self.get_rendered(self.post_1, 'other value')
+        assert len(caches['default']._cache) == 2
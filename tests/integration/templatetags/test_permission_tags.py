@@ -321,3 +321,75 @@ class TestGetPermissionTag(object):
             t = Template(self.loadstatement + raw_template)
             with pytest.raises(TemplateSyntaxError):
                 t.render(context)
+
+
+@pytest.mark.django_db
+class TestGetPermissionsTag(object):
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.loadstatement = '{% load forum_permission_tags %}'
+        self.request_factory = RequestFactory()
+
+        self.u1 = UserFactory.create()
+        self.forum_1 = create_forum()
+        self.forum_1_topic = create_topic(forum=self.forum_1, poster=self.u1)
+        PostFactory.create(topic=self.forum_1_topic, poster=self.u1)
+
+    def get_request(self, user):
+        request = self.request_factory.get('/')
+        middleware = SessionMiddleware()
+        middleware.process_request(request)
+        request.session.save()
+        request.user = user
+        ForumPermissionMiddleware().process_request(request)
+        return request
+
+    def test_can_return_several_permissions_at_once(self):
+        # Setup
+        assign_perm('can_reply_to_topics', self.u1, self.forum_1)
+        assign_perm('can_read_forum', self.u1, self.forum_1)
+        t = Template(
+            self.loadstatement +
+            '{% get_permissions \'can_add_post\' \'can_subscribe_to_topic\' with topic request.user as perms %}'  # noqa
+            '{% if perms.can_add_post %}CAN_ADD_POST{% endif %}'
+            '{% if perms.can_subscribe_to_topic %}CAN_SUBSCRIBE{% endif %}')
+        c = Context({'request': self.get_request(self.u1), 'topic': self.forum_1_topic})
+        # Run
+        rendered = t.render(c)
+        # Check
+        assert rendered == 'CAN_ADD_POSTCAN_SUBSCRIBE'
+
+    def test_uses_the_methods_of_the_permission_handler_of_the_request(self):
+        # Setup
+        class CustomPermissionHandler(PermissionHandler):
+            def can_add_post(self, topic, user):
+                return True
+
+        request = self.get_request(self.u1)
+        request.forum_permission_handler = CustomPermissionHandler()
+        t = Template(
+            self.loadstatement +
+            '{% get_permissions \'can_add_post\' with topic request.user as perms %}'
+            '{% if perms.can_add_post %}CAN_ADD_POST{% endif %}')
+        c = Context({'request': request, 'topic': self.forum_1_topic})
+        # Run
+        rendered = t.render(c)
+        # Check
+        assert rendered == 'CAN_ADD_POST'
+
+    def test_raises_at_compile_time_if_a_handler_method_is_unknown(self):
+        # Run & check
+        with pytest.raises(TemplateSyntaxError):
+            Template(
+                self.loadstatement +
+                '{% get_permissions \'can_add_post\' \'unknown\' with topic request.user as perms %}')  # noqa
+
+    def test_raises_if_the_syntax_is_invalid(self):
+        # Run & check
+        for raw_template in [
+            '{% get_permissions \'can_add_post\' topic request.user as perms %}',
+            '{% get_permissions \'can_add_post\' with topic request.user %}',
+            '{% get_permissions can_add_post with topic request.user as perms %}',
+        ]:
+            with pytest.raises(TemplateSyntaxError):
+                Template(self.loadstatement + raw_template)
@@ -0,0 +1,105 @@
+import pytest
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from machina.apps.forum.cache import cache
+from machina.conf import settings as machina_settings
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAnonymousPageCache(object):
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        machina_settings.ANONYMOUS_PAGE_CACHE_NAME = 'default'
+        caches['default'].clear()
+        yield
+        machina_settings.ANONYMOUS_PAGE_CACHE_NAME = None
+
+    def get_request(self, path='/forum/', **cookies):
+        request = RequestFactory().get(path)
+        request.COOKIES.update(cookies)
+        request.user = AnonymousUser()
+        return request
+
+    def test_should_raise_if_the_cache_backend_is_not_configured(self):
+        # Setup
+        machina_settings.ANONYMOUS_PAGE_CACHE_NAME = 'dummy'
+        # Run & check
+        with pytest.raises(ImproperlyConfigured):
+            cache.get(self.get_request())
+
+    def test_knows_if_a_request_can_be_served_from_the_cache(self):
+        # Run & check
+        assert cache.is_cacheable(self.get_request())
+        assert not cache.is_cacheable(
+            self.get_request(**{settings.SESSION_COOKIE_NAME: 'dummy'}))
+        assert not cache.is_cacheable(self.get_request(messages='dummy'))
+        machina_settings.ANONYMOUS_PAGE_CACHE_NAME = None
+        assert not cache.is_cacheable(self.get_request())
+
+    def test_can_store_a_page(self):
+        # Setup
+        request = self.get_request()
+        cache.set(
+            request, HttpResponse('page'),
+            cache.get_tag_versions(cache.get_tags(forum_ids=[1, ])),
+        )
+        # Run
+        response = cache.get(request)
+        # Check
+        assert response.status_code == 200
+        assert response.content == b'page'
+        assert cache.get(self.get_request('/forum/?page=2')) is None
+
+    def test_does_not_store_pages_that_set_cookies(self):
+        # Setup
+        request = self.get_request()
+        response = HttpResponse('page')
+        response.set_cookie('dummy', 'dummy')
+        # Run
+        cache.set(request, response, cache.get_tag_versions([]))
+        # Check
+        assert cache.get(request) is None
+
+    def test_can_invalidate_the_pages_associated_with_a_tag(self):
+        # Setup
+        request_1, request_2 = self.get_request('/forum/1/'), self.get_request('/forum/2/')
+        cache.set(
+            request_1, HttpResponse('page 1'),
+            cache.get_tag_versions(cache.get_tags(forum_ids=[1, ])),
+        )
+        cache.set(
+            request_2, HttpResponse('page 2'),
+            cache.get_tag_versions(cache.get_tags(forum_ids=[2, ])),
+        )
+        # Run
+        cache.invalidate(cache.get_tags(forum_ids=[1, ]))
+        # Check
+        assert cache.get(request_1) is None
+        assert cache.get(request_2).content == b'page 2'
+
+    def test_can_invalidate_all_the_pages(self):
+        # Setup
+        request = self.get_request()
+        cache.set(
+            request, HttpResponse('page'),
+            cache.get_tag_versions(cache.get_tags(topic_ids=[1, ])),
+        )
+        # Run
+        cache.invalidate_forum_tree()
+        # Check
+        assert cache.get(request) is None
+
+    def test_does_not_serve_pages_whose_tags_were_invalidated_while_they_were_rendered(self):
+        # Setup
+        request = self.get_request()
+        tag_versions = cache.get_tag_versions(cache.get_tags(forum_ids=[1, ]))
+        cache.invalidate(cache.get_tags(forum_ids=[1, ]))
+        # Run
+        cache.set(request, HttpResponse('page'), tag_versions)
+        # Check
+        assert cache.get(request) is None
@@ -1,5 +1,7 @@
 import pytest
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from machina.apps.forum.signals import forum_moved
 from machina.core.db.models import get_model
@@ -67,6 +69,27 @@ class TestForum(object):
         assert self.top_level_forum.direct_topics_count == \
             self.top_level_forum.topics.filter(approved=True).count()
 
+    def test_only_writes_its_tracking_data_when_updating_its_trackers(self):
+        # Setup
+        topic = create_topic(forum=self.top_level_forum, poster=self.u1)
+        PostFactory.create(topic=topic, poster=self.u1)
+        self.top_level_forum.refresh_from_db()
+        self.top_level_forum.name = 'Unsaved name'
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            self.top_level_forum.update_trackers()
+        # Check
+        update_queries = [
+            q['sql'] for q in context.captured_queries if q['sql'].startswith('UPDATE')
+        ]
+        assert len(update_queries) == 1
+        assert '"name"' not in update_queries[0]
+        assert '"_description_rendered"' not in update_queries[0]
+        assert '"direct_posts_count"' in update_queries[0]
+        self.top_level_forum.refresh_from_db()
+        assert self.top_level_forum.name != 'Unsaved name'
+        assert self.top_level_forum.direct_posts_count == 1
+
     def test_can_indicate_its_appartenance_to_a_forum_type(self):
         # Run & check
         assert self.top_level_cat.is_category
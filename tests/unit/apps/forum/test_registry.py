@@ -0,0 +1,85 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from machina.core.db.models import get_model
+from machina.core.loading import get_class
+from machina.test.factories import UserFactory, create_category_forum, create_forum
+
+
+Forum = get_model('forum', 'Forum')
+
+ForumRegistry = get_class('forum.registry', 'ForumRegistry')
+PermissionHandler = get_class('forum_permission.handler', 'PermissionHandler')
+
+
+@pytest.mark.django_db
+class TestForumRegistry(object):
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        # Set up the following forum tree:
+        #
+        #     top_level_cat
+        #         forum_1
+        #             forum_1_child_1
+        #                 forum_1_child_1_1
+        #         forum_2
+        #     top_level_forum
+        #
+        self.top_level_cat = create_category_forum()
+        self.forum_1 = create_forum(parent=self.top_level_cat)
+        self.forum_1_child_1 = create_forum(parent=self.forum_1)
+        self.forum_1_child_1_1 = create_forum(parent=self.forum_1_child_1)
+        self.forum_2 = create_forum(parent=self.top_level_cat)
+        self.top_level_forum = create_forum()
+        self.registry = ForumRegistry()
+
+    def test_loads_all_the_forums_using_a_single_query(self):
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            forums = self.registry.forums
+            forum = self.registry.get(self.forum_1.id)
+            descendants = self.registry.get_descendants(self.top_level_cat)
+        # Check
+        assert len(context.captured_queries) == 1
+        assert forums == list(Forum.objects.all())
+        assert forum == self.forum_1
+        assert forum is forums[1]
+        assert descendants == [
+            self.forum_1, self.forum_1_child_1, self.forum_1_child_1_1, self.forum_2,
+        ]
+
+    def test_returns_none_for_unknown_forums(self):
+        # Run & check
+        assert self.registry.get(-1) is None
+        assert self.registry.get('unknown') is None
+
+    def test_can_return_the_ancestors_of_a_forum(self):
+        # Run & check
+        assert self.registry.get_ancestors(self.forum_1_child_1_1) == \
+            [self.top_level_cat, self.forum_1, self.forum_1_child_1]
+        assert self.registry.get_ancestors(self.forum_1, include_self=True) == \
+            [self.top_level_cat, self.forum_1]
+        assert self.registry.get_ancestors(self.top_level_forum) == []
+
+    def test_can_return_the_children_of_a_forum(self):
+        # Run & check
+        assert self.registry.get_children(self.top_level_cat) == [self.forum_1, self.forum_2]
+        assert self.registry.get_children(self.forum_2) == []
+
+    def test_can_return_the_descendants_of_a_forum(self):
+        # Run & check
+        assert self.registry.get_descendants(self.forum_1, include_self=True) == \
+            [self.forum_1, self.forum_1_child_1, self.forum_1_child_1_1]
+        assert self.registry.get_descendants(self.top_level_forum) == []
+
+    def test_is_used_by_the_permission_handler_to_retrieve_the_forums(self):
+        # Setup
+        user = UserFactory.create(is_superuser=False)
+        self.registry.forums
+        perm_handler = PermissionHandler(forum_registry=self.registry)
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            perm_handler.get_readable_forums(self.registry.forums, user)
+        # Check
+        assert not any('"forum_forum"' in q['sql'] for q in context.captured_queries)
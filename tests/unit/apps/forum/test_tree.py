@@ -0,0 +1,182 @@
+import pytest
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from machina.conf import settings as machina_settings
+from machina.core.db.models import get_model
+from machina.core.loading import get_class
+from machina.test.factories import create_category_forum, create_forum
+
+
+Forum = get_model('forum', 'Forum')
+
+ForumRegistry = get_class('forum.registry', 'ForumRegistry')
+ForumTree = get_class('forum.tree', 'ForumTree')
+forum_tree_cache = get_class('forum.tree', 'cache')
+
+
+@pytest.mark.django_db
+class TestForumTree(object):
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        # Set up the following forum tree:
+        #
+        #     top_level_cat
+        #         forum_1
+        #             forum_1_child_1
+        #         forum_2
+        #     top_level_forum
+        #
+        self.top_level_cat = create_category_forum()
+        self.forum_1 = create_forum(parent=self.top_level_cat)
+        self.forum_1_child_1 = create_forum(parent=self.forum_1)
+        self.forum_2 = create_forum(parent=self.top_level_cat)
+        self.top_level_forum = create_forum()
+
+    def test_can_be_loaded_using_a_single_query(self):
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            tree = ForumTree.load()
+        # Check
+        assert len(context.captured_queries) == 1
+        assert [n.id for n in tree.nodes] == list(Forum.objects.values_list('id', flat=True))
+        assert tree.get(self.forum_1.id).slug == self.forum_1.slug
+
+    def test_can_return_the_parent_and_the_children_of_a_forum(self):
+        # Setup
+        tree = ForumTree.from_forums(Forum.objects.all())
+        # Run & check
+        assert tree.get_parent(self.forum_1.id).id == self.top_level_cat.id
+        assert tree.get_parent(self.top_level_forum.id) is None
+        assert [n.id for n in tree.get_children(self.top_level_cat.id)] == \
+            [self.forum_1.id, self.forum_2.id]
+        assert tree.get_children(self.forum_2.id) == ()
+
+    def test_can_return_the_ancestors_and_the_descendants_of_a_forum(self):
+        # Setup
+        tree = ForumTree.from_forums(Forum.objects.all())
+        # Run & check
+        assert [n.id for n in tree.get_ancestors(self.forum_1_child_1.id)] == \
+            [self.top_level_cat.id, self.forum_1.id]
+        assert [n.id for n in tree.get_ancestors(self.forum_1.id, include_self=True)] == \
+            [self.top_level_cat.id, self.forum_1.id]
+        assert [n.id for n in tree.get_descendants(self.top_level_cat.id)] == \
+            [self.forum_1.id, self.forum_1_child_1.id, self.forum_2.id]
+        assert tree.get_descendants(self.top_level_forum.id) == ()
+
+
+@pytest.mark.django_db(transaction=True)
+class TestForumTreeCache(object):
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        machina_settings.FORUM_TREE_CACHE_NAME = 'default'
+        caches['default'].clear()
+        forum_tree_cache.clear()
+        self.top_level_cat = create_category_forum()
+        self.forum_1 = create_forum(parent=self.top_level_cat)
+        self.forum_2 = create_forum()
+        yield
+        machina_settings.FORUM_TREE_CACHE_NAME = None
+        forum_tree_cache.clear()
+
+    def test_should_raise_if_the_cache_backend_is_not_configured(self):
+        # Setup
+        machina_settings.FORUM_TREE_CACHE_NAME = 'dummy'
+        # Run & check
+        with pytest.raises(ImproperlyConfigured):
+            forum_tree_cache.get_generation()
+
+    def test_builds_a_new_tree_each_time_if_it_is_disabled(self):
+        # Setup
+        machina_settings.FORUM_TREE_CACHE_NAME = None
+        tree = forum_tree_cache.get_tree()
+        # Run & check
+        assert forum_tree_cache.get_tree() is not tree
+
+    def test_keeps_the_tree_in_the_current_process(self):
+        # Setup
+        tree = forum_tree_cache.get_tree()
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            cached_tree = forum_tree_cache.get_tree()
+        # Check
+        assert cached_tree is tree
+        assert not len(context.captured_queries)
+
+    def test_is_invalidated_when_a_forum_is_created(self):
+        # Setup
+        forum_tree_cache.get_tree()
+        # Run
+        forum_3 = create_forum(parent=self.forum_2)
+        # Check
+        assert forum_3.id in forum_tree_cache.get_tree()
+
+    def test_is_invalidated_when_a_forum_is_updated(self):
+        # Setup
+        forum_tree_cache.get_tree()
+        # Run
+        self.forum_1.name = 'Updated forum'
+        self.forum_1.save()
+        # Check
+        assert forum_tree_cache.get_tree().get(self.forum_1.id).name == 'Updated forum'
+
+    def test_is_invalidated_when_a_forum_is_moved(self):
+        # Setup
+        forum_tree_cache.get_tree()
+        # Run
+        self.forum_1.parent = self.forum_2
+        self.forum_1.save()
+        # Check
+        assert forum_tree_cache.get_tree().get_parent(self.forum_1.id).id == self.forum_2.id
+
+    def test_is_invalidated_when_a_forum_is_deleted(self):
+        # Setup
+        forum_tree_cache.get_tree()
+        # Run
+        self.forum_2.delete()
+        # Check
+        assert self.forum_2.id not in forum_tree_cache.get_tree()
+
+    def test_is_only_invalidated_when_the_transaction_is_committed(self):
+        # Setup
+        generation = forum_tree_cache.get_generation()
+        # Run & check
+        with transaction.atomic():
+            forum_3 = create_forum(parent=self.forum_2)
+            assert forum_tree_cache.get_generation() == generation
+        assert forum_tree_cache.get_generation() != generation
+        assert forum_3.id in forum_tree_cache.get_tree()
+
+    def test_is_invalidated_when_the_generation_is_bumped_by_another_process(self):
+        # Setup
+        tree = forum_tree_cache.get_tree()
+        # Run
+        caches['default'].incr(forum_tree_cache.generation_key)
+        # Check
+        assert forum_tree_cache.get_tree() is not tree
+
+    def test_is_not_invalidated_when_only_the_trackers_of_a_forum_are_updated(self):
+        # Setup
+        generation = forum_tree_cache.get_generation()
+        # Run
+        self.forum_1.direct_posts_count = 10
+        self.forum_1.save(update_fields=['direct_posts_count', ])
+        # Check
+        assert forum_tree_cache.get_generation() == generation
+
+    def test_allows_the_forum_registry_to_fetch_a_single_forum(self):
+        # Setup
+        forum_tree_cache.get_tree()
+        registry = ForumRegistry()
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            forum = registry.get(self.forum_1.id)
+            ancestors = registry.tree.get_ancestors(self.forum_1.id)
+            unknown_forum = registry.get(-1)
+        # Check
+        assert forum == self.forum_1
+        assert [n.id for n in ancestors] == [self.top_level_cat.id]
+        assert unknown_forum is None
+        assert len(context.captured_queries) == 1
@@ -1,7 +1,12 @@
+import threading
+
 import pytest
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from faker import Faker
 
+from machina.conf import settings as machina_settings
 from machina.core.db.models import get_model
 from machina.test.factories import (
     PostFactory, UserFactory, build_topic, create_category_forum, create_forum, create_link_forum,
@@ -201,6 +206,25 @@ class TestPost(object):
         assert post_2.position == 2
         assert post_3.position == 3
 
+    def test_does_not_consider_unapproved_posts_when_computing_its_position(self):
+        # Setup
+        unapproved_post = PostFactory.create(topic=self.topic, poster=self.u1, approved=False)
+        post_3 = PostFactory.create(topic=self.topic, poster=self.u1)
+        # Run & check
+        assert unapproved_post.position == 2
+        assert post_3.position == 2
+
+    def test_uses_the_post_ids_to_compute_its_position_if_creation_dates_are_equal(self):
+        # Setup
+        post_2 = PostFactory.create(topic=self.topic, poster=self.u1)
+        post_3 = PostFactory.create(topic=self.topic, poster=self.u1)
+        Post.objects.filter(pk__in=[post_2.pk, post_3.pk]).update(created=self.post.created)
+        post_2.refresh_from_db()
+        post_3.refresh_from_db()
+        # Run & check
+        assert post_2.position == 2
+        assert post_3.position == 3
+
     def test_is_both_topic_head_and_tail_if_it_is_alone_in_the_topic(self):
         # Check
         assert self.post.is_topic_head
@@ -273,3 +297,145 @@ class TestPost(object):
         with pytest.raises(ValidationError):
             post = PostFactory.build(topic=self.topic, poster=None, anonymous_key='1234')
             post.clean()
+
+
+@pytest.mark.django_db
+class TestPostWithIncrementalTrackersUpdates(object):
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        machina_settings.TRACKERS_UPDATE_MODE = 'incremental'
+        self.u1 = UserFactory.create()
+
+        # Set up a top-level forum, an associated topic and a post
+        self.top_level_forum = create_forum()
+        self.topic = create_topic(forum=self.top_level_forum, poster=self.u1)
+        self.post = PostFactory.create(topic=self.topic, poster=self.u1)
+        yield
+        machina_settings.TRACKERS_UPDATE_MODE = 'full'
+
+    def get_trackers(self):
+        topic = Topic.objects.get(pk=self.topic.pk)
+        forum = Forum.objects.get(pk=self.top_level_forum.pk)
+        return (
+            topic.posts_count, topic.first_post_id, topic.last_post_id, topic.last_post_on,
+            forum.direct_topics_count, forum.direct_posts_count, forum.last_post_id,
+            forum.last_post_on,
+        )
+
+    def test_updates_the_trackers_of_topics_and_forums_when_a_reply_is_posted(self):
+        # Run
+        post = PostFactory.create(topic=self.topic, poster=self.u1)
+        # Check
+        trackers = self.get_trackers()
+        topic = Topic.objects.get(pk=self.topic.pk)
+        topic.update_trackers()
+        assert trackers == self.get_trackers()
+        assert topic.posts_count == 2
+        assert topic.last_post_id == post.pk
+        assert self.topic.posts_count == 2
+        assert self.topic.last_post_id == post.pk
+
+    def test_uses_fewer_queries_than_the_full_update_of_the_trackers(self):
+        # Setup
+        machina_settings.TRACKERS_UPDATE_MODE = 'full'
+        with CaptureQueriesContext(connection) as full_context:
+            PostFactory.create(topic=self.topic, poster=self.u1)
+        machina_settings.TRACKERS_UPDATE_MODE = 'incremental'
+        # Run
+        with CaptureQueriesContext(connection) as incremental_context:
+            PostFactory.create(topic=self.topic, poster=self.u1)
+        # Check
+        assert len(incremental_context.captured_queries) < len(full_context.captured_queries)
+        assert Topic.objects.get(pk=self.topic.pk).posts_count == 3
+
+    def test_does_not_replace_the_last_post_by_an_older_post(self):
+        # Setup
+        last_post = PostFactory.create(topic=self.topic, poster=self.u1)
+        topic = Topic.objects.get(pk=self.topic.pk)
+        post = PostFactory.build(topic=topic, poster=self.u1)
+        post.save()
+        Post.objects.filter(pk=post.pk).update(created=self.post.created)
+        post.created = self.post.created
+        Topic.objects.filter(pk=topic.pk).update(
+            posts_count=2, last_post=last_post, last_post_on=last_post.created,
+        )
+        # Run
+        topic = Topic.objects.get(pk=self.topic.pk)
+        topic.update_trackers_for_new_post(post)
+        # Check
+        topic.refresh_from_db()
+        assert topic.posts_count == 3
+        assert topic.last_post_id == last_post.pk
+
+    def test_does_not_update_the_trackers_of_forums_for_replies_to_unapproved_topics(self):
+        # Setup
+        topic = create_topic(forum=self.top_level_forum, poster=self.u1, approved=False)
+        PostFactory.create(topic=topic, poster=self.u1, approved=False)
+        forum_trackers = self.get_trackers()[4:]
+        # Run
+        PostFactory.create(topic=topic, poster=self.u1)
+        # Check
+        assert self.get_trackers()[4:] == forum_trackers
+        assert Topic.objects.get(pk=topic.pk).posts_count == 1
+
+    def test_recomputes_the_trackers_when_an_unapproved_reply_is_posted(self):
+        # Run
+        PostFactory.create(topic=self.topic, poster=self.u1, approved=False)
+        # Check
+        trackers = self.get_trackers()
+        Topic.objects.get(pk=self.topic.pk).update_trackers()
+        assert trackers == self.get_trackers()
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.skipif(
+    connection.vendor == 'sqlite', reason='SQLite does not support concurrent writes',
+)
+class TestTrackersConcurrency(object):
+    THREADS_NUMBER = 8
+    POSTS_NUMBER_PER_THREAD = 5
+
+    @pytest.fixture(autouse=True, params=['full', 'incremental'])
+    def setup(self, request):
+        machina_settings.TRACKERS_UPDATE_MODE = request.param
+        self.u1 = UserFactory.create()
+
+        # Set up a top-level forum, an associated topic and a post
+        self.top_level_forum = create_forum()
+        self.topic = create_topic(forum=self.top_level_forum, poster=self.u1)
+        self.post = PostFactory.create(topic=self.topic, poster=self.u1)
+        yield
+        machina_settings.TRACKERS_UPDATE_MODE = 'full'
+
+    def test_keeps_exact_trackers_when_replies_are_posted_concurrently(self):
+        # Setup
+        barrier = threading.Barrier(self.THREADS_NUMBER)
+        errors = []
+
+        def post_replies():
+            try:
+                barrier.wait()
+                for _ in range(self.POSTS_NUMBER_PER_THREAD):
+                    topic = Topic.objects.get(pk=self.topic.pk)
+                    PostFactory.create(topic=topic, poster=self.u1)
+            except Exception as e:  # pragma: no cover
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=post_replies) for _ in range(self.THREADS_NUMBER)]
+        # Run
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Check
+        assert not errors
+        expected_posts_count = 1 + self.THREADS_NUMBER * self.POSTS_NUMBER_PER_THREAD
+        last_post = Post.objects.filter(topic=self.topic).order_by('-created').first()
+        topic = Topic.objects.get(pk=self.topic.pk)
+        forum = Forum.objects.get(pk=self.top_level_forum.pk)
+        assert topic.posts_count == expected_posts_count
+        assert topic.last_post_on == last_post.created
+        assert forum.direct_posts_count == expected_posts_count
+        assert forum.last_post_on == last_post.created
@@ -0,0 +1,194 @@
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from machina.apps.forum_conversation.trackers import (
+    defer_trackers_update, is_trackers_update_pending, recompute_forum_trackers,
+    recompute_topic_trackers
+)
+from machina.conf import settings as machina_settings
+from machina.core.db.models import get_model
+from machina.test.factories import PostFactory, UserFactory, create_forum, create_topic
+
+
+Forum = get_model('forum', 'Forum')
+Post = get_model('forum_conversation', 'Post')
+Topic = get_model('forum_conversation', 'Topic')
+
+
+def get_trackers(topics, forums):
+    trackers = []
+    for topic in Topic.objects.filter(pk__in=[t.pk for t in topics]).order_by('pk'):
+        trackers.append(
+            (topic.posts_count, topic.first_post_id, topic.last_post_id, topic.last_post_on),
+        )
+    for forum in Forum.objects.filter(pk__in=[f.pk for f in forums]).order_by('pk'):
+        trackers.append((
+            forum.direct_topics_count, forum.direct_posts_count, forum.last_post_id,
+            forum.last_post_on,
+        ))
+    return trackers
+
+
+def recompute_trackers_one_by_one(topics):
+    for topic in Topic.objects.filter(pk__in=[t.pk for t in topics]):
+        topic.update_trackers()
+
+
+@pytest.mark.django_db
+class TestRecomputeTrackers(object):
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.u1 = UserFactory.create()
+
+        # Set up two top-level forums and some topics with approved and unapproved posts
+        self.forum_1 = create_forum()
+        self.forum_2 = create_forum()
+        self.topic_1 = create_topic(forum=self.forum_1, poster=self.u1)
+        PostFactory.create(topic=self.topic_1, poster=self.u1)
+        PostFactory.create(topic=self.topic_1, poster=self.u1)
+        PostFactory.create(topic=self.topic_1, poster=self.u1, approved=False)
+        self.topic_2 = create_topic(forum=self.forum_1, poster=self.u1)
+        PostFactory.create(topic=self.topic_2, poster=self.u1)
+        self.topic_3 = create_topic(forum=self.forum_2, poster=self.u1, approved=False)
+        PostFactory.create(topic=self.topic_3, poster=self.u1, approved=False)
+        self.topics = [self.topic_1, self.topic_2, self.topic_3]
+        self.forums = [self.forum_1, self.forum_2]
+
+    def test_can_recompute_the_trackers_of_topics(self):
+        # Setup
+        expected_trackers = get_trackers(self.topics, [])
+        Topic.objects.update(posts_count=42, first_post=None, last_post=None, last_post_on=None)
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            recompute_topic_trackers([t.pk for t in self.topics])
+        # Check
+        assert len(context.captured_queries) == 1
+        assert get_trackers(self.topics, []) == expected_trackers
+
+    def test_can_recompute_the_trackers_of_forums(self):
+        # Setup
+        expected_trackers = get_trackers([], self.forums)
+        Forum.objects.update(
+            direct_topics_count=42, direct_posts_count=42, last_post=None, last_post_on=None,
+        )
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            recompute_forum_trackers([f.pk for f in self.forums])
+        # Check
+        assert len(context.captured_queries) == 1
+        assert get_trackers([], self.forums) == expected_trackers
+
+
+@pytest.mark.django_db(transaction=True)
+class TestDeferredTrackersUpdates(object):
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        machina_settings.TRACKERS_UPDATE_MODE = 'deferred'
+        self.u1 = UserFactory.create()
+
+        # Set up a top-level forum and a topic with some unapproved posts
+        self.top_level_forum = create_forum()
+        self.topic = create_topic(forum=self.top_level_forum, poster=self.u1)
+        PostFactory.create(topic=self.topic, poster=self.u1)
+        self.unapproved_posts = [
+            PostFactory.create(topic=self.topic, poster=self.u1, approved=False)
+            for _ in range(10)
+        ]
+        yield
+        machina_settings.TRACKERS_UPDATE_MODE = 'full'
+
+    def test_recomputes_the_trackers_once_when_the_transaction_is_committed(self):
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            with transaction.atomic():
+                for post in self.unapproved_posts:
+                    post.approved = True
+                    post.save()
+                # Check
+                assert Topic.objects.get(pk=self.topic.pk).posts_count == 1
+        # Check
+        trackers_queries = [
+            q['sql'] for q in context.captured_queries
+            if q['sql'].startswith('UPDATE "forum_conversation_topic"') or
+            q['sql'].startswith('UPDATE "forum_forum"')
+        ]
+        assert len(trackers_queries) == 2
+        trackers = get_trackers([self.topic], [self.top_level_forum])
+        recompute_trackers_one_by_one([self.topic])
+        assert trackers == get_trackers([self.topic], [self.top_level_forum])
+        assert Topic.objects.get(pk=self.topic.pk).posts_count == 11
+
+    def test_updates_the_trackers_immediately_outside_of_transactions(self):
+        # Run
+        PostFactory.create(topic=self.topic, poster=self.u1)
+        # Check
+        assert Topic.objects.get(pk=self.topic.pk).posts_count == 2
+
+    def test_does_not_update_the_trackers_if_the_transaction_is_rolled_back(self):
+        # Setup
+        class Rollback(Exception):
+            pass
+        # Run
+        with pytest.raises(Rollback):
+            with transaction.atomic():
+                defer_trackers_update(topic_ids=[self.topic.pk, ])
+                Topic.objects.filter(pk=self.topic.pk).update(posts_count=42)
+                raise Rollback
+        # Check
+        assert Topic.objects.get(pk=self.topic.pk).posts_count == 1
+        assert not is_trackers_update_pending(topic_ids=[self.topic.pk, ])
+
+    def test_discards_the_topics_recorded_in_a_savepoint_that_is_rolled_back(self):
+        # Setup
+        class Rollback(Exception):
+            pass
+        # Run & check
+        with transaction.atomic():
+            defer_trackers_update(forum_ids=[self.top_level_forum.pk, ])
+            with pytest.raises(Rollback):
+                with transaction.atomic():
+                    defer_trackers_update(topic_ids=[self.topic.pk, ])
+                    raise Rollback
+            assert not is_trackers_update_pending(topic_ids=[self.topic.pk, ])
+            assert is_trackers_update_pending(forum_ids=[self.top_level_forum.pk, ])
+
+    def test_registers_a_single_commit_callback_per_transaction(self):
+        # Run & check
+        with transaction.atomic():
+            for post in self.unapproved_posts:
+                defer_trackers_update(topic_ids=[post.topic_id, ])
+            assert len(connection.run_on_commit) == 1
+
+    def test_can_tell_if_the_trackers_of_a_topic_or_a_forum_are_stale(self):
+        # Run & check
+        with transaction.atomic():
+            assert not is_trackers_update_pending(topic_ids=[self.topic.pk, ])
+            self.unapproved_posts[0].approved = True
+            self.unapproved_posts[0].save()
+            assert is_trackers_update_pending(topic_ids=[self.topic.pk, ])
+            assert is_trackers_update_pending(forum_ids=[self.top_level_forum.pk, ])
+        assert not is_trackers_update_pending(
+            topic_ids=[self.topic.pk, ], forum_ids=[self.top_level_forum.pk, ])
+
+    def test_saves_the_subject_of_topics_whose_trackers_are_deferred(self):
+        # Setup
+        first_post = Topic.objects.get(pk=self.topic.pk).first_post
+        # Run
+        with transaction.atomic():
+            first_post.subject = 'Updated subject'
+            first_post.save()
+        # Check
+        assert Topic.objects.get(pk=self.topic.pk).subject == 'Updated subject'
+
+    def test_keeps_the_subject_of_the_first_post_of_topics_created_in_the_same_transaction(self):
+        # Run
+        with transaction.atomic():
+            topic = create_topic(forum=self.top_level_forum, poster=self.u1)
+            PostFactory.create(topic=topic, poster=self.u1, subject='first post')
+            PostFactory.create(topic=topic, poster=self.u1, subject='Re: reply')
+            PostFactory.create(topic=topic, poster=self.u1, subject='Re: another reply')
+        # Check
+        topic = Topic.objects.get(pk=topic.pk)
+        assert topic.subject == 'first post'
+        assert topic.first_post.subject == 'first post'
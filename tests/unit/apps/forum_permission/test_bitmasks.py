@@ -0,0 +1,48 @@
+from machina.apps.forum_permission.bitmasks import PermissionBitmasks
+from machina.apps.forum_permission.defaults import PermissionConfig
+
+
+class TestPermissionBitmasks(object):
+    def test_associates_each_configured_permission_with_a_distinct_bit(self):
+        # Setup
+        bitmasks = PermissionBitmasks()
+        codenames = [p['fields']['codename'] for p in PermissionConfig.permissions]
+        # Run
+        bits = [bitmasks.get_bit(c) for c in codenames]
+        # Check
+        assert len(set(bits)) == len(codenames)
+        assert all(bit and not bit & (bit - 1) for bit in bits)
+        assert bitmasks.get_mask(codenames) == bitmasks.full_mask
+
+    def test_can_convert_codenames_to_bitmasks_and_back(self):
+        # Setup
+        bitmasks = PermissionBitmasks()
+        # Run
+        mask = bitmasks.get_mask(['can_see_forum', 'can_read_forum'])
+        # Check
+        assert bitmasks.get_codenames(mask) == {'can_see_forum', 'can_read_forum'}
+
+    def test_ignores_unknown_codenames(self):
+        # Setup
+        bitmasks = PermissionBitmasks()
+        # Run & check
+        assert bitmasks.get_bit('unknown') == 0
+        assert bitmasks.get_mask(['unknown', 'can_see_forum']) == \
+            bitmasks.get_bit('can_see_forum')
+
+    def test_can_split_permission_rows_into_global_and_per_forum_bitmasks(self):
+        # Setup
+        bitmasks = PermissionBitmasks(['can_see_forum', 'can_read_forum', 'can_start_new_topics'])
+        rows = [
+            (None, 'can_see_forum', True),
+            (None, 'can_read_forum', False),
+            (1, 'can_read_forum', True),
+            (1, 'can_start_new_topics', True),
+            (2, 'can_see_forum', False),
+        ]
+        # Run
+        global_mask, granted_masks, nongranted_masks = bitmasks.split_rows(rows)
+        # Check
+        assert global_mask == 0b001
+        assert dict(granted_masks) == {1: 0b110}
+        assert dict(nongranted_masks) == {2: 0b001}
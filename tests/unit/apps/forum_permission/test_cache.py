@@ -0,0 +1,216 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from machina.apps.forum_permission.cache import cache
+from machina.apps.forum_permission.checker import ForumPermissionChecker
+from machina.apps.forum_permission.handler import PermissionHandler
+from machina.apps.forum_permission.shortcuts import assign_perm, remove_perm
+from machina.conf import settings as machina_settings
+from machina.test.factories import GroupFactory, UserFactory, create_forum
+
+
+@pytest.mark.django_db(transaction=True)
+class TestPermissionCache(object):
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        machina_settings.PERMISSION_CACHE_NAME = 'default'
+        caches['default'].clear()
+        self.user = UserFactory.create()
+        self.forum = create_forum()
+        assign_perm('can_see_forum', self.user, self.forum)
+        assign_perm('can_read_forum', self.user, self.forum)
+        yield
+        machina_settings.PERMISSION_CACHE_NAME = None
+        cache.clear_snapshot()
+
+    def test_should_raise_if_the_cache_backend_is_not_configured(self):
+        # Setup
+        machina_settings.PERMISSION_CACHE_NAME = 'dummy'
+        # Run & check
+        with pytest.raises(ImproperlyConfigured):
+            cache.get_generation()
+
+    def test_does_nothing_if_it_is_disabled(self):
+        # Setup
+        machina_settings.PERMISSION_CACHE_NAME = None
+        PermissionHandler().get_readable_forums([self.forum], self.user)
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            PermissionHandler().get_readable_forums([self.forum], self.user)
+        # Check
+        assert len(context.captured_queries)
+
+    def test_can_share_granted_forums_between_handlers(self):
+        # Setup
+        PermissionHandler().get_readable_forums([self.forum], self.user)
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            readable_forums = PermissionHandler().get_readable_forums([self.forum], self.user)
+        # Check
+        assert readable_forums == [self.forum]
+        assert not any(
+            'forum_permission' in q['sql'] for q in context.captured_queries
+        )
+
+    def test_can_share_per_forum_permissions_between_checkers(self):
+        # Setup
+        ForumPermissionChecker(self.user).get_perms(self.forum)
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            perms = ForumPermissionChecker(self.user).get_perms(self.forum)
+        # Check
+        assert perms == {'can_see_forum', 'can_read_forum'}
+        assert not len(context.captured_queries)
+
+    def test_is_invalidated_when_user_permissions_change(self):
+        # Setup
+        ForumPermissionChecker(self.user).get_perms(self.forum)
+        # Run
+        assign_perm('can_start_new_topics', self.user, self.forum)
+        # Check
+        assert ForumPermissionChecker(self.user).has_perm('can_start_new_topics', self.forum)
+
+    def test_is_only_invalidated_when_the_transaction_is_committed(self):
+        # Setup
+        generation = cache.get_generation()
+        # Run & check
+        with transaction.atomic():
+            assign_perm('can_start_new_topics', self.user, self.forum)
+            assert cache.get_generation() == generation
+        assert cache.get_generation() != generation
+
+    def test_is_invalidated_when_group_permissions_change(self):
+        # Setup
+        group = GroupFactory.create()
+        self.user.groups.add(group)
+        ForumPermissionChecker(self.user).get_perms(self.forum)
+        # Run
+        assign_perm('can_start_new_topics', group, self.forum)
+        # Check
+        assert ForumPermissionChecker(self.user).has_perm('can_start_new_topics', self.forum)
+
+    def test_is_invalidated_when_group_memberships_change(self):
+        # Setup
+        group = GroupFactory.create()
+        assign_perm('can_start_new_topics', group, self.forum)
+        ForumPermissionChecker(self.user).get_perms(self.forum)
+        # Run
+        self.user.groups.add(group)
+        # Check
+        assert ForumPermissionChecker(self.user).has_perm('can_start_new_topics', self.forum)
+
+    def test_is_invalidated_when_a_forum_is_created(self):
+        # Setup
+        u1 = AnonymousUser()
+        assign_perm('can_see_forum', u1)
+        assign_perm('can_read_forum', u1)
+        PermissionHandler().get_readable_forums([self.forum], u1)
+        # Run
+        new_forum = create_forum()
+        # Check
+        assert PermissionHandler().get_readable_forums([self.forum, new_forum], u1) == \
+            [self.forum, new_forum]
+
+    def test_is_not_invalidated_when_a_forum_is_updated(self):
+        # Setup
+        generation = cache.get_generation()
+        # Run
+        self.forum.name = 'Updated forum'
+        self.forum.save()
+        # Check
+        assert cache.get_generation() == generation
+
+    def test_keeps_anonymous_permissions_in_a_process_wide_snapshot(self):
+        # Setup
+        u1 = AnonymousUser()
+        assign_perm('can_see_forum', u1)
+        assign_perm('can_read_forum', u1)
+        PermissionHandler().get_readable_forums([self.forum], u1)
+        ForumPermissionChecker(u1).get_perms(self.forum)
+        generation = cache.get_generation()
+        cache.get_backend().delete_many([
+            cache._make_key(generation, 'granted_forums:anonymous:can_read_forum:1'),
+            cache._make_key(generation, 'perms_matrix:anonymous'),
+        ])
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            readable_forums = PermissionHandler().get_readable_forums([self.forum], u1)
+            perms = ForumPermissionChecker(u1).get_perms(self.forum)
+        # Check
+        assert readable_forums == [self.forum]
+        assert perms == {'can_see_forum', 'can_read_forum'}
+        assert not any(
+            'forum_permission' in q['sql'] for q in context.captured_queries
+        )
+
+    def test_does_not_keep_user_permissions_in_the_process_wide_snapshot(self):
+        # Setup
+        ForumPermissionChecker(self.user).get_perms(self.forum)
+        generation = cache.get_generation()
+        cache.get_backend().delete_many([
+            cache._make_key(generation, 'perms_matrix:user:{}'.format(self.user.id)),
+            cache._make_key(generation, 'user_layer:user:{}'.format(self.user.id)),
+        ])
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            ForumPermissionChecker(self.user).get_perms(self.forum)
+        # Check
+        assert len(context.captured_queries)
+
+    def test_drops_the_process_wide_snapshot_when_anonymous_permissions_change(self):
+        # Setup
+        u1 = AnonymousUser()
+        assign_perm('can_see_forum', u1)
+        assign_perm('can_read_forum', u1)
+        PermissionHandler().get_readable_forums([self.forum], u1)
+        # Run
+        remove_perm('can_read_forum', u1)
+        # Check
+        assert PermissionHandler().get_readable_forums([self.forum], u1) == []
+
+    def test_shares_group_permissions_between_users_belonging_to_the_same_groups(self):
+        # Setup
+        g1 = GroupFactory.create()
+        g2 = GroupFactory.create()
+        u1 = UserFactory.create()
+        u2 = UserFactory.create()
+        u1.groups.add(g1, g2)
+        u2.groups.add(g2, g1)
+        assign_perm('can_start_new_topics', g1, self.forum)
+        ForumPermissionChecker(u1).get_perms(self.forum)
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            checker = ForumPermissionChecker(u2)
+            has_perm = checker.has_perm('can_start_new_topics', self.forum)
+        # Check
+        assert has_perm
+        assert checker.get_principal_key() == 'groups:{},{}'.format(*sorted([g1.id, g2.id]))
+        assert not any(
+            'forum_permission_groupforumpermission' in q['sql']
+            for q in context.captured_queries
+        )
+
+    def test_overlays_user_permissions_on_top_of_shared_group_permissions(self):
+        # Setup
+        g1 = GroupFactory.create()
+        u1 = UserFactory.create()
+        u1.groups.add(g1)
+        self.user.groups.add(g1)
+        assign_perm('can_start_new_topics', g1, self.forum)
+        assign_perm('can_reply_to_topics', g1, self.forum)
+        remove_perm('can_see_forum', self.user, self.forum)
+        remove_perm('can_read_forum', self.user, self.forum)
+        assign_perm('can_reply_to_topics', self.user, self.forum, has_perm=False)
+        ForumPermissionChecker(u1).get_perms(self.forum)
+        # Run
+        checker = ForumPermissionChecker(self.user)
+        perms = checker.get_perms(self.forum)
+        # Check
+        assert checker.get_principal_key() == 'user:{}'.format(self.user.id)
+        assert perms == {'can_start_new_topics'}
+        assert ForumPermissionChecker(u1).get_perms(self.forum) == \
+            {'can_start_new_topics', 'can_reply_to_topics'}
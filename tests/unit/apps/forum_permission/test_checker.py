@@ -1,14 +1,17 @@
 import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
 
+from machina.apps.forum_permission.bitmasks import bitmasks
 from machina.apps.forum_permission.checker import ForumPermissionChecker
-from machina.apps.forum_permission.models import ForumPermission
+from machina.apps.forum_permission.models import EffectiveForumPermission, ForumPermission
 from machina.apps.forum_permission.shortcuts import assign_perm
 from machina.conf import settings as machina_settings
-from machina.test.factories import GroupFactory, UserFactory, create_forum
+from machina.test.factories import GroupFactory, UserFactory, create_category_forum, create_forum
 
 
-@pytest.mark.django_db
-class TestForumPermissionChecker(object):
+class BaseForumPermissionCheckerTestCase(object):
     @pytest.fixture(autouse=True)
     def setup(self):
         self.forum = create_forum()
@@ -95,3 +98,147 @@ class TestForumPermissionChecker(object):
         checker = ForumPermissionChecker(user)
         # Run & check
         assert checker.has_perm('can_read_forum', self.forum)
+
+    def test_fetches_the_permissions_of_all_the_forums_using_a_single_query(self):
+        # Setup
+        user = UserFactory.create()
+        group = GroupFactory.create()
+        user.groups.add(group)
+        top_level_cat = create_category_forum()
+        forums = [create_forum(parent=top_level_cat) for _ in range(5)]
+        assign_perm('can_read_forum', user, None)  # global permission
+        assign_perm('can_read_forum', user, forums[0], has_perm=False)
+        assign_perm('can_start_new_topics', group, forums[1])
+        checker = ForumPermissionChecker(user)
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            perms = [checker.get_perms(f) for f in [top_level_cat, self.forum] + forums]
+        # Check
+        assert len(context.captured_queries) == 1
+        assert perms[0] == {'can_read_forum'}
+        assert perms[2] == set()
+        assert perms[3] == {'can_read_forum', 'can_start_new_topics'}
+
+
+@pytest.mark.django_db
+class TestForumPermissionChecker(BaseForumPermissionCheckerTestCase):
+    pass
+
+
+# Effective forum permissions are invalidated when transactions are committed.
+@pytest.mark.django_db(transaction=True)
+class TestForumPermissionCheckerWithEffectivePermissions(BaseForumPermissionCheckerTestCase):
+    @pytest.fixture(autouse=True)
+    def effective_permissions(self):
+        machina_settings.EFFECTIVE_FORUM_PERMISSIONS = True
+        yield
+        machina_settings.EFFECTIVE_FORUM_PERMISSIONS = False
+
+    def test_fetches_the_permissions_of_all_the_forums_using_a_single_query(self):
+        # Setup
+        user = UserFactory.create()
+        group = GroupFactory.create()
+        user.groups.add(group)
+        top_level_cat = create_category_forum()
+        forums = [create_forum(parent=top_level_cat) for _ in range(5)]
+        assign_perm('can_read_forum', user, None)  # global permission
+        assign_perm('can_read_forum', user, forums[0], has_perm=False)
+        assign_perm('can_start_new_topics', group, forums[1])
+        ForumPermissionChecker(user).get_perms(self.forum)
+        checker = ForumPermissionChecker(user)
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            perms = [checker.get_perms(f) for f in [top_level_cat, self.forum] + forums]
+        # Check
+        assert len(context.captured_queries) == 1
+        assert 'forum_permission_effectiveforumpermission' in context.captured_queries[0]['sql']
+        assert perms[0] == {'can_read_forum'}
+        assert perms[2] == set()
+        assert perms[3] == {'can_read_forum', 'can_start_new_topics'}
+
+    def test_stores_the_effective_permissions_of_a_user(self):
+        # Setup
+        user = UserFactory.create()
+        assign_perm('can_read_forum', user, self.forum)
+        # Run
+        ForumPermissionChecker(user).get_perms(self.forum)
+        # Check
+        assert set(
+            EffectiveForumPermission.objects.filter(user=user)
+            .values_list('forum_id', 'perms_mask')
+        ) == {
+            (None, bitmasks.get_mask(['can_see_forum'])),
+            (self.forum.id, bitmasks.get_mask(['can_see_forum', 'can_read_forum'])),
+        }
+
+    def test_ignores_the_effective_permissions_stored_for_another_bitmask_layout(self):
+        # Setup
+        user = UserFactory.create()
+        assign_perm('can_read_forum', user, self.forum)
+        ForumPermissionChecker(user).get_perms(self.forum)
+        EffectiveForumPermission.objects.filter(user=user).update(
+            perms_layout='previous', perms_mask=0,
+        )
+        # Run & check
+        assert ForumPermissionChecker(user).has_perm('can_read_forum', self.forum)
+        assert set(
+            EffectiveForumPermission.objects.filter(user=user)
+            .values_list('perms_layout', flat=True)
+        ) == {bitmasks.layout_version}
+
+    @pytest.mark.skipif(
+        connection.vendor not in ('postgresql', 'sqlite'),
+        reason='partial unique indexes are not supported',
+    )
+    def test_stores_a_single_default_row_for_anonymous_users(self):
+        # Setup
+        ForumPermissionChecker(AnonymousUser()).get_perms(self.forum)
+        # Run & check
+        with pytest.raises(IntegrityError):
+            with transaction.atomic():
+                EffectiveForumPermission.objects.create(anonymous_user=True, forum=None)
+
+    def test_only_invalidates_the_effective_permissions_when_the_transaction_is_committed(self):
+        # Setup
+        user = UserFactory.create()
+        ForumPermissionChecker(user).get_perms(self.forum)
+        # Run & check
+        with transaction.atomic():
+            assign_perm('can_read_forum', user, self.forum)
+            assert EffectiveForumPermission.objects.filter(user=user).exists()
+        assert not EffectiveForumPermission.objects.filter(user=user).exists()
+
+    def test_invalidates_the_effective_permissions_when_user_permissions_change(self):
+        # Setup
+        user = UserFactory.create()
+        ForumPermissionChecker(user).get_perms(self.forum)
+        # Run
+        assign_perm('can_read_forum', user, self.forum)
+        # Check
+        assert ForumPermissionChecker(user).has_perm('can_read_forum', self.forum)
+
+    def test_invalidates_the_effective_permissions_when_group_permissions_change(self):
+        # Setup
+        user = UserFactory.create()
+        group = GroupFactory.create()
+        user.groups.add(group)
+        ForumPermissionChecker(user).get_perms(self.forum)
+        # Run
+        assign_perm('can_read_forum', group, self.forum)
+        # Check
+        assert ForumPermissionChecker(user).has_perm('can_read_forum', self.forum)
+
+    def test_invalidates_the_effective_permissions_when_group_memberships_change(self):
+        # Setup
+        user = UserFactory.create()
+        group = GroupFactory.create()
+        assign_perm('can_read_forum', group, self.forum)
+        ForumPermissionChecker(user).get_perms(self.forum)
+        # Run
+        group.user_set.add(user)
+        # Check
+        assert ForumPermissionChecker(user).has_perm('can_read_forum', self.forum)
+        # Run
+        group.user_set.clear()
+        # Check
+        assert not ForumPermissionChecker(user).has_perm('can_read_forum', self.forum)
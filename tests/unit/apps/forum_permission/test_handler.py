@@ -2,6 +2,8 @@ import datetime as dt
 
 import pytest
 from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from machina.conf import settings as machina_settings
 from machina.core.db.models import get_model
@@ -119,6 +121,29 @@ class TestPermissionHandler(object):
         # Check
         assert list(filtered_forums) == []
 
+    def test_can_filter_a_list_of_forums_without_performing_extra_queries(self):
+        # Setup
+        forums = list(Forum.objects.filter(parent=self.top_level_cat))
+        self.perm_handler.forum_list_filter(Forum.objects.none(), self.u1)
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            filtered_forums = self.perm_handler.forum_list_filter(forums, self.u1)
+        # Check
+        assert filtered_forums == [self.forum_1, self.forum_3]
+        assert not len(context.captured_queries)
+
+    def test_filters_querysets_without_nesting_a_forum_subquery(self):
+        # Setup
+        forums = Forum.objects.filter(parent=self.top_level_cat)
+        self.perm_handler.forum_list_filter(Forum.objects.none(), self.u1)
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            filtered_forums = list(self.perm_handler.forum_list_filter(forums, self.u1))
+        # Check
+        assert set(filtered_forums) == set([self.forum_1, self.forum_3])
+        assert len(context.captured_queries) == 1
+        assert context.captured_queries[0]['sql'].count('SELECT') == 1
+
     def test_can_return_a_list_of_readable_forums(self):
         # Run
         u2 = UserFactory.create(is_superuser=True)
@@ -128,6 +153,20 @@ class TestPermissionHandler(object):
         assert set(readable_forums_1) == set([self.top_level_cat, self.forum_1, self.forum_3, ])
         assert set(readable_forums_2) == set(Forum.objects.all())
 
+    def test_hides_the_forums_whose_ancestors_are_not_readable_at_any_depth(self):
+        # Setup
+        sub_forum_1 = create_forum(parent=self.forum_2)
+        sub_forum_2 = create_forum(parent=sub_forum_1)
+        sub_forum_3 = create_forum(parent=self.forum_1)
+        for forum in (sub_forum_1, sub_forum_2, sub_forum_3):
+            assign_perm('can_read_forum', self.u1, forum)
+        # Run
+        readable_forums = self.perm_handler.get_readable_forums(
+            list(Forum.objects.all()), self.u1,
+        )
+        # Check
+        assert readable_forums == [self.top_level_cat, self.forum_1, sub_forum_3, self.forum_3]
+
     def test_shows_all_forums_to_a_superuser(self):
         # Setup
         u2 = UserFactory.create(is_superuser=True)
@@ -704,3 +743,102 @@ class TestPermissionHandler(object):
         assign_perm('can_read_forum', u2, self.forum_1)
         # Run & check
         assert not self.perm_handler.can_unsubscribe_from_topic(self.forum_1_topic, u2)
+
+    def test_can_compute_post_permissions_consistently_with_per_post_methods(self):
+        # Setup
+        u2 = UserFactory.create()
+        u3 = UserFactory.create(is_superuser=True)
+        assign_perm('can_edit_own_posts', self.u1, self.forum_1)
+        assign_perm('can_delete_posts', self.g1, self.forum_3)
+        assign_perm('can_edit_posts', u2, self.forum_3)
+        posts = [self.post_1, self.post_2]
+        # Run & check
+        for user in [self.u1, u2, u3, AnonymousUser()]:
+            perm_handler = PermissionHandler()
+            post_permissions = perm_handler.get_post_permissions(posts, user)
+            for post in posts:
+                assert post_permissions[post.id] == {
+                    'can_edit_post': perm_handler.can_edit_post(post, user),
+                    'can_delete_post': perm_handler.can_delete_post(post, user),
+                }
+
+    def test_can_compute_topic_permissions_consistently_with_per_topic_methods(self):
+        # Setup
+        u2 = UserFactory.create()
+        u3 = UserFactory.create(is_superuser=True)
+        assign_perm('can_reply_to_topics', self.u1, self.forum_3)
+        assign_perm('can_lock_topics', self.g1, self.forum_3)
+        assign_perm('can_edit_posts', u2, self.forum_1)
+        assign_perm('can_post_stickies', u2, self.forum_1)
+        self.forum_1_topic.subscribers.add(self.u1)
+        topics = [self.forum_1_topic, self.forum_3_topic, self.forum_3_topic_2]
+        # Run & check
+        for user in [self.u1, u2, u3, AnonymousUser()]:
+            perm_handler = PermissionHandler()
+            topic_permissions = perm_handler.get_topic_permissions(topics, user)
+            for topic in topics:
+                assert topic_permissions[topic.id] == {
+                    'can_add_post': perm_handler.can_add_post(topic, user),
+                    'can_subscribe_to_topic': perm_handler.can_subscribe_to_topic(topic, user),
+                    'can_unsubscribe_from_topic': perm_handler.can_unsubscribe_from_topic(
+                        topic, user,
+                    ),
+                    'can_lock_topics': perm_handler.can_lock_topics(topic.forum, user),
+                    'can_move_topics': perm_handler.can_move_topics(topic.forum, user),
+                    'can_delete_topics': perm_handler.can_delete_topics(topic.forum, user),
+                    'can_update_topics_to_normal_topics': (
+                        perm_handler.can_update_topics_to_normal_topics(topic.forum, user)
+                    ),
+                    'can_update_topics_to_sticky_topics': (
+                        perm_handler.can_update_topics_to_sticky_topics(topic.forum, user)
+                    ),
+                    'can_update_topics_to_announces': (
+                        perm_handler.can_update_topics_to_announces(topic.forum, user)
+                    ),
+                }
+
+    def test_uses_the_overridden_methods_to_compute_post_and_topic_permissions(self):
+        # Setup
+        post_2_id, forum_3_id = self.post_2.id, self.forum_3.id
+
+        class CustomPermissionHandler(PermissionHandler):
+            def can_edit_post(self, post, user):
+                return post.id == post_2_id
+
+            def can_lock_topics(self, forum, user):
+                return forum.id == forum_3_id
+
+        assign_perm('can_edit_posts', self.u1, self.forum_1)
+        perm_handler = CustomPermissionHandler()
+        # Run
+        post_permissions = perm_handler.get_post_permissions([self.post_1, self.post_2], self.u1)
+        topic_permissions = perm_handler.get_topic_permissions(
+            [self.forum_1_topic, self.forum_3_topic], self.u1,
+        )
+        # Check
+        assert not post_permissions[self.post_1.id]['can_edit_post']
+        assert post_permissions[self.post_2.id]['can_edit_post']
+        assert post_permissions[self.post_1.id]['can_delete_post'] == \
+            perm_handler.can_delete_post(self.post_1, self.u1)
+        assert not topic_permissions[self.forum_1_topic.id]['can_lock_topics']
+        assert topic_permissions[self.forum_3_topic.id]['can_lock_topics']
+
+
+class TestPermissionHandlerWithDatabaseResolution(TestPermissionHandler):
+    @pytest.fixture(autouse=True)
+    def database_resolution(self):
+        machina_settings.PERMISSION_RESOLUTION = 'database'
+        yield
+        machina_settings.PERMISSION_RESOLUTION = 'python'
+
+    def test_resolves_granted_forums_using_a_single_query(self):
+        # Setup
+        assign_perm('can_read_forum', self.g1, self.forum_2, has_perm=False)
+        self.perm_handler._get_all_forums()
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            readable_forums = self.perm_handler.get_readable_forums(Forum.objects.all(), self.u1)
+            readable_forums = set(readable_forums)
+        # Check
+        assert readable_forums == set([self.top_level_cat, self.forum_1, self.forum_3])
+        assert len(context.captured_queries) == 2
@@ -0,0 +1,126 @@
+import datetime as dt
+
+import pytest
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from machina.core.db.models import get_model
+from machina.core.paginator import CountedPaginator, KeysetPaginator
+from machina.test.factories import PostFactory, UserFactory, create_forum, create_topic
+
+
+Post = get_model('forum_conversation', 'Post')
+Topic = get_model('forum_conversation', 'Topic')
+
+
+@pytest.mark.django_db
+class TestCountedPaginator(object):
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.u1 = UserFactory.create()
+        self.topic = create_topic(forum=create_forum(), poster=self.u1)
+        for _ in range(12):
+            PostFactory.create(topic=self.topic, poster=self.u1)
+
+    def test_uses_the_provided_count(self):
+        # Setup
+        paginator = CountedPaginator(Post.objects.order_by('created'), 5, count=12)
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            page = paginator.page(3)
+            assert len(page) == 2
+        # Check
+        assert paginator.num_pages == 3
+        assert len(context.captured_queries) == 1
+        assert 'COUNT' not in context.captured_queries[0]['sql']
+
+    def test_counts_the_objects_if_no_count_is_provided(self):
+        # Setup
+        paginator = CountedPaginator(Post.objects.order_by('created'), 5)
+        # Run & check
+        assert paginator.count == 12
+
+
+@pytest.mark.django_db
+class TestKeysetPaginator(object):
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.u1 = UserFactory.create()
+        self.forum = create_forum()
+        self.topic = create_topic(forum=self.forum, poster=self.u1)
+        for _ in range(22):
+            PostFactory.create(topic=self.topic, poster=self.u1)
+        # Some posts share the same creation date
+        now = timezone.now()
+        Post.objects.filter(pk__in=list(Post.objects.values_list('pk', flat=True)[5:12])).update(
+            created=now,
+        )
+        self.posts = Post.objects.order_by('created', 'id')
+        self.offset_paginator = Paginator(self.posts, 5)
+
+    def get_paginator(self, **kwargs):
+        return KeysetPaginator(Post.objects.all(), 5, keys=['created', 'id', ], **kwargs)
+
+    def test_returns_the_same_pages_as_the_default_paginator(self):
+        # Setup
+        paginator = self.get_paginator()
+        # Run & check
+        assert paginator.num_pages == 5
+        for number in paginator.page_range:
+            assert list(paginator.page(number)) == list(self.offset_paginator.page(number))
+
+    def test_can_use_the_cursor_of_a_page_to_retrieve_the_next_page(self):
+        # Setup
+        page = self.get_paginator().page(2)
+        paginator = self.get_paginator(count=22, after=page.next_cursor)
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            next_page = paginator.page(3)
+        # Check
+        assert list(next_page) == list(self.offset_paginator.page(3))
+        assert len(context.captured_queries) == 1
+        assert 'OFFSET' not in context.captured_queries[0]['sql']
+
+    def test_can_use_the_cursor_of_a_page_to_retrieve_the_previous_page(self):
+        # Setup
+        page = self.get_paginator().page(3)
+        paginator = self.get_paginator(before=page.previous_cursor)
+        # Run & check
+        assert list(paginator.page(2)) == list(self.offset_paginator.page(2))
+
+    def test_can_handle_keys_with_different_directions(self):
+        # Setup
+        now = timezone.now()
+        for i in range(7):
+            topic = create_topic(forum=self.forum, poster=self.u1, type=i % 2)
+            PostFactory.create(topic=topic, poster=self.u1)
+            Topic.objects.filter(pk=topic.pk).update(last_post_on=now - dt.timedelta(hours=i % 3))
+        topics = Topic.objects.order_by('-type', '-last_post_on', 'id')
+        keys = ['-type', '-last_post_on', 'id', ]
+        # Run & check
+        page = KeysetPaginator(Topic.objects.all(), 3, keys=keys).page(1)
+        assert list(page) == list(topics[:3])
+        page = KeysetPaginator(Topic.objects.all(), 3, keys=keys, after=page.next_cursor).page(2)
+        assert list(page) == list(topics[3:6])
+        page = KeysetPaginator(
+            Topic.objects.all(), 3, keys=keys, before=page.previous_cursor).page(1)
+        assert list(page) == list(topics[:3])
+
+    def test_ignores_invalid_cursors(self):
+        # Setup
+        paginator = self.get_paginator(after='invalid')
+        # Run & check
+        assert list(paginator.page(2)) == list(self.offset_paginator.page(2))
+
+    def test_does_not_count_the_objects_if_the_count_is_provided(self):
+        # Setup
+        paginator = self.get_paginator(count=22)
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            page = paginator.page(5)
+        # Check
+        assert list(page) == list(self.offset_paginator.page(5))
+        assert len(context.captured_queries) == 1
+        assert 'COUNT' not in context.captured_queries[0]['sql']
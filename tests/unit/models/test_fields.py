@@ -64,6 +64,17 @@ class TestMarkupTextField(object):
         with pytest.raises(AttributeError):
             print(DummyModel.content.rendered)
 
+    def test_does_not_render_its_data_when_it_is_not_part_of_the_updated_fields(self):
+        # Setup
+        test = DummyModel()
+        test.content = '**hello**'
+        test.save()
+        test.content = '**hello world!**'
+        # Run
+        test.save(update_fields=['resized_image', ])
+        # Check
+        assert test.content.rendered.rstrip() == '<p><strong>hello</strong></p>'
+
     def test_content_returns_the_raw_value_when_converted_to_a_string(self):
         # Setup
         test = DummyModel()
@@ -2,17 +2,27 @@
 
 from __future__ import unicode_literals
 
+from io import StringIO
+
 import pytest
+from django.contrib.auth.models import AnonymousUser
 from django.core.management import call_command
 
 from machina.core.db.models import get_model
+from machina.core.loading import get_class
 from machina.test.factories import PostFactory
 from machina.test.factories import UserFactory
 from machina.test.factories import create_forum
 from machina.test.factories import create_topic
 
 
+EffectiveForumPermission = get_model('forum_permission', 'EffectiveForumPermission')
+Forum = get_model('forum', 'Forum')
 ForumProfile = get_model('forum_member', 'ForumProfile')
+Topic = get_model('forum_conversation', 'Topic')
+
+assign_perm = get_class('forum_permission.shortcuts', 'assign_perm')
+bitmasks = get_class('forum_permission.bitmasks', 'bitmasks')
 
 
 @pytest.mark.django_db
@@ -74,3 +84,68 @@ class TestSendNotificationsCommand(object):
         # Run & check
         call_command('send_notifications')
         assert len(mailoutbox) == 1
+
+
+@pytest.mark.django_db
+class TestRebuildEffectiveForumPermissionsCommand(object):
+    def test_rebuilds_the_effective_permissions_of_all_the_users(self):
+        # Setup
+        u1 = UserFactory.create()
+        u2 = UserFactory.create()
+        forum = create_forum()
+        assign_perm('can_read_forum', u1, forum)
+        assign_perm('can_read_forum', AnonymousUser(), forum)
+        # Run
+        call_command('rebuild_effective_forum_permissions', stdout=StringIO())
+        # Check
+        read_mask = bitmasks.get_mask(['can_read_forum'])
+        assert EffectiveForumPermission.objects.get(user=u1, forum=forum).perms_mask == read_mask
+        assert EffectiveForumPermission.objects.get(user=u2, forum=None).perms_mask == 0
+        assert EffectiveForumPermission.objects.get(
+            anonymous_user=True, forum=forum,
+        ).perms_mask == read_mask
+
+
+@pytest.mark.django_db
+class TestMachinaRebuildTrackersCommand(object):
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.u1 = UserFactory.create()
+        self.forum = create_forum()
+        self.topics = []
+        for _ in range(3):
+            topic = create_topic(forum=self.forum, poster=self.u1)
+            PostFactory.create(topic=topic, poster=self.u1)
+            PostFactory.create(topic=topic, poster=self.u1)
+            self.topics.append(topic)
+        PostFactory.create(topic=self.topics[0], poster=self.u1, approved=False)
+
+    def test_rebuilds_the_trackers_of_topics_forums_and_forum_profiles(self):
+        # Setup
+        Topic.objects.update(posts_count=0, last_post=None, last_post_on=None)
+        Forum.objects.update(direct_topics_count=0, direct_posts_count=42)
+        ForumProfile.objects.update(posts_count=0)
+        stdout = StringIO()
+        # Run
+        call_command('machina_rebuild_trackers', chunk_size=2, stdout=stdout)
+        # Check
+        assert 'Topics: 3 object(s) rebuilt' in stdout.getvalue()
+        assert all(t.posts_count == 2 for t in Topic.objects.all())
+        forum = Forum.objects.get(pk=self.forum.pk)
+        assert forum.direct_topics_count == 3
+        assert forum.direct_posts_count == 6
+        assert forum.last_post_on == Topic.objects.order_by('-last_post_on')[0].last_post_on
+        assert ForumProfile.objects.get(user=self.u1).posts_count == 6
+
+    def test_can_report_drifted_trackers_without_updating_them(self):
+        # Setup
+        Topic.objects.filter(pk=self.topics[0].pk).update(posts_count=42)
+        stdout = StringIO()
+        # Run
+        call_command('machina_rebuild_trackers', dry_run=True, stdout=stdout)
+        # Check
+        assert 'Topics: 1 object(s) with drifted trackers' in stdout.getvalue()
+        # The trackers of forums are computed using the trackers of topics.
+        assert 'Forums: 1 object(s) with drifted trackers' in stdout.getvalue()
+        assert 'Forum profiles: 0 object(s) with drifted trackers' in stdout.getvalue()
+        assert Topic.objects.get(pk=self.topics[0].pk).posts_count == 42